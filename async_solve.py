@@ -0,0 +1,229 @@
+import asyncio
+import multiprocessing
+import multiprocessing.connection
+from time import time
+from classes import Formula, UNKNOWN
+from incremental import Solver
+from budget import Budget, BudgetExhausted
+from stats import Stats, COUNTERS
+from typing import Awaitable, Callable, Dict, List, Mapping, Optional
+
+# Solving from inside an asyncio event loop. A plain `solver.solve` call holds the loop for as long as the search runs
+# and can't be cancelled, so a service that answers many requests at once needs one of two ways around it:
+#
+# - "process" runs `solver.solve` in a process of its own, which the loop waits on through the readability of its pipe.
+#   Cancelling the task (or its timeout expiring) terminates the process right away. Progress events of the search are
+#   sent over the pipe and passed on to the callback.
+# - "cooperative" runs the search in the loop itself, in slices of SLICE_PROPAGATIONS propagations or SLICE_SECONDS
+#   seconds, whichever comes first (a propagation gets slower as learned clauses pile up), and lets the loop run other
+#   tasks between them, so cancellation takes effect at the end of the current slice. Every slice is one
+#   query to an `incremental.Solver`, which keeps what it learned and its saved phases, so a slice picks up roughly
+#   where the last one stopped. It only runs the plain CDCL search: no preprocessing, fast paths or parallel modes.
+
+EXECUTORS = ["process", "cooperative"]
+
+# Propagations and seconds in one slice of the cooperative search
+SLICE_PROPAGATIONS = 20000
+SLICE_SECONDS = 0.02
+
+# Seconds between progress events by default
+PROGRESS_INTERVAL = 1.0
+
+# The options of `solve` that the cooperative search takes
+COOPERATIVE_OPTIONS = ["heuristic", "seed", "restart", "phase_saving", "initial_phase", "budget"]
+
+# Seconds a terminated process gets to exit before it is killed
+TERMINATE_GRACE = 1.0
+
+Progress = Callable[[str, Dict], Awaitable[None]]
+
+
+def run_solve(variables: List, formula: Formula, options: Mapping, progress_interval: Optional[float],
+              connection: multiprocessing.connection.Connection) -> None:
+    """
+    Runs `solver.solve` in a child process, sending every event of its statistics and then its answer (or the error it
+    raised) over `connection`.
+    """
+    from solver import solve
+    stats = Stats(progress_interval=progress_interval, echo=False,
+                  callback=lambda event, data: connection.send((event, data)))
+    try:
+        answer = solve(variables, formula, stats=stats, **options)
+    except Exception as error:
+        connection.send(("error", error))
+        return
+    connection.send(("answer", answer))
+
+
+async def readable(connection: multiprocessing.connection.Connection, process: multiprocessing.Process) -> None:
+    """
+    Waits until `connection` has something to read or `process` has exited.
+    """
+    loop = asyncio.get_running_loop()
+    ready = loop.create_future()
+    for handle in (connection.fileno(), process.sentinel):
+        loop.add_reader(handle, lambda: ready.done() or ready.set_result(None))
+    try:
+        await ready
+    finally:
+        for handle in (connection.fileno(), process.sentinel):
+            loop.remove_reader(handle)
+
+
+async def solve_in_process(variables: List, formula: Formula, progress: Optional[Progress],
+                           progress_interval: Optional[float], options: Mapping) -> Mapping:
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=run_solve, daemon=True,
+                                      args=(variables, formula, options, progress_interval, sender))
+    process.start()
+    sender.close()
+    try:
+        while True:
+            await readable(receiver, process)
+            if not receiver.poll():
+                raise RuntimeError(f"Solver process exited with code {process.exitcode}")
+            event, data = receiver.recv()
+            if event == "answer":
+                return data
+            if event == "error":
+                raise data
+            if progress is not None:
+                await progress(event, data)
+    finally:
+        if process.is_alive():
+            process.terminate()
+            process.join(TERMINATE_GRACE)
+            if process.is_alive():
+                process.kill()
+        process.join()
+        receiver.close()
+
+
+async def solve_cooperatively(variables: List, formula: Formula, progress: Optional[Progress],
+                              progress_interval: Optional[float], slice_propagations: int, slice_seconds: float,
+                              options: Mapping) -> Mapping:
+    unknown = [option for option in options if option not in COOPERATIVE_OPTIONS]
+    if unknown:
+        raise ValueError(f"The cooperative search doesn't take {unknown}")
+    budget = options.get("budget")
+    solver = Solver(variables, formula, **{key: value for key, value in options.items() if key != "budget"})
+    propagator = solver.propagator
+    if budget is not None:
+        budget.begin(propagator)
+
+    last_progress = start = time()
+    while True:
+        answer = solver.solve(budget=Budget(slice_seconds, propagations=slice_propagations))
+        if answer is not UNKNOWN:
+            break
+        if budget is not None:
+            try:
+                budget.check(propagator)
+            except BudgetExhausted:
+                break
+
+        now = time()
+        if progress is not None and progress_interval is not None and now - last_progress >= progress_interval:
+            last_progress = now
+            await progress("progress", {counter: getattr(propagator, counter) for counter in COUNTERS})
+        await asyncio.sleep(0)
+
+    if progress is not None:
+        await progress("phase", {"phase": "search", "seconds": time() - start})
+        await progress("search", {counter: getattr(propagator, counter) for counter in COUNTERS})
+    return answer
+
+
+async def solve_async(variables: List, formula: Formula, executor: str = "process", progress: Optional[Progress] = None,
+                      progress_interval: Optional[float] = PROGRESS_INTERVAL,
+                      slice_propagations: int = SLICE_PROPAGATIONS, slice_seconds: float = SLICE_SECONDS,
+                      **options) -> Mapping:
+    """
+    Solves `formula` like `solver.solve(variables, formula, **options)` without holding up the event loop, using the
+    `executor` in EXECUTORS. Cancelling the task stops the search: right away in a process, and after the current slice
+    of `slice_propagations` propagations or `slice_seconds` seconds in the cooperative search, which only takes the
+    options in COOPERATIVE_OPTIONS and checks `budget` between slices. `progress(event, data)`, if given, is awaited
+    with the events of a `stats.Stats` callback: the counters of the search at most every `progress_interval` seconds,
+    and the phases and counters of the run.
+    """
+    if executor not in EXECUTORS:
+        raise ValueError(f"Unknown executor {executor}")
+    if slice_propagations < 1 or slice_seconds <= 0:
+        raise ValueError("Slices need at least one propagation and a positive time")
+    if executor == "process":
+        return await solve_in_process(variables, formula, progress, progress_interval, options)
+    return await solve_cooperatively(variables, formula, progress, progress_interval, slice_propagations, slice_seconds,
+                                     options)
+
+
+class SolverPool:
+    """
+    Runs at most `jobs` searches of `solve_async` at a time; other requests wait for one of them to finish.
+    """
+    def __init__(self, jobs: int = multiprocessing.cpu_count()):
+        if jobs < 1:
+            raise ValueError(f"Need at least one job, got {jobs}")
+        self.slots = asyncio.Semaphore(jobs)
+
+    async def solve(self, variables: List, formula: Formula, **options) -> Mapping:
+        async with self.slots:
+            return await solve_async(variables, formula, **options)
+
+
+if __name__ == "__main__":
+    from generators import pigeonhole, planted
+    from solver import verify_assignment
+
+    async def main():
+        # Both executors answer like `solve`, and report progress along the way
+        variables, formula = planted(60, seed=1)
+        events = []
+
+        async def record(event: str, data: Dict) -> None:
+            events.append(event)
+
+        for executor in EXECUTORS:
+            events.clear()
+            answer = await solve_async(variables, formula, executor, progress=record, progress_interval=0.0)
+            assert(verify_assignment(answer, formula) and "search" in events)
+        _, pigeons = pigeonhole(4)
+        assert(await solve_async(list(range(1, 21)), pigeons) is None)
+        assert(await solve_async(list(range(1, 21)), pigeons, "cooperative", slice_propagations=50) is None)
+        assert(await solve_async(list(range(1, 21)), pigeons, budget=Budget(conflicts=0), preprocess={}) is UNKNOWN)
+        assert(await solve_async(list(range(1, 21)), pigeons, "cooperative", slice_propagations=10,
+                             budget=Budget(conflicts=0)) is UNKNOWN)
+
+        # A long search is cut off by its timeout in either executor, while other tasks keep running next to it
+        variables, pigeons = pigeonhole(9)
+        for executor in EXECUTORS:
+            ticks = []
+
+            async def tick():
+                while True:
+                    ticks.append(time())
+                    await asyncio.sleep(0.01)
+
+            ticker = asyncio.ensure_future(tick())
+            start = time()
+            try:
+                await asyncio.wait_for(solve_async(variables, pigeons, executor), 0.5)
+                assert(False)
+            except asyncio.TimeoutError:
+                pass
+            ticker.cancel()
+            assert(time() - start < 2.0)
+            assert(max(later - earlier for earlier, later in zip(ticks, ticks[1:])) < 0.2 and len(ticks) > 5)
+
+        # A pool of one job runs requests one after the other, and bad options are reported to the caller
+        pool = SolverPool(1)
+        _, pigeons = pigeonhole(3)
+        answers = await asyncio.gather(*(pool.solve(list(range(1, 13)), pigeons) for _ in range(3)))
+        assert(answers == [None, None, None])
+        for executor in EXECUTORS:
+            try:
+                await solve_async([], Formula(), executor, mode="unknown")
+                assert(False)
+            except ValueError:
+                pass
+
+    asyncio.run(main())
@@ -0,0 +1,255 @@
+import argparse
+import glob
+import hashlib
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import resource
+import sys
+from collections import deque
+from time import time
+from classes import Unknown
+from sat_io import read_input, OPENERS
+from formula_cache import load_formula
+from solver import solve, verify_assignment, MODES
+from stats import Stats
+from heuristics import HEURISTICS
+from restarts import RESTARTS
+from typing import Dict, Iterable, List, Mapping, Optional, Set, TextIO
+
+# Batch solving for sweeps over many instances. Every instance is solved in its own process, at most `jobs` at a
+# time, so an instance that runs out of time can be killed and one that runs out of memory only takes itself down.
+# Every finished instance is written out right away as one JSON line:
+#
+#     {"instance": "tests/sat/foo.cnf", "status": "SAT", "time": 0.042, "model_hash": "1f0e...", "stats": {...}}
+#
+# An interrupted sweep is resumed by pointing it at the same output file, which skips every instance already in it.
+
+SAT = "SAT"
+UNSAT = "UNSAT"
+UNKNOWN = "UNKNOWN"
+TIMEOUT = "TIMEOUT"
+MEMOUT = "MEMOUT"
+ERROR = "ERROR"
+
+# Files that are taken as instances when walking a directory; anything else given by name is read as a manifest
+CNF_SUFFIXES = (".cnf", ".dimacs")
+
+
+def is_cnf(path: str) -> bool:
+    root, extension = os.path.splitext(path)
+    if extension in OPENERS:
+        root, extension = os.path.splitext(root)
+    return extension in CNF_SUFFIXES
+
+
+def collect_instances(inputs: Iterable[str]) -> List[str]:
+    """
+    Expands every input into instance paths: a directory into every CNF file below it, a CNF file into itself, any
+    other file into the paths it lists one per line (relative to the manifest, with # comments), and anything else into
+    the paths matching it as a glob pattern. Each instance is listed once, in the order it was first found.
+    """
+    instances = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for directory, subdirectories, files in os.walk(item):
+                subdirectories.sort()
+                instances.extend(os.path.join(directory, name) for name in sorted(files) if is_cnf(name))
+        elif os.path.isfile(item) and is_cnf(item):
+            instances.append(item)
+        elif os.path.isfile(item):
+            with open(item) as manifest:
+                for line in manifest:
+                    line = line.split("#", 1)[0].strip()
+                    if line:
+                        instances.append(os.path.join(os.path.dirname(item), line))
+        else:
+            instances.extend(sorted(glob.glob(item, recursive=True)))
+
+    return list(dict.fromkeys(instances))
+
+
+def model_hash(assignment: Optional[Mapping]) -> Optional[str]:
+    """
+    Returns a short digest of `assignment` that does not depend on the order its variables are listed in.
+    """
+    if assignment is None:
+        return None
+    values = " ".join(("" if value else "-") + str(var) for var, value in sorted(assignment.items(), key=str))
+    return hashlib.sha256(values.encode()).hexdigest()[:16]
+
+
+def run_instance(path: str, options: Mapping, memory_limit: Optional[int],
+                 connection: multiprocessing.connection.Connection, formula_cache: bool = False,
+                 formula_cache_dir: Optional[str] = None) -> None:
+    """
+    Solves one instance in a child process and sends back its record, without the instance and time. With
+    `formula_cache`, the instance is loaded through its binary cache file (see `formula_cache`) in `formula_cache_dir`.
+    """
+    if memory_limit is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+    try:
+        stats = Stats()
+        with stats.phase("read_input"):
+            variables, formula = load_formula(path, formula_cache_dir) if formula_cache else read_input(path)
+        assignment = solve(variables, formula, stats=stats, **options)
+        if isinstance(assignment, Unknown):
+            record = {"status": UNKNOWN}
+        elif assignment is not None and not verify_assignment(assignment, formula):
+            record = {"status": ERROR, "error": "assignment does not satisfy the formula"}
+        else:
+            record = {"status": SAT if assignment is not None else UNSAT, "model_hash": model_hash(assignment)}
+        record["stats"] = {"variables": len(variables), "clauses": len(formula), **stats.to_dict()}
+    except MemoryError:
+        record = {"status": MEMOUT}
+    except Exception as error:
+        record = {"status": ERROR, "error": f"{type(error).__name__}: {error}"}
+
+    connection.send(record)
+
+
+def run_batch(instances: Iterable[str], output: TextIO, jobs: int = 1, timeout: Optional[float] = None,
+              memory_limit: Optional[int] = None, options: Mapping = {}, formula_cache: bool = False,
+              formula_cache_dir: Optional[str] = None) -> List[Dict]:
+    """
+    Solves `instances` with up to `jobs` processes at once, passing `options` on to `solve`. Each instance gets at most
+    `timeout` seconds and `memory_limit` bytes of address space. One JSON record per instance is written to `output`
+    as soon as it finishes, and the records are also returned in that order. With `formula_cache`, instances are
+    loaded through binary cache files, next to them or in `formula_cache_dir`, so a later sweep skips parsing them.
+    """
+    if jobs < 1:
+        raise ValueError(f"Need at least one job, got {jobs}")
+
+    pending = deque(instances)
+    running = {}  # process sentinel -> (process, result pipe, instance, start time)
+    records = []
+
+    while pending or running:
+        while pending and len(running) < jobs:
+            path = pending.popleft()
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=run_instance, daemon=True,
+                                              args=(path, options, memory_limit, sender, formula_cache,
+                                                    formula_cache_dir))
+            process.start()
+            sender.close()
+            running[process.sentinel] = (process, receiver, path, time())
+
+        wait = None
+        if timeout is not None:
+            wait = max(0.0, min(start for _, _, _, start in running.values()) + timeout - time())
+        ready = multiprocessing.connection.wait(list(running), wait)
+
+        now = time()
+        for sentinel, (process, receiver, path, start) in list(running.items()):
+            if sentinel in ready:
+                if receiver.poll():
+                    result = receiver.recv()
+                else:
+                    result = {"status": ERROR, "error": f"worker exited with code {process.exitcode}"}
+            elif timeout is not None and now - start >= timeout:
+                process.terminate()
+                result = {"status": TIMEOUT}
+            else:
+                continue
+
+            process.join()
+            receiver.close()
+            del running[sentinel]
+
+            record = {"instance": path, "status": result.pop("status"), "time": round(now - start, 3)}
+            record.update(result)
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+            records.append(record)
+
+    return records
+
+
+def recorded_instances(path: str) -> Set[str]:
+    """
+    Returns the instances that already have a record in the JSONL file at `path`. A truncated last line, as left by an
+    interrupted sweep, is ignored.
+    """
+    recorded = set()
+    if not os.path.exists(path):
+        return recorded
+    with open(path) as records:
+        for line in records:
+            try:
+                recorded.add(json.loads(line)["instance"])
+            except (ValueError, KeyError):
+                continue
+    return recorded
+
+
+if __name__ == "__main__" and len(sys.argv) == 1:
+    import tempfile
+
+    assert(is_cnf("foo.cnf") and is_cnf("foo.cnf.xz") and not is_cnf("foo.txt"))
+    assert(model_hash({1: True, 2: False}) == model_hash({2: False, 1: True}) != model_hash({1: True, 2: True}))
+
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "sat.cnf"), "w") as f:
+            f.write("p cnf 2 2\n1 2 0\n-1 0\n")
+        with open(os.path.join(directory, "unsat.cnf"), "w") as f:
+            f.write("p cnf 1 2\n1 0\n-1 0\n")
+        with open(os.path.join(directory, "manifest.txt"), "w") as f:
+            f.write("# both instances\nsat.cnf\nunsat.cnf\n")
+
+        manifest = os.path.join(directory, "manifest.txt")
+        assert(collect_instances([manifest]) == collect_instances([directory]) ==
+               collect_instances([os.path.join(directory, "*.cnf")]))
+
+        results = os.path.join(directory, "results.jsonl")
+        with open(results, "w") as output:
+            records = run_batch(collect_instances([directory]), output, jobs=2)
+        assert(sorted(record["status"] for record in records) == [SAT, UNSAT])
+        assert(recorded_instances(results) == set(collect_instances([directory])))
+
+        # The second sweep through the formula cache loads the same instances from their cache files
+        cache_dir = os.path.join(directory, "cache")
+        for _ in range(2):
+            with open(results, "w") as output:
+                cached = run_batch(collect_instances([directory]), output, formula_cache=True,
+                                   formula_cache_dir=cache_dir)
+            assert(sorted(record["status"] for record in cached) == [SAT, UNSAT])
+            assert(len(os.listdir(cache_dir)) == 2)
+
+        # Refuting the pigeonhole instance takes longer than this
+        with open(results, "a") as output:
+            records = run_batch(["tests/unsat/pigeon.cnf"], output, timeout=0.01, options={"preprocess": {}})
+        assert(records[0]["status"] == TIMEOUT)
+
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+    parser = argparse.ArgumentParser(description="Solves many DIMACS CNF files and writes one JSON line per instance")
+    parser.add_argument("inputs", nargs="+", help="directories, CNF files, manifests listing CNF files, or globs")
+    parser.add_argument("--jobs", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--timeout", type=float, default=None, help="seconds per instance")
+    parser.add_argument("--memory", type=int, default=None, help="megabytes of address space per instance")
+    parser.add_argument("--output", default=None, help="JSONL file to append records to (default: standard output)")
+    parser.add_argument("--resume", action="store_true", help="skip the instances already recorded in --output")
+    parser.add_argument("--mode", choices=MODES, default="cdcl")
+    parser.add_argument("--heuristic", choices=list(HEURISTICS), default="vsids")
+    parser.add_argument("--restart", choices=list(RESTARTS), default="luby")
+    parser.add_argument("--formula-cache", action="store_true",
+                        help="load instances through binary cache files written next to them on the first load")
+    parser.add_argument("--formula-cache-dir", default=None, help="directory for the cache files (implies "
+                        "--formula-cache)")
+    args = parser.parse_args()
+
+    instances = collect_instances(args.inputs)
+    if args.resume:
+        if args.output is None:
+            parser.error("--resume needs --output")
+        done = recorded_instances(args.output)
+        instances = [instance for instance in instances if instance not in done]
+
+    output = open(args.output, "a" if args.resume else "w") if args.output else sys.stdout
+    memory_limit = args.memory * 1024 * 1024 if args.memory is not None else None
+    run_batch(instances, output, args.jobs, args.timeout, memory_limit,
+              {"mode": args.mode, "heuristic": args.heuristic, "restart": args.restart},
+              args.formula_cache or args.formula_cache_dir is not None, args.formula_cache_dir)
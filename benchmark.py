@@ -0,0 +1,171 @@
+import argparse
+import itertools
+import json
+import math
+import random
+import statistics
+import sys
+from time import perf_counter
+from generators import generate
+from solver import solve, verify_assignment
+from stats import Stats
+from typing import Dict, List, Mapping, Sequence, Tuple
+
+# Performance regression tracking. Every benchmark is one generated instance solved by one configuration of `solve`,
+# repeated a few times, and each run is measured by its wall time, its number of decisions and its propagations per
+# second. `record` saves the samples to a baseline file; `compare` measures again and flags every metric that got
+# worse by more than a minimum relative change with a permutation test saying the change is unlikely to be noise.
+
+# (family, size, seed) of every instance in the suite, sized so that the whole suite takes seconds, not minutes
+SUITE = [
+    ("random", 100, 1),
+    ("random", 120, 2),
+    ("planted", 140, 1),
+    ("pigeonhole", 6, 0),
+    ("coloring", 100, 1),
+    ("parity", 90, 1)
+]
+
+# Keyword arguments of `solve` for every configuration the suite is run with
+CONFIGS = {
+    "default": {},
+    "glucose": {"restart": "glucose"},
+    "dpll": {"mode": "dpll"}
+}
+
+# Metric -> whether larger values are better
+METRICS = {"time": False, "decisions": False, "propagations_per_second": True}
+
+# A metric only counts as regressed if its median got worse by this fraction, and the permutation test agrees
+MIN_CHANGE = 0.05
+SIGNIFICANCE = 0.05
+
+# Above this many ways to split the samples, the permutation test samples splits instead of trying all of them
+EXACT_PERMUTATIONS = 20000
+
+
+def measure(family: str, size: int, seed: int, config: Mapping, repeats: int) -> Dict[str, List[float]]:
+    """
+    Solves the generated instance `repeats` times with `config` and returns the samples of every metric.
+    """
+    variables, formula = generate(family, size, seed)
+    samples = {metric: [] for metric in METRICS}
+    for _ in range(repeats):
+        stats = Stats()
+        start = perf_counter()
+        assignment = solve(variables, formula, stats=stats, **config)
+        elapsed = perf_counter() - start
+        if assignment is not None and not verify_assignment(assignment, formula):
+            raise ValueError(f"Wrong assignment for {family} {size} {seed} with {config}")
+
+        samples["time"].append(elapsed)
+        samples["decisions"].append(stats.counters["decisions"])
+        samples["propagations_per_second"].append(stats.counters["propagations"] / elapsed)
+    return samples
+
+
+def run_suite(suite: Sequence[Tuple[str, int, int]] = SUITE, configs: Mapping[str, Mapping] = CONFIGS,
+              repeats: int = 5) -> Dict[str, Dict[str, List[float]]]:
+    """
+    Measures every instance of `suite` with every configuration in `configs`. Results are keyed by
+    "config/family-size-seed".
+    """
+    results = {}
+    for name, config in configs.items():
+        for family, size, seed in suite:
+            results[f"{name}/{family}-{size}-{seed}"] = measure(family, size, seed, config, repeats)
+    return results
+
+
+def permutation_p_value(baseline: Sequence[float], current: Sequence[float], seed: int = 0) -> float:
+    """
+    One-sided permutation test: the probability that splitting the pooled samples at random makes the mean of the
+    `current` side at least as much larger than the `baseline` side as it actually is. Small values mean `current`
+    really is larger.
+    """
+    pooled = list(baseline) + list(current)
+    size = len(current)
+    observed = sum(current) / size - sum(baseline) / len(baseline)
+    total = sum(pooled)
+
+    def difference(chosen: Sequence[float]) -> float:
+        chosen_sum = sum(chosen)
+        return chosen_sum / size - (total - chosen_sum) / len(baseline)
+
+    if math.comb(len(pooled), size) <= EXACT_PERMUTATIONS:
+        differences = [difference(chosen) for chosen in itertools.combinations(pooled, size)]
+    else:
+        rng = random.Random(seed)
+        differences = [difference(rng.sample(pooled, size)) for _ in range(EXACT_PERMUTATIONS)]
+
+    # Allow for floating-point noise, so identical samples are not split by rounding
+    return sum(1 for value in differences if value >= observed - 1e-12 * max(1.0, abs(observed))) / len(differences)
+
+
+def regressions(baseline: Mapping[str, Mapping[str, List[float]]],
+                current: Mapping[str, Mapping[str, List[float]]]) -> List[str]:
+    """
+    Compares every benchmark measured in both `baseline` and `current` and describes each metric that regressed.
+    """
+    found = []
+    for benchmark in sorted(set(baseline) & set(current)):
+        for metric, larger_is_better in METRICS.items():
+            before, after = baseline[benchmark][metric], current[benchmark][metric]
+            old, new = statistics.median(before), statistics.median(after)
+            if larger_is_better:
+                before, after = [-value for value in before], [-value for value in after]
+                change = (old - new) / old if old else 0.0
+            else:
+                change = (new - old) / old if old else 0.0
+            if change < MIN_CHANGE:
+                continue
+
+            p_value = permutation_p_value(before, after)
+            if p_value < SIGNIFICANCE:
+                found.append(f"{benchmark} {metric}: {old:.4g} -> {new:.4g} ({change:+.1%} worse, p = {p_value:.3f})")
+    return found
+
+
+if __name__ == "__main__" and len(sys.argv) == 1:
+    # Clearly separated samples are significant, overlapping ones are not
+    assert(permutation_p_value([1.0, 1.1, 0.9, 1.0, 1.05], [2.0, 2.1, 1.9, 2.0, 2.05]) < 0.01)
+    assert(permutation_p_value([1.0, 2.0, 1.5, 1.2, 1.8], [1.1, 1.9, 1.4, 1.3, 1.7]) > 0.2)
+    assert(permutation_p_value([10] * 5, [12] * 5) < 0.01)
+
+    baseline = {"default/x": {"time": [1.0, 1.1, 0.9, 1.0, 1.05], "decisions": [100] * 5,
+                              "propagations_per_second": [5000.0] * 5}}
+    slower = {"default/x": {"time": [2.0, 2.1, 1.9, 2.0, 2.05], "decisions": [100] * 5,
+                            "propagations_per_second": [4000.0] * 5}}
+    found = regressions(baseline, slower)
+    assert(len(found) == 2 and "time" in found[0] and "propagations_per_second" in found[1])
+    assert(regressions(slower, baseline) == [])
+
+    results = run_suite([("planted", 30, 1)], {"default": {}}, repeats=2)
+    assert(list(results) == ["default/planted-30-1"] and len(results["default/planted-30-1"]["time"]) == 2)
+
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+    parser = argparse.ArgumentParser(description="Benchmarks the solver on generated instances")
+    parser.add_argument("command", choices=["record", "compare"],
+                        help="record saves a new baseline, compare checks the current code against it")
+    parser.add_argument("--baseline", default="benchmark_baseline.json")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--configs", default=",".join(CONFIGS), help=f"comma-separated subset of {', '.join(CONFIGS)}")
+    args = parser.parse_args()
+
+    configs = {name: CONFIGS[name] for name in args.configs.split(",")}
+    results = run_suite(SUITE, configs, args.repeats)
+    for benchmark, samples in results.items():
+        medians = {metric: statistics.median(values) for metric, values in samples.items()}
+        print(f"{benchmark:32} {medians['time']:8.3f}s {medians['decisions']:8.0f} decisions "
+              f"{medians['propagations_per_second']:10.0f} propagations/s")
+
+    if args.command == "record":
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=1)
+    else:
+        with open(args.baseline) as f:
+            found = regressions(json.load(f), results)
+        for line in found:
+            print(f"REGRESSION {line}")
+        sys.exit(1 if found else 0)
@@ -0,0 +1,123 @@
+import resource
+from time import time
+from typing import Dict, Optional
+
+# Cooperative resource budgets for the search. The search checks its budget at every decision and conflict and gives
+# up with BudgetExhausted once any limit is passed, which `solver.solve` turns into the UNKNOWN result. Unlike killing
+# the process, this leaves the statistics gathered so far intact.
+
+# Reading the resident memory costs a system call, so it is only done once per this many checks
+MEMORY_CHECK_INTERVAL = 256
+
+
+class BudgetExhausted(Exception):
+    """
+    Raised when a search runs out of the budget it was given before deciding the formula.
+    """
+
+
+class Budget:
+    """
+    Limits on one search: wall-clock `seconds`, numbers of `decisions`, `conflicts` and `propagations`, and `memory`,
+    the peak resident memory of the process in megabytes. Every limit left as None is unlimited. Time and counters are
+    measured from `begin`, which the search calls when it starts. The search also gives up once the event `stop` (a
+    `threading.Event` or `multiprocessing.Event`) is set, e.g. because another search has already answered.
+    """
+    def __init__(self, seconds: Optional[float] = None, decisions: Optional[int] = None,
+                 conflicts: Optional[int] = None, propagations: Optional[int] = None, memory: Optional[float] = None,
+                 stop=None):
+        self.seconds = seconds
+        self.limits: Dict[str, int] = {counter: limit for counter, limit in
+                                       (("decisions", decisions), ("conflicts", conflicts),
+                                        ("propagations", propagations)) if limit is not None}
+        self.memory = memory
+        self.stop = stop
+        self.start = time()
+        self.baseline: Dict[str, int] = {}
+        self.checks = 0
+
+    def begin(self, propagator) -> None:
+        self.start = time()
+        self.baseline = {counter: getattr(propagator, counter) for counter in self.limits}
+        self.checks = 0
+
+    def check(self, propagator) -> None:
+        """
+        Raises BudgetExhausted if the search on `propagator` has passed any of the limits.
+        """
+        if self.stop is not None and self.stop.is_set():
+            raise BudgetExhausted("Stopped")
+        for counter, limit in self.limits.items():
+            if getattr(propagator, counter) - self.baseline.get(counter, 0) > limit:
+                raise BudgetExhausted(f"Ran out of {counter} after {limit}")
+        if self.seconds is not None and time() - self.start > self.seconds:
+            raise BudgetExhausted(f"Ran out of time after {self.seconds}s")
+
+        self.checks += 1
+        if self.memory is not None and self.checks % MEMORY_CHECK_INTERVAL == 0:
+            # ru_maxrss is in kilobytes on Linux
+            used = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            if used > self.memory:
+                raise BudgetExhausted(f"Ran out of memory at {used:.0f}MB")
+
+
+if __name__ == "__main__":
+    class Counts:
+        decisions = 0
+        conflicts = 0
+        propagations = 0
+
+    counts = Counts()
+    budget = Budget(conflicts=2)
+    budget.begin(counts)
+    counts.conflicts = 2
+    budget.check(counts)
+    counts.conflicts = 3
+    try:
+        budget.check(counts)
+        assert(False)
+    except BudgetExhausted:
+        pass
+
+    # Counting starts over from wherever the counters are when the next search begins
+    budget.begin(counts)
+    budget.check(counts)
+
+    try:
+        Budget(seconds=-1.0).check(counts)
+        assert(False)
+    except BudgetExhausted:
+        pass
+
+    import threading
+    stop = threading.Event()
+    stopped = Budget(stop=stop)
+    stopped.check(counts)
+    stop.set()
+    try:
+        stopped.check(counts)
+        assert(False)
+    except BudgetExhausted:
+        pass
+
+    # The process is far past a megabyte, but only every MEMORY_CHECK_INTERVAL-th check looks
+    tiny = Budget(memory=1)
+    for _ in range(MEMORY_CHECK_INTERVAL - 1):
+        tiny.check(counts)
+    try:
+        tiny.check(counts)
+        assert(False)
+    except BudgetExhausted:
+        pass
+
+    # `solve` catches the BudgetExhausted of the imported module, which is not the one defined in this script
+    from budget import Budget
+    from classes import UNKNOWN
+    from generators import pigeonhole
+    from solver import solve
+
+    # Refuting 5 pigeons in 4 holes takes far more than 5 conflicts, in either search
+    variables, formula = pigeonhole(4)
+    for mode in ("cdcl", "dpll"):
+        assert(solve(variables, formula, mode=mode, preprocess={}, budget=Budget(conflicts=5)) is UNKNOWN)
+    assert(solve(variables, formula, preprocess={}, budget=Budget(seconds=60)) is None)
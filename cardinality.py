@@ -0,0 +1,76 @@
+from itertools import combinations
+from classes import Formula
+from typing import Dict, List
+
+# Recovers at-most-one constraints from their pairwise encoding. A binary clause (a or b) says that at most one of !a
+# and !b is True, so the binary clauses form a graph on literals in which every clique is an at-most-one constraint.
+# Replacing the n * (n - 1) / 2 clauses of a clique by one constraint that the propagator counts (see `propagation`)
+# cuts both the memory of the store and the work of propagating an assignment to the group.
+
+# Cliques smaller than this are left as clauses, since a constraint of two literals is just one clause
+MIN_GROUP_SIZE = 3
+
+
+def detect_at_most_one(formula: Formula, min_size: int = MIN_GROUP_SIZE) -> Formula:
+    """
+    Returns `formula` with groups of at least `min_size` literals that are pairwise excluded by binary clauses turned
+    into at-most-one constraints, and those binary clauses dropped. Cliques are grown greedily from the literal in the
+    most binary clauses, and every binary clause ends up in at most one group.
+    """
+    # The literals each literal excludes, with the index of the clause that does it
+    excludes: Dict[int, Dict[int, int]] = {}
+    for index in range(len(formula)):
+        if formula.clause_size(index) != 2:
+            continue
+        first, second = formula.clause(index)
+        if first != second and first != -second:
+            excludes.setdefault(-first, {})[-second] = index
+            excludes.setdefault(-second, {})[-first] = index
+
+    covered = set()
+    groups: List[List[int]] = []
+    for lit in sorted(excludes, key=lambda lit: len(excludes[lit]), reverse=True):
+        if len(excludes[lit]) + 1 < min_size:
+            continue
+        group = [lit]
+        for other in sorted(excludes[lit], key=lambda other: len(excludes[other]), reverse=True):
+            if all(other in excludes[member] for member in group):
+                group.append(other)
+        if len(group) < min_size:
+            continue
+
+        groups.append(group)
+        for first, second in combinations(group, 2):
+            covered.add(excludes[first].pop(second))
+            del excludes[second][first]
+
+    result = formula.derive()
+    for index in range(len(formula)):
+        if index not in covered:
+            result.add_clause(formula.clause(index), formula.clause_id(index))
+    result.copy_constraints(formula)
+    for group in groups:
+        result.add_at_most(group, 1)
+    return result
+
+
+if __name__ == "__main__":
+    from generators import pigeonhole
+    from solver import solve
+
+    # The pairwise clauses of every hole of the pigeonhole formula become one constraint
+    variables, pigeons = pigeonhole(4)
+    detected = detect_at_most_one(pigeons)
+    assert(detected.num_constraints() == 4 and len(detected) == 5)
+    assert(sorted(sorted(map(abs, detected.constraint(index))) for index in range(4)) ==
+           [[pigeon * 4 + hole + 1 for pigeon in range(5)] for hole in range(4)])
+    assert(solve(variables, detected) is None and solve(variables, detected, mode="dpll") is None)
+
+    # Two binary clauses are not enough for a group, and clauses outside every group stay
+    formula = Formula()
+    for var in range(1, 5):
+        formula.add_variable(var)
+    formula.add_clause([-1, -2])
+    formula.add_clause([-2, -3])
+    formula.add_clause([1, 2, 3, 4])
+    assert(detect_at_most_one(formula) == formula and detect_at_most_one(formula).num_constraints() == 0)
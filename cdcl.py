@@ -0,0 +1,262 @@
+from classes import Literal, Clause, Formula
+from propagation import Propagator
+from heuristics import Heuristic, VSIDS
+from restarts import RestartPolicy, NoRestarts
+from stats import Stats
+from budget import Budget, BudgetExhausted
+from proof import Proof
+from typing import List, Mapping, Optional, Sequence, Tuple
+
+# Conflict-driven clause learning on top of the watched-literal store in `propagation`. Every implied literal records
+# the clause that forced it, which makes the trail an implication graph that conflicts can be analyzed against.
+
+
+def analyze(propagator: Propagator, conflict: int, heuristic: Optional[Heuristic] = None) -> Tuple[List[int], int]:
+    """
+    Derives the first-UIP learned clause from the falsified clause `conflict`. Returns the learned clause, with its
+    asserting literal first and a literal from the backjump level second, together with the level to backjump to.
+    Every variable met along the way is bumped in `heuristic`.
+    """
+    seen = [False] * len(propagator.values)
+    levels = propagator.levels
+    current_level = propagator.decision_level()
+
+    learnt = [0]
+    pending = 0
+    index = len(propagator.trail) - 1
+    lit = None
+    clause = propagator.store.clause(conflict)
+
+    while True:
+        for other in clause:
+            var = abs(other)
+            if other == lit or seen[var] or levels[var] == 0:
+                continue
+            seen[var] = True
+            if heuristic is not None:
+                heuristic.bump(var)
+            if levels[var] == current_level:
+                pending += 1
+            else:
+                learnt.append(other)
+
+        # Walk back along the trail to the next literal of the current level that took part in the conflict
+        while not seen[abs(propagator.trail[index])]:
+            index -= 1
+        lit = propagator.trail[index]
+        index -= 1
+        seen[abs(lit)] = False
+        pending -= 1
+        if pending == 0:
+            break
+        clause = propagator.store.clause(propagator.reasons[abs(lit)])
+
+    learnt[0] = -lit
+    learnt = minimize(propagator, learnt, seen)
+
+    if len(learnt) == 1:
+        return learnt, 0
+
+    # Move the literal with the highest level behind the asserting literal so both can be watched after the backjump
+    deepest = max(range(1, len(learnt)), key=lambda i: levels[abs(learnt[i])])
+    learnt[1], learnt[deepest] = learnt[deepest], learnt[1]
+    return learnt, levels[abs(learnt[1])]
+
+
+def minimize(propagator: Propagator, learnt: List[int], seen: List[bool]) -> List[int]:
+    """
+    Drops every literal of `learnt` (other than the asserting one) whose reason clause only contains literals that are
+    already in `learnt` or fixed at level 0. `seen` marks the variables of `learnt`.
+    """
+    kept = [learnt[0]]
+    for lit in learnt[1:]:
+        reason = propagator.reasons[abs(lit)]
+        if reason is None:
+            kept.append(lit)
+            continue
+
+        for other in propagator.store.clause(reason):
+            var = abs(other)
+            if var != abs(lit) and not seen[var] and propagator.levels[var] > 0:
+                kept.append(lit)
+                break
+
+    return kept
+
+
+def analyze_final(propagator: Propagator, lit: int) -> List[int]:
+    """
+    Called when the assumption `lit` is found False while the earlier assumptions are decided. Returns `lit` together
+    with every earlier assumption that the implication graph traces its falsification back to.
+    """
+    failed = [lit]
+    if propagator.levels[abs(lit)] == 0:
+        return failed
+
+    seen = {abs(lit)}
+    levels = propagator.levels
+    for index in range(len(propagator.trail) - 1, propagator.trail_lim[0] - 1, -1):
+        trail_lit = propagator.trail[index]
+        if abs(trail_lit) not in seen:
+            continue
+        reason = propagator.reasons[abs(trail_lit)]
+        if reason is None:
+            failed.append(trail_lit)
+        else:
+            for other in propagator.store.clause(reason):
+                if levels[abs(other)] > 0:
+                    seen.add(abs(other))
+
+    return failed
+
+
+def cdcl_solve(propagator: Propagator, heuristic: Optional[Heuristic] = None,
+               restarts: Optional[RestartPolicy] = None, exchange=None,
+               budget: Optional[Budget] = None, assumptions: Sequence[int] = (),
+               stats: Optional[Stats] = None, proof: Optional[Proof] = None, begin: bool = True) -> Optional[Mapping]:
+    """
+    Searches for a satisfying assignment of the formula in `propagator` with conflict-driven clause learning. Each
+    conflict is analyzed into a learned clause, after which the search backjumps to the level where that clause
+    becomes unit. Decisions come from `heuristic` (VSIDS by default), and the search goes back to level 0 whenever
+    `restarts` asks for it (never by default). Returns the satisfying assignment, or None if the formula is UNSAT.
+
+    `exchange`, if given, shares learned clauses with other searches on the same formula: every learned clause is
+    offered to `exchange.export`, and the clauses returned by `exchange.receive` are added at each restart.
+
+    Raises BudgetExhausted once the search has run out of `budget`, which is checked at every conflict and decision.
+    The budget is measured from the start of this call, unless `begin` is off to keep counting from an earlier call.
+    `stats` is told about every conflict, so it can report progress.
+
+    The literals of `assumptions` are decided first, one per level, so everything learned stays valid without them. If
+    the formula is UNSAT under the assumptions, `propagator.failed` is set to the assumptions responsible; it is empty
+    when the formula is UNSAT on its own, in which case `propagator.ok` is cleared as well.
+
+    Every learned clause is written to `proof`, if given, followed by the empty clause when the formula is UNSAT on its
+    own.
+    """
+    propagator.failed = []
+    if not propagator.ok:
+        if proof is not None:
+            proof.add([])
+        return None
+    heuristic = heuristic if heuristic is not None else VSIDS()
+    restarts = restarts if restarts is not None else NoRestarts()
+    propagator.heuristic = heuristic
+    if budget is not None and begin:
+        budget.begin(propagator)
+
+    while True:
+        conflict = propagator.propagate()
+        if conflict is not None:
+            if propagator.decision_level() == 0:
+                propagator.ok = False
+                if proof is not None:
+                    proof.add([])
+                return None
+            if stats is not None:
+                stats.on_conflict(propagator)
+            if budget is not None:
+                budget.check(propagator)
+            learnt, level = analyze(propagator, conflict, heuristic)
+            heuristic.decay()
+            lbd = len({propagator.levels[abs(lit)] for lit in learnt})
+            propagator.backtrack(level)
+            propagator.learn(learnt)
+            if proof is not None:
+                proof.add(learnt)
+            if exchange is not None:
+                exchange.export(learnt)
+            if restarts.on_conflict(lbd):
+                propagator.restarts += 1
+                propagator.backtrack(0)
+                if exchange is not None:
+                    for clause in exchange.receive():
+                        if not propagator.add_clause(clause):
+                            return None
+        else:
+            lit = None
+            while propagator.decision_level() < len(assumptions):
+                assumption = assumptions[propagator.decision_level()]
+                value = propagator.value(assumption)
+                if value is None:
+                    lit = assumption
+                    break
+                if value is False:
+                    propagator.failed = analyze_final(propagator, assumption)
+                    return None
+                # Already implied, but it keeps its own level so the levels still line up with `assumptions`
+                propagator.new_decision_level()
+
+            if lit is None:
+                lit = heuristic.pick(propagator)
+                if lit is None:
+                    return propagator.assignment()
+            if budget is not None:
+                budget.check(propagator)
+            propagator.decide(lit)
+
+
+if __name__ == "__main__":
+    # (x or y) and (x or !y) and (!x or z) and (!x or !z) is UNSAT
+    unsat = Propagator([1, 2, 3], Formula.from_clauses([
+        Clause("foo", [Literal(1, True), Literal(2, True)]),
+        Clause("bar", [Literal(1, True), Literal(2, False)]),
+        Clause("baz", [Literal(1, False), Literal(3, True)]),
+        Clause("buzz", [Literal(1, False), Literal(3, False)])
+    ]))
+    assert(cdcl_solve(unsat) is None)
+
+    # Deciding x makes (!x or !y or z) and (!x or !y or !z) conflict once y is decided; the first UIP is y, so the
+    # learned clause is (!x or !y) and the search backjumps to x's level
+    learner = Propagator([1, 2, 3], Formula.from_clauses([
+        Clause("foo", [Literal(1, False), Literal(2, False), Literal(3, True)]),
+        Clause("bar", [Literal(1, False), Literal(2, False), Literal(3, False)])
+    ]))
+    learner.decide(1)
+    assert(learner.propagate() is None)
+    learner.decide(2)
+    conflict = learner.propagate()
+    assert(conflict is not None)
+    assert(analyze(learner, conflict) == ([-2, -1], 1))
+
+    # (x or y) and (!x) is SAT with y forced
+    assert(cdcl_solve(Propagator([1, 2], Formula.from_clauses([
+        Clause("foo", [Literal(1, True), Literal(2, True)]),
+        Clause("bar", [Literal(1, False)])
+    ]))) == {1: False, 2: True})
+
+    # The pigeonhole formula for 3 pigeons in 2 holes has no units, so refuting it takes a conflict above level 0
+    pigeons = Formula.from_clauses(
+        [Clause(p, [Literal(2 * p + h, True) for h in (1, 2)]) for p in range(3)] +
+        [Clause(f"{h}{p}{q}", [Literal(2 * p + h, False), Literal(2 * q + h, False)])
+         for h in (1, 2) for p in range(3) for q in range(p + 1, 3)]
+    )
+    try:
+        cdcl_solve(Propagator(list(range(1, 7)), pigeons), budget=Budget(conflicts=0))
+        assert(False)
+    except BudgetExhausted:
+        pass
+    assert(cdcl_solve(Propagator(list(range(1, 7)), pigeons)) is None)
+
+    # Refuting them again with a proof writes every learned clause and then the empty clause, which checks out
+    import os
+    import tempfile
+    from proof import check_proof, read_proof
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "pigeons.drat")
+        with Proof(path) as proof:
+            refuter = Propagator(list(range(1, 7)), pigeons)
+            assert(cdcl_solve(refuter, proof=proof) is None)
+        steps = list(read_proof(path))
+        assert(len(steps) == refuter.learned + 1 and steps[-1] == (False, []))
+        assert(check_proof(pigeons, path))
+
+    # Under the assumptions y and z, (!x or !y) and (x or !z) conflict; w plays no part in it
+    assumed = Propagator([1, 2, 3, 4], Formula.from_clauses([
+        Clause("foo", [Literal(1, False), Literal(2, False)]),
+        Clause("bar", [Literal(1, True), Literal(3, False)])
+    ]))
+    assert(cdcl_solve(assumed, assumptions=[4, 2, 3]) is None)
+    assert(sorted(assumed.failed) == [2, 3] and assumed.ok)
+    assumed.backtrack(0)
+    assert(cdcl_solve(assumed, assumptions=[4, 2])[3] is False)
@@ -1,7 +1,11 @@
-from typing import List, Mapping
+from array import array
+from itertools import combinations
+from typing import Iterable, Iterator, List, Mapping, Optional
 
 
 class Literal:
+    __slots__ = ("name", "sign")
+
     def __init__(self, name: int, sign: bool):
         self.name = name  # integer
         self.sign = sign  # boolean
@@ -19,6 +23,8 @@ class Literal:
 
 
 class Clause:
+    __slots__ = ("id", "literals")
+
     def __init__(self, id, literals: List[Literal]):
         self.id = id
         self.literals = literals
@@ -57,3 +63,287 @@ if __name__ == "__main__":
     assert(two_vars_one_expr.eval(mapping_one))
     assert (not two_vars_one_expr.eval(mapping_two))
     assert(two_vars_one_expr.eval(mapping_four))
+
+
+class AtMost:
+    """
+    A cardinality constraint: at most `bound` of `literals` are True.
+    """
+    __slots__ = ("literals", "bound")
+
+    def __init__(self, literals: List[Literal], bound: int):
+        self.literals = literals
+        self.bound = bound
+
+    def __repr__(self):
+        return f"{str(self.literals)} <= {self.bound}"
+
+    def eval(self, assignments: Mapping[int, bool]) -> bool:
+        true = 0
+        for literal in self.literals:
+            value = assignments.get(literal.name)
+            if value is None:
+                raise ValueError(f"No assignment for constraint literal {literal.name}")
+            true += not (literal.sign ^ value)
+
+        return true <= self.bound
+
+
+if __name__ == "__main__":
+    at_most_one = AtMost([Literal(1, True), Literal(2, True), Literal(3, False)], 1)
+    assert(at_most_one.eval({1: True, 2: False, 3: True}))
+    assert(not at_most_one.eval({1: True, 2: False, 3: False}))
+
+
+# The flat arrays of a `Formula` and their typecodes
+ARRAYS = [("lits", "i"), ("offsets", "q"), ("constraint_lits", "i"), ("constraint_offsets", "q"), ("bounds", "i")]
+
+
+def copy_array(values, typecode: str) -> array:
+    """
+    Returns a copy of `values`, an array or a memoryview cast to `typecode`, as an array.
+    """
+    copy = array(typecode)
+    copy.frombytes(memoryview(values).cast("B"))
+    return copy
+
+
+class Formula:
+    """
+    A CNF formula stored as one flat buffer of signed integer literals (+v / -v, as in DIMACS) plus the offset at which
+    each clause starts. Variable names are numbered 1..n in order of registration, and `Clause`/`Literal` objects are
+    only created as views when a caller iterates or indexes the formula.
+
+    Alongside the clauses, a formula can hold cardinality constraints "at most k of these literals are True", stored
+    the same way with one bound per constraint. Iterating, indexing and `len` only cover the clauses; code that only
+    understands clauses can work on `clausal()` instead.
+
+    A formula loaded from a cache file (see `formula_cache`) holds read-only memoryviews of the mapped file instead of
+    arrays, which are copied into arrays of its own the first time it is added to.
+    """
+    def __init__(self, names: Optional[List] = None, indices: Optional[dict] = None):
+        self.lits = array("i")
+        self.offsets = array("q", [0])
+        self.ids: Optional[List] = None  # None while every clause id is just its position
+
+        self.constraint_lits = array("i")
+        self.constraint_offsets = array("q", [0])
+        self.bounds = array("i")
+
+        # Formulas derived from one another share a variable numbering
+        self.names: List = names if names is not None else [None]
+        self.indices: dict = indices if indices is not None else {}
+
+    @classmethod
+    def from_clauses(cls, clauses: Iterable[Clause]) -> "Formula":
+        formula = cls()
+        for clause in clauses:
+            formula.add_clause([formula.to_int(literal) for literal in clause.literals], clause.id)
+        return formula
+
+    def derive(self) -> "Formula":
+        """
+        Returns an empty formula that shares this formula's variable numbering.
+        """
+        return Formula(self.names, self.indices)
+
+    def add_variable(self, name) -> int:
+        """
+        Registers the variable `name` and returns its index. Registering a known variable is a no-op.
+        """
+        index = self.indices.get(name)
+        if index is None:
+            index = len(self.names)
+            self.names.append(name)
+            self.indices[name] = index
+        return index
+
+    def num_vars(self) -> int:
+        return len(self.names) - 1
+
+    def to_int(self, literal: Literal) -> int:
+        index = self.add_variable(literal.name)
+        return index if literal.sign else -index
+
+    def to_literal(self, lit: int) -> Literal:
+        return Literal(self.names[abs(lit)], lit > 0)
+
+    def add_clause(self, lits: Iterable[int], id=None) -> int:
+        """
+        Appends the clause made of the integer literals `lits` and returns its index. `id` defaults to that index.
+        """
+        index = len(self)
+        if id is not None and id != index and self.ids is None:
+            self.ids = list(range(index))
+        if self.ids is not None:
+            self.ids.append(index if id is None else id)
+
+        if not isinstance(self.lits, array):
+            self.own_arrays()
+        self.lits.extend(lits)
+        self.offsets.append(len(self.lits))
+        return index
+
+    def clause(self, index: int) -> array:
+        """
+        Returns the integer literals of the clause at `index`.
+        """
+        return self.lits[self.offsets[index]:self.offsets[index + 1]]
+
+    def clause_size(self, index: int) -> int:
+        return self.offsets[index + 1] - self.offsets[index]
+
+    def clause_id(self, index: int):
+        return index if self.ids is None else self.ids[index]
+
+    def add_at_most(self, lits: Iterable[int], bound: int) -> None:
+        """
+        Adds the constraint that at most `bound` of the integer literals `lits` are True. A literal and its negation
+        together always contribute exactly one True literal, so they are dropped and the bound lowered. Constraints
+        that say as much as clauses do are added as those clauses: with a bound of 0 every literal is False, with one
+        less than the number of literals one of them is False, and with a negative bound the formula is UNSAT.
+        """
+        kept = {}  # ordered set
+        for lit in lits:
+            if -lit in kept:
+                del kept[-lit]
+                bound -= 1
+            elif lit in kept:
+                raise ValueError(f"Literal {lit} appears twice in a cardinality constraint")
+            else:
+                kept[lit] = None
+
+        if bound < 0:
+            self.add_clause([])
+        elif bound == 0:
+            for lit in kept:
+                self.add_clause([-lit])
+        elif bound == len(kept) - 1:
+            self.add_clause([-lit for lit in kept])
+        elif bound < len(kept):
+            if not isinstance(self.constraint_lits, array):
+                self.own_arrays()
+            self.constraint_lits.extend(kept)
+            self.constraint_offsets.append(len(self.constraint_lits))
+            self.bounds.append(bound)
+
+    def num_constraints(self) -> int:
+        return len(self.bounds)
+
+    def constraint(self, index: int) -> array:
+        """
+        Returns the integer literals of the cardinality constraint at `index`; its bound is `bounds[index]`.
+        """
+        return self.constraint_lits[self.constraint_offsets[index]:self.constraint_offsets[index + 1]]
+
+    def constraints(self) -> Iterator[AtMost]:
+        for index in range(self.num_constraints()):
+            yield AtMost([self.to_literal(lit) for lit in self.constraint(index)], self.bounds[index])
+
+    def constraint_clauses(self, index: int) -> Iterator[List[int]]:
+        """
+        Yields the clauses of the direct encoding of the constraint at `index`: one clause forbidding every set of one
+        more True literals than the bound allows. For at-most-one, these are the usual pairwise clauses.
+        """
+        for subset in combinations(self.constraint(index), self.bounds[index] + 1):
+            yield [-lit for lit in subset]
+
+    def copy_constraints(self, other: "Formula") -> None:
+        """
+        Adds every cardinality constraint of `other`, which shares this formula's variable numbering.
+        """
+        for index in range(other.num_constraints()):
+            self.add_at_most(other.constraint(index), other.bounds[index])
+
+    def clausal(self) -> "Formula":
+        """
+        Returns this formula with every cardinality constraint replaced by its direct encoding, which grows with the
+        binomial coefficient of its size and bound.
+        """
+        result = self.derive()
+        for index in range(len(self)):
+            result.add_clause(self.clause(index), self.clause_id(index))
+        for index in range(self.num_constraints()):
+            for clause in self.constraint_clauses(index):
+                result.add_clause(clause)
+        return result
+
+    def own_arrays(self) -> None:
+        """
+        Replaces the memoryviews of a mapped cache file by copies that can grow.
+        """
+        for name, typecode in ARRAYS:
+            if not isinstance(getattr(self, name), array):
+                setattr(self, name, copy_array(getattr(self, name), typecode))
+
+    def __getstate__(self):
+        # Memoryviews can't be pickled, so another process gets copies
+        state = dict(self.__dict__)
+        for name, typecode in ARRAYS:
+            if not isinstance(state[name], array):
+                state[name] = copy_array(state[name], typecode)
+        return state
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> Clause:
+        return Clause(self.clause_id(index), [self.to_literal(lit) for lit in self.clause(index)])
+
+    def __iter__(self) -> Iterator[Clause]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def __eq__(self, other):
+        if isinstance(other, Formula) or isinstance(other, list):
+            return list(self) == list(other)
+        return False
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+if __name__ == "__main__":
+    # (!x or y) and (y) round-trips through the flat buffer
+    clauses = [Clause("foo", [Literal(1, False), Literal(2, True)]), Clause("bar", [Literal(2, True)])]
+    formula = Formula.from_clauses(clauses)
+    assert(list(formula.lits) == [-1, 2, 2])
+    assert(list(formula.offsets) == [0, 2, 3])
+    assert(formula == clauses)
+    assert(formula[0].literals == clauses[0].literals)
+
+    # Positional ids are not stored
+    positional = Formula()
+    positional.add_variable(1)
+    positional.add_variable(2)
+    positional.add_clause([1, -2])
+    assert(positional.ids is None and positional[0].id == 0)
+
+    # At most two of x, y, z and w is a constraint of its own, while at most two of x, y and z is one clause
+    positional.add_variable(3)
+    positional.add_variable(4)
+    positional.add_at_most([1, 2, 3, 4], 2)
+    positional.add_at_most([1, 2, 3], 2)
+    positional.add_at_most([1, -1, 2], 0)
+    assert(positional.num_constraints() == 1 and list(positional.constraint(0)) == [1, 2, 3, 4])
+    assert(list(positional.clause(1)) == [-1, -2, -3] and list(positional.clause(2)) == [])
+    assert(len(positional.clausal()) == len(positional) + 4)
+    assert(next(positional.constraints()).eval({1: True, 2: False, 3: True, 4: False}))
+
+
+class Unknown:
+    """
+    The result of a solve that gave up before deciding the formula, e.g. because it ran out of its budget. Solvers
+    return the single instance UNKNOWN, alongside an assignment for SAT and None for UNSAT.
+    """
+    __slots__ = ()
+
+    def __repr__(self):
+        return "UNKNOWN"
+
+    def __reduce__(self):
+        # Unpickled in another process, it is still the single instance
+        return "UNKNOWN"
+
+
+UNKNOWN = Unknown()
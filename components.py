@@ -0,0 +1,327 @@
+import hashlib
+import multiprocessing
+from collections import OrderedDict
+from functools import partial
+from itertools import chain
+from budget import Budget
+from classes import Literal, Clause, Formula
+from propagation import Propagator
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+
+# Decomposition into variable-disjoint components. Two clauses are in the same component when they share a variable,
+# directly or through other clauses, and a formula is satisfiable exactly when each of its components is. Searching the
+# components one at a time adds their search spaces together instead of multiplying them.
+#
+# `solver.solve` splits the formula once up front, after preprocessing has fixed what it can, and solves every
+# component on its own (in parallel with several jobs). The DPLL search splits again as it assigns variables, using
+# `residual_components` on what is left of the formula (see `solver.partial_solve`). The answer for every component is
+# cached under a hash of its clauses with the variables renamed in order of appearance, so a component seen before,
+# even under other variable names, is answered without searching.
+
+# Components with fewer variables than this are solved together, since every separate search has its own setup cost
+MIN_COMPONENT_SIZE = 8
+
+# Number of component answers a ComponentCache keeps by default
+CACHE_SIZE = 1024
+
+# State of a pool process, set once when it starts
+context = {}
+
+
+def find(parent: List[int], var: int) -> int:
+    """
+    Returns the representative of `var` in the union-find forest `parent`, halving the path along the way.
+    """
+    while parent[var] != var:
+        parent[var] = parent[parent[var]]
+        var = parent[var]
+    return var
+
+
+def union(parent: List[int], first: int, second: int) -> None:
+    """
+    Merges the sets of `first` and `second` in the union-find forest `parent`.
+    """
+    first, second = find(parent, first), find(parent, second)
+    if first != second:
+        parent[second] = first
+
+
+def find_components(formula: Formula) -> List[Tuple[List[int], List[int]]]:
+    """
+    Returns the clause indices and the cardinality constraint indices of every component of `formula`, the components
+    with the most clauses first. An empty clause is a component of its own.
+    """
+    parent = list(range(formula.num_vars() + 1))
+    groups = [formula.clause(index) for index in range(len(formula))]
+    groups += [formula.constraint(index) for index in range(formula.num_constraints())]
+    for lits in groups:
+        if not lits:
+            continue
+        for lit in lits[1:]:
+            union(parent, abs(lits[0]), abs(lit))
+
+    components: Dict[int, Tuple[List[int], List[int]]] = {}
+    for index, lits in enumerate(groups):
+        root = find(parent, abs(lits[0])) if lits else -1 - index
+        if index < len(formula):
+            components.setdefault(root, ([], []))[0].append(index)
+        else:
+            components.setdefault(root, ([], []))[1].append(index - len(formula))
+    return sorted(components.values(), key=lambda component: len(component[0]), reverse=True)
+
+
+def split(formula: Formula, min_size: int = MIN_COMPONENT_SIZE) -> List[Formula]:
+    """
+    Returns the components of `formula` as formulas sharing its variable numbering. Components with fewer than
+    `min_size` variables are merged into one last formula.
+    """
+    components = []
+    small = formula.derive()
+    for clauses, constraints in find_components(formula):
+        component = formula.derive()
+        target = component if len(component_variables(formula, clauses, constraints)) >= min_size else small
+        for index in clauses:
+            target.add_clause(formula.clause(index), formula.clause_id(index))
+        for index in constraints:
+            target.add_at_most(formula.constraint(index), formula.bounds[index])
+        if target is component:
+            components.append(component)
+
+    if len(small) > 0 or small.num_constraints() > 0:
+        components.append(small)
+    return components
+
+
+def component_variables(formula: Formula, clauses: Optional[List[int]] = None,
+                        constraints: Optional[List[int]] = None) -> List:
+    """
+    Returns the names of the variables that occur in `formula`, in order of first appearance in its clauses and then its
+    cardinality constraints. Only the clauses and constraints at the given indices are looked at, if given.
+    """
+    if clauses is None and constraints is None:
+        lits = chain(formula.lits, formula.constraint_lits)
+    else:
+        lits = chain(chain.from_iterable(map(formula.clause, clauses or [])),
+                     chain.from_iterable(map(formula.constraint, constraints or [])))
+    return [formula.names[var] for var in dict.fromkeys(map(abs, lits))]
+
+
+def canonical_key(formula: Formula) -> str:
+    """
+    Returns a hash of the clauses of `formula` with its variables renamed 1, 2, ... in order of first appearance (the
+    order of `component_variables`). Formulas that only differ in their variable names, or in the order of the literals
+    within a clause, share the hash. Cardinality constraints go in with their bounds.
+    """
+    renaming: Dict[int, int] = {}
+
+    def rename(lits) -> List[int]:
+        renamed = []
+        for lit in lits:
+            var = renaming.setdefault(abs(lit), len(renaming) + 1)
+            renamed.append(var if lit > 0 else -var)
+        return sorted(renamed)
+
+    clauses = sorted(rename(formula.clause(index)) for index in range(len(formula)))
+    constraints = sorted((rename(formula.constraint(index)), formula.bounds[index])
+                         for index in range(formula.num_constraints()))
+    return hashlib.sha256(repr((clauses, constraints)).encode()).hexdigest()
+
+
+class ComponentCache:
+    """
+    The answers for the last `size` distinct components solved, keyed by `canonical_key`. A model is kept as the
+    values of the component's variables in order of first appearance, so it carries over to a renamed copy.
+    """
+    def __init__(self, size: int = CACHE_SIZE):
+        self.size = size
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key: str, variables: List) -> Tuple[bool, Optional[Dict]]:
+        """
+        Returns whether the component with `key` has a cached answer, and that answer for a component over `variables`.
+        """
+        if key not in self.entries:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        values = self.entries[key]
+        return True, dict(zip(variables, values)) if values is not None else None
+
+    def store(self, key: str, variables: List, model: Optional[Mapping]) -> None:
+        self.entries[key] = tuple(model[var] for var in variables) if model is not None else None
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+
+def start_worker(stop) -> None:
+    context["stop"] = stop
+
+
+def run_component(solve_one: Callable, item: Tuple[List, Formula]) -> Optional[Mapping]:
+    """
+    Solves a component in a pool process, giving up once another component has turned out UNSAT.
+    """
+    return solve_one(*item, budget=Budget(stop=context["stop"]))
+
+
+def solve_components(components: List[Formula], solve_one: Callable[[List, Formula], Optional[Mapping]],
+                     jobs: int = 1, cache: Optional[ComponentCache] = None) -> Optional[Dict]:
+    """
+    Solves every component with `solve_one(variables, formula)` and returns the union of their models, or None as soon
+    as one component is UNSAT. Only the values of its own variables are taken from each model, since a component shares
+    the numbering of the whole formula and a solver may assign the other variables too. Answers are looked up in and
+    added to `cache`. With `jobs` above 1, the components that are not cached are solved in that many processes, so
+    `solve_one` must be picklable and take a `budget` keyword.
+    """
+    cache = cache if cache is not None else ComponentCache()
+    model: Dict = {}
+    pending: Dict[str, Tuple[List, Formula]] = {}
+    repeats = []  # components that are renamed copies of a pending one
+    for component in components:
+        variables = component_variables(component)
+        key = canonical_key(component)
+        if key in pending:
+            repeats.append((key, variables))
+            continue
+        found, answer = cache.lookup(key, variables)
+        if not found:
+            pending[key] = (variables, component)
+        elif answer is None:
+            return None
+        else:
+            model.update(answer)
+
+    if jobs > 1 and len(pending) > 1:
+        # As in `cube.cube_and_conquer`, once a component is UNSAT the other searches are stopped and drained rather
+        # than the pool terminated
+        stop = multiprocessing.Event()
+        with multiprocessing.Pool(min(jobs, len(pending)), initializer=start_worker, initargs=(stop,)) as pool:
+            for (key, (variables, component)), answer in zip(pending.items(),
+                                                              pool.imap(partial(run_component, solve_one),
+                                                                        pending.values())):
+                if stop.is_set():
+                    continue
+                cache.store(key, variables, answer)
+                if answer is None:
+                    stop.set()
+                else:
+                    model.update((var, answer[var]) for var in variables)
+            pool.close()
+            pool.join()
+        if stop.is_set():
+            return None
+    else:
+        for key, (variables, component) in pending.items():
+            answer = solve_one(variables, component)
+            cache.store(key, variables, answer)
+            if answer is None:
+                return None
+            model.update((var, answer[var]) for var in variables)
+
+    for key, variables in repeats:
+        solved, _ = pending[key]
+        model.update(zip(variables, (model[var] for var in solved)))
+    return model
+
+
+def residual_components(propagator: Propagator) -> Dict[int, int]:
+    """
+    Returns the component of every unassigned variable in the clauses of `propagator` that the current assignment does
+    not satisfy yet, as a representative variable. Cardinality constraints count until they have reached their bound,
+    at which point propagation has set all their other literals. Variables in neither are left out.
+    """
+    values = propagator.values
+    lits = propagator.store.lits
+    offsets = propagator.store.offsets
+    parent = list(range(len(values)))
+    touched = set()
+    for index in range(len(propagator.store)):
+        free = []
+        for k in range(offsets[index], offsets[index + 1]):
+            lit = lits[k]
+            value = values[abs(lit)]
+            if value is None:
+                free.append(abs(lit))
+            elif value == (lit > 0):
+                break
+        else:
+            if free:
+                touched.update(free)
+                for var in free[1:]:
+                    union(parent, free[0], var)
+
+    for lits, bound, count in zip(propagator.constraints, propagator.bounds, propagator.true_counts):
+        free = [abs(lit) for lit in lits if values[abs(lit)] is None]
+        if count < bound and free:
+            touched.update(free)
+            for var in free[1:]:
+                union(parent, free[0], var)
+
+    return {var: find(parent, var) for var in touched}
+
+
+if __name__ == "__main__":
+    # (x or y) and (!y or z), then (u or v) and (!u or !v) on their own, and (w) by itself
+    formula = Formula.from_clauses([
+        Clause("foo", [Literal(1, True), Literal(2, True)]),
+        Clause("bar", [Literal(4, True), Literal(5, True)]),
+        Clause("baz", [Literal(2, False), Literal(3, True)]),
+        Clause("buzz", [Literal(4, False), Literal(5, False)]),
+        Clause("fizz", [Literal(6, True)])
+    ])
+    assert(find_components(formula) == [([0, 2], []), ([1, 3], []), ([4], [])])
+    assert([component_variables(component) for component in split(formula, 2)] == [[1, 2, 3], [4, 5], [6]])
+    assert(len(split(formula, 3)) == 2)
+
+    # (u or v) and (!u or !v) is (x or y) and (!x or !y) renamed, with its literals in another order
+    renamed = Formula.from_clauses([
+        Clause("foo", [Literal(2, True), Literal(1, True)]),
+        Clause("bar", [Literal(1, False), Literal(2, False)])
+    ])
+    parts = split(formula, 2)
+    assert(canonical_key(parts[1]) == canonical_key(renamed) != canonical_key(parts[0]))
+
+    # The second copy comes from the cache, with the model carried over to its own variables
+    calls = []
+
+    def brute_force(variables: List, component: Formula) -> Optional[Dict]:
+        calls.append(variables)
+        for bits in range(1 << len(variables)):
+            model = {var: bool(bits >> position & 1) for position, var in enumerate(variables)}
+            if all(clause.eval(model) for clause in component):
+                return model
+        return None
+
+    cache = ComponentCache()
+    model = solve_components(parts, brute_force, cache=cache)
+    assert(all(clause.eval(model) for clause in formula))
+    model = solve_components([renamed], brute_force, cache=cache)
+    assert(len(calls) == 3 and cache.hits == 1 and all(clause.eval(model) for clause in renamed))
+
+    # A copy within the same formula is only solved once
+    copies = Formula.from_clauses(list(parts[1]) + list(renamed))
+    model = solve_components(split(copies, 2), brute_force)
+    assert(len(calls) == 4 and all(clause.eval(model) for clause in copies))
+    assert(solve_components(parts + [Formula.from_clauses([Clause("foo", [])])], brute_force) is None)
+
+    # Once x is True, (x or y) is satisfied and y and z are left in a component of their own
+    propagator = Propagator(list(range(1, 7)), formula)
+    propagator.decide(propagator.to_int(Literal(1, True)))
+    assert(propagator.propagate() is None)
+    residual = {formula.names[var]: formula.names[root] for var, root in residual_components(propagator).items()}
+    assert(residual[2] == residual[3] != residual[4] == residual[5] and 1 not in residual and 6 not in residual)
+
+    # At most one of x, u and w joins three components into one, and a renamed copy of it hashes the same
+    constrained = Formula.from_clauses(list(formula))
+    constrained.add_at_most([constrained.indices[name] for name in (1, 4, 6)], 1)
+    assert(find_components(constrained) == [([0, 1, 2, 3, 4], [0])])
+    assert(component_variables(split(constrained, 2)[0]) == [1, 2, 4, 5, 3, 6])
+    copy = Formula.from_clauses([Clause(clause.id, [Literal(-literal.name, literal.sign)
+                                                    for literal in clause.literals]) for clause in formula])
+    copy.add_at_most([copy.indices[name] for name in (-1, -4, -6)], 1)
+    assert(canonical_key(constrained) == canonical_key(copy) != canonical_key(formula))
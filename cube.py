@@ -0,0 +1,203 @@
+import multiprocessing
+import queue
+from collections import deque
+from classes import Literal, Clause, Formula
+from propagation import Propagator
+from budget import Budget, BudgetExhausted
+from heuristics import make_heuristic
+from restarts import make_restart_policy
+from solver import search
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+# Cube-and-conquer: a lookahead phase splits the (already preprocessed) formula into cubes, i.e. partial assignments
+# on a few well-chosen variables that together cover every assignment, and a process pool then searches each cube
+# separately. The first satisfiable cube answers for the whole formula; the formula is UNSAT once every cube is.
+#
+# A cube whose search runs past its conflict limit is split again by lookahead and its children go back into the
+# queue with twice the limit, so idle workers pick up the pieces of a hard cube instead of waiting for one worker.
+
+# Number of most frequent unassigned variables the lookahead tries at every split
+LOOKAHEAD_CANDIDATES = 16
+
+# Conflicts a CDCL search gets on each of the first cubes before its cube is split further
+CUBE_CONFLICT_LIMIT = 1000
+
+# Number of extra decisions a cube gets when it is split again
+RESPLIT_DEPTH = 2
+
+
+def make_cubes(formula: Formula, depth: int, base: Sequence[int] = ()) -> List[List[int]]:
+    """
+    Splits the part of the search space under the literals of `base` into cubes of up to `depth` more decisions.
+    Every split is on the variable whose two polarities imply the most literals between them (the product of both
+    counts, as in march), among the LOOKAHEAD_CANDIDATES unassigned variables that occur most often. Branches that
+    fail under unit propagation are left out, so an empty list means `base` is refuted already.
+    """
+    propagator = Propagator([], formula)
+    for lit in base:
+        propagator.add_clause([lit])
+    if not propagator.ok or propagator.propagate() is not None:
+        return []
+
+    occurrences = [0] * (propagator.num_vars() + 1)
+    for lit in formula.lits:
+        occurrences[abs(lit)] += 1
+
+    cubes: List[List[int]] = []
+    split(propagator, occurrences, depth, list(base), cubes)
+    return cubes
+
+
+def split(propagator: Propagator, occurrences: List[int], depth: int, cube: List[int],
+          cubes: List[List[int]]) -> None:
+    """
+    Adds every cube below the current assignment of `propagator` (whose decisions are `cube`) to `cubes`.
+    """
+    var = None if depth == 0 else lookahead(propagator, occurrences)
+    if var is None:
+        cubes.append(list(cube))
+        return
+
+    for lit in (var, -var):
+        propagator.decide(lit)
+        if propagator.propagate() is None:
+            cube.append(lit)
+            split(propagator, occurrences, depth - 1, cube, cubes)
+            cube.pop()
+        propagator.backtrack(propagator.decision_level() - 1)
+
+
+def lookahead(propagator: Propagator, occurrences: List[int]) -> Optional[int]:
+    """
+    Returns the variable to split on next, or None once every variable that occurs in the formula is assigned.
+    """
+    free = [var for var in range(1, len(occurrences)) if occurrences[var] > 0 and propagator.values[var] is None]
+    free.sort(key=lambda var: -occurrences[var])
+
+    best, best_score = None, -1
+    for var in free[:LOOKAHEAD_CANDIDATES]:
+        implied = []
+        for lit in (var, -var):
+            before = len(propagator.trail)
+            propagator.decide(lit)
+            failed = propagator.propagate() is not None
+            implied.append(None if failed else len(propagator.trail) - before)
+            propagator.backtrack(propagator.decision_level() - 1)
+
+        if None in implied:
+            # A failed literal: splitting here costs nothing, since at most one branch survives
+            return var
+        score = implied[0] * implied[1]
+        if score > best_score:
+            best, best_score = var, score
+
+    return best
+
+
+if __name__ == "__main__":
+    # (x or y) and (!x or z): x implies the most either way, and no cube falsifies a clause
+    small = Formula.from_clauses([
+        Clause("foo", [Literal(1, True), Literal(2, True)]),
+        Clause("bar", [Literal(1, False), Literal(3, True)])
+    ])
+    assert(make_cubes(small, 1) == [[1], [-1]])
+    assert(make_cubes(small, 0) == [[]])
+    assert(make_cubes(small, 1, base=[-1, -2]) == [])
+
+
+# Set up once in every pool process, so the formula is not sent along with each cube
+context: Dict = {}
+
+
+def start_worker(variables: List[str], formula: Formula, options: Mapping, stop) -> None:
+    context["variables"] = variables
+    context["formula"] = formula
+    context["options"] = options
+    context["stop"] = stop
+
+
+def conquer(cube: List[int], conflict_limit: Optional[int]) -> Tuple[List[int], bool, Optional[Mapping]]:
+    """
+    Searches the cube in a pool process until it is decided, runs out of conflicts or is stopped. Returns the cube,
+    whether the search gave up, and the partial assignment it found (None if the cube is UNSAT or the search gave up).
+    """
+    options = dict(context["options"])
+    brancher = make_heuristic(options.pop("heuristic", "vsids"), options.get("seed", 0))
+    policy = make_restart_policy(options.pop("restart", "luby"))
+    mode = options.pop("mode", "cdcl")
+    try:
+        budget = Budget(conflicts=conflict_limit, stop=context["stop"])
+        return cube, False, search(context["variables"], context["formula"], mode, brancher, policy, cube=cube,
+                                   budget=budget, **options)
+    except BudgetExhausted:
+        return cube, True, None
+
+
+def cube_and_conquer(variables: List[str], formula: Formula, depth: int, jobs: int,
+                     options: Mapping) -> Optional[Mapping]:
+    """
+    Splits `formula` into cubes of up to `depth` decisions and searches them with a pool of `jobs` processes, each
+    configured by `options` (the keyword arguments of `solver.solve` that configure the search). Returns the partial
+    assignment from the first satisfiable cube, or None once every cube is UNSAT. Only the CDCL search (also behind the
+    hybrid mode) has a conflict limit, so cubes are only split again in those modes.
+    """
+    limited = options.get("mode", "cdcl") in ("cdcl", "hybrid")
+    finished = queue.Queue()
+    waiting = deque()
+    running = 0
+    answer = None
+
+    # Terminating a pool while a worker is sending back its result can leave the pool's result queue locked forever,
+    # so once a cube is satisfiable the other searches are stopped and the pool is closed once they have all returned
+    stop = multiprocessing.Event()
+    with multiprocessing.Pool(jobs, initializer=start_worker, initargs=(variables, formula, options, stop)) as pool:
+        def dispatch() -> None:
+            nonlocal running
+            while waiting and running < jobs:
+                cube, conflict_limit = waiting.popleft()
+                running += 1
+                pool.apply_async(conquer, (cube, conflict_limit),
+                                 callback=lambda result, limit=conflict_limit: finished.put((limit, result)),
+                                 error_callback=lambda error, limit=conflict_limit: finished.put((limit, error)))
+
+        for cube in make_cubes(formula, depth):
+            waiting.append((cube, CUBE_CONFLICT_LIMIT if limited else None))
+        dispatch()
+
+        while running > 0:
+            conflict_limit, result = finished.get()
+            running -= 1
+            if isinstance(result, BaseException):
+                raise result
+
+            cube, exhausted, partial_assignment = result
+            if partial_assignment is not None and answer is None:
+                answer = partial_assignment
+                stop.set()
+                waiting.clear()
+            elif exhausted and answer is None:
+                for child in make_cubes(formula, RESPLIT_DEPTH, base=cube):
+                    waiting.append((child, 2 * conflict_limit))
+            dispatch()
+
+        pool.close()
+        pool.join()
+
+    return answer
+
+
+if __name__ == "__main__":
+    from solver import solve, verify_assignment
+
+    # 4 pigeons do not fit in 3 holes
+    pigeons = Formula.from_clauses(
+        [Clause(p, [Literal(3 * p + h, True) for h in (1, 2, 3)]) for p in range(4)] +
+        [Clause(f"{h}{p}{q}", [Literal(3 * p + h, False), Literal(3 * q + h, False)])
+         for h in (1, 2, 3) for p in range(4) for q in range(p + 1, 4)]
+    )
+    assert(solve(list(range(1, 13)), pigeons, preprocess={}, jobs=2, cube_depth=3) is None)
+    assert(solve(list(range(1, 13)), pigeons, mode="dpll", preprocess={}, jobs=2, cube_depth=3) is None)
+
+    # Dropping the last pigeon makes it satisfiable
+    three = Formula.from_clauses([clause for clause in pigeons if all(abs(lit.name) <= 9 for lit in clause.literals)])
+    assert(verify_assignment(solve(list(range(1, 10)), three, preprocess={}, jobs=2, cube_depth=3), three))
@@ -0,0 +1,201 @@
+from itertools import product
+from classes import Formula
+from propagation import Propagator
+from cdcl import cdcl_solve
+from budget import Budget
+from heuristics import make_heuristic
+from restarts import make_restart_policy
+from stats import Stats
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# Enumerating and counting models. One CDCL search runs for the whole enumeration: after every model it backtracks to
+# level 0 and adds a blocking clause that rules that model out, so what it learned, its VSIDS scores and its saved
+# phases carry over to the search for the next one.
+#
+# Blocking the whole model would take one clause per model. Instead, every model is first shrunk to a cube: a partial
+# assignment of the projection variables that, together with the values of the other variables, still satisfies every
+# clause and constraint, so every projected assignment that extends the cube is a model as well. The blocking clause is
+# the negation of the cube, which rules out all 2^k of those assignments at once, where k is the number of projection
+# variables dropped from it. The blocking clauses count as clauses when shrinking, so every cube falsifies every earlier
+# one, the cubes are disjoint, and counting them with their sizes counts the models.
+
+
+class Shrinker:
+    """
+    Shrinks total assignments of `formula` to cubes over the variables in `projection` (variable indices), keeping
+    every clause added with `add_clause` satisfied as well.
+    """
+    def __init__(self, formula: Formula, projection: List[int]):
+        self.formula = formula
+        self.projection = projection
+
+        # The clauses and constraints every literal occurs in
+        self.lits: List[List[int]] = []
+        self.clauses: Dict[int, List[int]] = {}
+        for index in range(len(formula)):
+            self.add_clause(formula.clause(index))
+        self.constraints: Dict[int, List[int]] = {}
+        for index in range(formula.num_constraints()):
+            for lit in formula.constraint(index):
+                self.constraints.setdefault(lit, []).append(index)
+
+    def add_clause(self, lits: Iterable[int]) -> None:
+        lits = list(dict.fromkeys(lits))
+        for lit in lits:
+            self.clauses.setdefault(lit, []).append(len(self.lits))
+        self.lits.append(lits)
+
+    def shrink(self, values: List[Optional[bool]]) -> List[int]:
+        """
+        Returns the literals of the cube of the total assignment `values` (indexed by variable). A projection variable
+        is dropped when every clause its literal satisfies has another true literal left, and every constraint it
+        occurs in has room for it to be True.
+        """
+        formula = self.formula
+        true_counts = [sum(values[abs(lit)] == (lit > 0) for lit in lits) for lits in self.lits]
+
+        # A constraint allows as many more True literals as its bound minus its True and dropped literals
+        slack = [formula.bounds[index] - sum(values[abs(lit)] == (lit > 0) for lit in formula.constraint(index))
+                 for index in range(formula.num_constraints())]
+
+        cube = []
+        for var in self.projection:
+            lit = var if values[var] else -var
+            if (all(true_counts[index] >= 2 for index in self.clauses.get(lit, ())) and
+                    all(slack[index] >= 1 for index in self.constraints.get(-lit, ()))):
+                for index in self.clauses.get(lit, ()):
+                    true_counts[index] -= 1
+                for index in self.constraints.get(-lit, ()):
+                    slack[index] -= 1
+            else:
+                cube.append(lit)
+        return cube
+
+
+def iter_cubes(formula: Formula, projection: Optional[Iterable] = None, heuristic: str = "vsids", seed: int = 0,
+               restart: str = "luby", phase_saving: bool = True, initial_phase: bool = True,
+               budget: Optional[Budget] = None, stats: Optional[Stats] = None) -> Iterator[Dict]:
+    """
+    Yields disjoint cubes of models of `formula` as they are found, keyed by variable names, until every model is in
+    one of them. Every projected assignment that extends a cube is the projection of a model, and every model projects
+    onto exactly one cube. `projection` names the variables to project onto, every variable by default. The remaining
+    options are the ones `solver.solve` takes for the search. `budget` limits the whole enumeration, which raises
+    BudgetExhausted once it runs out, and the counters of the search are added to `stats`, if given, when it ends.
+    """
+    names = projection if projection is not None else formula.names[1:]
+    unknown = [name for name in names if name not in formula.indices]
+    if unknown:
+        raise ValueError(f"Unknown projection variables {unknown}")
+    variables = [formula.indices[name] for name in dict.fromkeys(names)]
+
+    propagator = Propagator(formula.names[1:], formula)
+    propagator.phase_saving = phase_saving
+    propagator.set_default_phase(initial_phase)
+    brancher = make_heuristic(heuristic, seed)
+    policy = make_restart_policy(restart)
+    shrinker = Shrinker(formula, variables)
+    if budget is not None:
+        budget.begin(propagator)
+    try:
+        while cdcl_solve(propagator, brancher, policy, budget=budget, begin=False) is not None:
+            cube = shrinker.shrink(propagator.values)
+            propagator.backtrack(0)
+            yield {propagator.names[abs(lit)]: lit > 0 for lit in cube}
+            shrinker.add_clause([-lit for lit in cube])
+            if not propagator.add_clause([-lit for lit in cube]):
+                return
+    finally:
+        if stats is not None:
+            stats.add_search(propagator)
+
+
+def iter_models(formula: Formula, projection: Optional[Iterable] = None, **options) -> Iterator[Dict]:
+    """
+    Yields every model of `formula` projected onto the variables named in `projection` (every variable by default)
+    exactly once, keyed by variable names, as they are found. `options` are the ones `iter_cubes` takes.
+    """
+    names = list(dict.fromkeys(projection if projection is not None else formula.names[1:]))
+    for cube in iter_cubes(formula, names, **options):
+        free = [name for name in names if name not in cube]
+        for values in product((False, True), repeat=len(free)):
+            model = dict(zip(free, values))
+            model.update(cube)
+            yield {name: model[name] for name in names}
+
+
+def count_models(formula: Formula, projection: Optional[Iterable] = None, **options) -> int:
+    """
+    Returns the number of models of `formula` projected onto the variables named in `projection` (every variable by
+    default), counting every cube of `iter_cubes` as 2^k models at once. `options` are the ones `iter_cubes` takes.
+    """
+    size = len(set(projection if projection is not None else formula.names[1:]))
+    return sum(2 ** (size - len(cube)) for cube in iter_cubes(formula, projection, **options))
+
+
+if __name__ == "__main__":
+    from itertools import islice
+    from classes import Literal, Clause
+    from budget import BudgetExhausted
+    import random
+    from generators import build, pigeonhole
+    from solver import verify_assignment
+
+    # (x or y or z) has 7 models, which the cube (x) covers 4 of
+    formula = Formula.from_clauses([Clause("foo", [Literal("x", True), Literal("y", True), Literal("z", True)])])
+    models = list(iter_models(formula))
+    assert(len(models) == 7 == count_models(formula) and len({tuple(sorted(model.items())) for model in models}) == 7)
+    assert(all(verify_assignment(model, formula) for model in models))
+    assert(len(list(iter_cubes(formula))) <= 3)
+
+    # Projected onto x and y, every assignment extends to a model through z, but not once z is False; variables that
+    # occur in no clause double the count
+    assert(count_models(formula, ["x", "y"]) == 4 and count_models(formula, ["x"]) == 2)
+    formula.add_clause([-formula.indices["z"]])
+    assert(sorted(tuple(sorted(model.items())) for model in iter_models(formula, ["x", "y"])) ==
+           [(("x", False), ("y", True)), (("x", True), ("y", False)), (("x", True), ("y", True))])
+    assert(count_models(formula) == 3)
+    formula.add_variable("w")
+    assert(count_models(formula) == 6 and count_models(formula, []) == 1)
+    try:
+        count_models(formula, ["v"])
+        assert(False)
+    except ValueError:
+        pass
+
+    # An UNSAT formula has no models; exactly one of 4 variables has 4, whether as clauses or as a constraint
+    _, pigeons = pigeonhole(3)
+    assert(list(iter_models(pigeons)) == [] and count_models(pigeons) == 0)
+    exactly_one = Formula()
+    exactly_one.add_clause([exactly_one.add_variable(var) for var in range(1, 5)])
+    exactly_one.add_at_most([1, 2, 3, 4], 1)
+    assert(count_models(exactly_one) == 4 and count_models(exactly_one.clausal()) == 4)
+
+    # The count matches brute force on random formulas below the threshold, which have plenty of models, and models
+    # are produced lazily
+    for seed in range(5):
+        rng = random.Random(seed)
+        _, random_formula = build(10, [[rng.choice([-1, 1]) * var for var in rng.sample(range(1, 11), 3)]
+                                       for _ in range(25)])
+        expected = sum(verify_assignment({var: bool(bits >> (var - 1) & 1) for var in range(1, 11)}, random_formula)
+                       for bits in range(2 ** 10))
+        assert(count_models(random_formula) == expected == len(list(iter_models(random_formula))))
+        assert(count_models(random_formula, seed=seed, heuristic="random") == expected)
+    assert(expected > 2 and len(list(islice(iter_models(random_formula), 2))) == 2)
+    try:
+        count_models(random_formula, budget=Budget(conflicts=0, decisions=0))
+        assert(False)
+    except BudgetExhausted:
+        pass
+
+    # The budget covers the whole count rather than the search for every cube: 64 cubes take 74 conflicts between them,
+    # but few each
+    rng = random.Random(0)
+    _, many_cubes = build(16, [[rng.choice([-1, 1]) * var for var in rng.sample(range(1, 17), 3)] for _ in range(50)])
+    stats = Stats()
+    assert(count_models(many_cubes, stats=stats) == 241 and stats.counters["conflicts"] > 20)
+    stats = Stats()
+    try:
+        count_models(many_cubes, budget=Budget(conflicts=20), stats=stats)
+        assert(False)
+    except BudgetExhausted:
+        assert(stats.counters["conflicts"] <= 21)
@@ -0,0 +1,232 @@
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from classes import Formula, ARRAYS, copy_array
+from sat_io import read_input
+from typing import List, Optional, Tuple
+
+# A binary cache of parsed formulas. Parsing a large DIMACS file token by token takes seconds, while the `Formula` it
+# produces is just a few flat integer arrays, so the first load of a file writes those arrays to a cache file and later
+# loads map that file and use read-only memoryviews of it as the arrays of the formula, which keep the mapping open for
+# as long as the formula lives. Nothing is copied: the operating system keeps one copy of the mapped file in its page
+# cache, shared by every process of a batch that loads the same instance, and pages are only read as they are used. A
+# formula that is added to copies its arrays first (see `Formula.own_arrays`). Cache files are only ever replaced by
+# renaming, never rewritten in place, so a mapping stays valid while a newer cache file is written.
+#
+# A cache file is a fixed header followed by the arrays of the formula, each starting at a multiple of 8 bytes:
+#
+#     magic, version, the size, modification time (ns) and SHA-256 of the source file,
+#     the number of variables, literals, clauses, constraint literals and constraints
+#     literals (int32), clause offsets (int64), constraint literals (int32), constraint offsets (int64), bounds (int32)
+#
+# all little-endian. A cache file whose size and modification time match the source is used as is. If only the time
+# differs, the source is hashed, and a matching hash refreshes the time in the header instead of parsing again.
+
+MAGIC = b"SATCACHE"
+VERSION = 1
+HEADER = struct.Struct("<8sIIqq32sqqqqq")
+MTIME_OFFSET = struct.calcsize("<8sIIq")
+SUFFIX = ".satcache"
+
+# Bytes read at a time when hashing a source file
+HASH_CHUNK = 1 << 20
+
+# The arrays that follow the header, as (Formula attribute, typecode); "i" is 4 bytes and "q" 8 bytes
+LAYOUT = ARRAYS
+
+
+def cache_path(path: str, cache_dir: Optional[str] = None) -> str:
+    """
+    Returns where the cache file of the formula at `path` goes: next to it, or in `cache_dir` under a name that also
+    holds a digest of its absolute path, so files of the same name in different directories don't collide.
+    """
+    if cache_dir is None:
+        return path + SUFFIX
+    digest = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{os.path.basename(path)}.{digest}{SUFFIX}")
+
+
+def file_digest(path: str) -> bytes:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def padded(size: int) -> int:
+    return (size + 7) & ~7
+
+
+def write_cache(formula: Formula, cache_file: str, size: int, mtime: int, digest: bytes) -> None:
+    """
+    Writes `formula`, read from a source file of `size` bytes, modified at `mtime` (ns) and hashing to `digest`, to
+    `cache_file`. The file is written under a temporary name and then renamed, so a concurrent load never sees half of
+    it.
+    """
+    counts = (formula.num_vars(), len(formula.lits), len(formula), len(formula.constraint_lits),
+              formula.num_constraints())
+    directory = os.path.dirname(cache_file) or "."
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=SUFFIX + ".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, 0, size, mtime, digest, *counts))
+            for name, _ in LAYOUT:
+                values = getattr(formula, name)
+                if sys.byteorder == "big":
+                    values = array(values.typecode, values)
+                    values.byteswap()
+                data = values.tobytes()
+                f.write(data + bytes(padded(len(data)) - len(data)))
+        os.replace(temporary, cache_file)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def read_cache(cache_file: str, size: int, mtime: int, path: Optional[str] = None) -> Optional[Formula]:
+    """
+    Returns the formula cached in `cache_file` if it was read from a source file of `size` bytes modified at `mtime`
+    (ns), or None if there is no such cache file. When only the time differs and the source `path` is given, the
+    source is hashed instead, and the cached formula is still used if the hashes match.
+    """
+    try:
+        with open(cache_file, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        formula = unpack(cache_file, mapped, size, mtime, path)
+    except (OSError, ValueError, struct.error):
+        formula = None
+    if formula is None:
+        mapped.close()
+    return formula
+
+
+def unpack(cache_file: str, mapped: mmap.mmap, size: int, mtime: int, path: Optional[str]) -> Optional[Formula]:
+    """
+    Returns the formula in `mapped` with its arrays as views of it, or None if it doesn't match the source file. No view
+    is left behind when it returns None, so the caller can close the mapping.
+    """
+    magic, version, _, cached_size, cached_mtime, digest, num_vars, *counts = HEADER.unpack_from(mapped)
+    if magic != MAGIC or version != VERSION or cached_size != size:
+        return None
+    if cached_mtime != mtime:
+        if path is None or file_digest(path) != digest:
+            return None
+        with open(cache_file, "r+b") as f:
+            f.seek(MTIME_OFFSET)
+            f.write(struct.pack("<q", mtime))
+
+    num_lits, num_clauses, num_constraint_lits, num_constraints = counts
+    lengths = [num_lits, num_clauses + 1, num_constraint_lits, num_constraints + 1, num_constraints]
+    spans = []
+    position = HEADER.size
+    for (_, typecode), length in zip(LAYOUT, lengths):
+        end = position + length * array(typecode).itemsize
+        spans.append((position, end))
+        position = padded(end)
+    if spans[-1][1] > len(mapped):
+        return None
+
+    names = [None] + list(range(1, num_vars + 1))
+    formula = Formula(names, dict(zip(names[1:], names[1:])))
+    view = memoryview(mapped)
+    for (name, typecode), (start, end) in zip(LAYOUT, spans):
+        values = view[start:end].cast(typecode)
+        if sys.byteorder == "big":
+            values = copy_array(values, typecode)
+            values.byteswap()
+        setattr(formula, name, values)
+    return formula
+
+
+def load_formula(path: str, cache_dir: Optional[str] = None) -> Tuple[List[int], Formula]:
+    """
+    Returns the same as `sat_io.read_input(path)`, from the cache file of `path` (see `cache_path`) when it is up to
+    date, and otherwise parses `path` and writes its cache file. A cache file that can't be written is skipped.
+    """
+    status = os.stat(path)
+    cache_file = cache_path(path, cache_dir)
+    formula = read_cache(cache_file, status.st_size, status.st_mtime_ns, path)
+    if formula is not None:
+        return list(range(1, formula.num_vars() + 1)), formula
+
+    variables, formula = read_input(path)
+    try:
+        write_cache(formula, cache_file, status.st_size, status.st_mtime_ns, file_digest(path))
+    except OSError:
+        pass
+    return variables, formula
+
+
+if __name__ == "__main__":
+    import pickle
+    from solver import solve
+
+    # A formula loaded from its cache file is the one that was parsed, constraints included
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "example.cnf")
+        with open(source, "w") as f:
+            f.write("p cnf+ 5 3\n1 -3 0\n2 3 -1 0\n-5 0\n1 2 3 <= 1\n")
+        _, parsed = read_input(source)
+
+        def same(first: Formula, second: Formula) -> bool:
+            return first.names == second.names and all(list(getattr(first, name)) == list(getattr(second, name))
+                                                       for name, _ in LAYOUT)
+
+        variables, formula = load_formula(source)
+        cache_file = cache_path(source)
+        assert(variables == [1, 2, 3, 4, 5] and same(formula, parsed) and os.path.exists(cache_file))
+        status = os.stat(source)
+        cached = read_cache(cache_file, status.st_size, status.st_mtime_ns)
+        assert(cached is not None and same(cached, parsed) and formula.indices == parsed.indices)
+        assert(load_formula(source)[0] == variables and same(load_formula(source)[1], parsed))
+
+        # The arrays of a cached formula are views of the mapped file, copied once it is added to or pickled, and it
+        # solves like the parsed one
+        assert(all(isinstance(getattr(cached, name), memoryview) for name, _ in LAYOUT))
+        assert(solve(variables, cached) == solve(variables, parsed))
+        copied = pickle.loads(pickle.dumps(cached))
+        assert(same(copied, parsed) and isinstance(copied.lits, array))
+        cached.add_clause([4, 5])
+        cached.add_at_most([2, 4], 1)
+        parsed.add_clause([4, 5])
+        parsed.add_at_most([2, 4], 1)
+        assert(same(cached, parsed) and isinstance(cached.lits, array) and isinstance(cached.bounds, array))
+        _, parsed = read_input(source)
+
+        # Touching the source keeps the cache once its hash matches, and the new time goes into the header
+        os.utime(source, ns=(status.st_atime_ns, status.st_mtime_ns + 10 ** 9))
+        assert(read_cache(cache_file, status.st_size, status.st_mtime_ns + 10 ** 9) is None)
+        assert(same(read_cache(cache_file, status.st_size, status.st_mtime_ns + 10 ** 9, source), parsed))
+        assert(same(read_cache(cache_file, status.st_size, status.st_mtime_ns + 10 ** 9), parsed))
+
+        # An edit of the same size is caught by the hash, and any other edit by the size
+        with open(source, "w") as f:
+            f.write("p cnf+ 5 3\n1 -3 0\n2 3 -1 0\n-4 0\n1 2 3 <= 1\n")
+        assert(same(load_formula(source)[1], read_input(source)[1]))
+        assert(list(load_formula(source)[1].clause(2)) == [-4])
+        with open(source, "a") as f:
+            f.write("4 5 0\n")
+        assert(len(load_formula(source)[1]) == 4 and len(load_formula(source)[1]) == 4)
+
+        # In a cache directory, and not at all where it can't be written
+        cache_dir = os.path.join(directory, "cache")
+        assert(same(load_formula(source, cache_dir)[1], read_input(source)[1]))
+        assert(os.listdir(cache_dir) == [os.path.basename(cache_path(source, cache_dir))])
+        with open(os.path.join(directory, "file"), "w"):
+            pass
+        assert(len(load_formula(source, os.path.join(directory, "file"))[1]) == 4)
+
+        # A truncated or foreign cache file is ignored
+        with open(cache_file, "r+b") as f:
+            f.truncate(HEADER.size + 4)
+        assert(read_cache(cache_file, os.stat(source).st_size, os.stat(source).st_mtime_ns) is None)
+        assert(len(load_formula(source)[1]) == 4)
@@ -0,0 +1,215 @@
+from classes import Literal, Clause, Formula
+from typing import Dict, List, Mapping, Optional
+
+# Linear-time solvers for the polynomial fragments of CNF that our generated sub-queries often fall into. `classify`
+# decides which fragment a formula belongs to right after it is read, and `solve` routes it accordingly.
+
+TWO_SAT = "2sat"
+HORN = "horn"
+GENERAL = "general"
+
+
+def classify(formula: Formula) -> str:
+    """
+    Returns TWO_SAT if every clause of `formula` has at most two literals, HORN if every clause has at most one positive
+    literal, and GENERAL otherwise.
+    """
+    lits = formula.lits
+    offsets = formula.offsets
+
+    is_two_sat = True
+    is_horn = True
+    for index in range(len(formula)):
+        start, end = offsets[index], offsets[index + 1]
+        if end - start > 2:
+            is_two_sat = False
+            if not is_horn:
+                break
+        if is_horn and sum(1 for k in range(start, end) if lits[k] > 0) > 1:
+            is_horn = False
+            if not is_two_sat:
+                break
+
+    if is_two_sat:
+        return TWO_SAT
+    if is_horn:
+        return HORN
+    return GENERAL
+
+
+if __name__ == "__main__":
+    assert(classify(Formula.from_clauses([Clause("foo", [Literal(1, True), Literal(2, True)])])) == TWO_SAT)
+    assert(classify(Formula.from_clauses([
+        Clause("foo", [Literal(1, False), Literal(2, False), Literal(3, True)])
+    ])) == HORN)
+    assert(classify(Formula.from_clauses([
+        Clause("foo", [Literal(1, True), Literal(2, True), Literal(3, True)])
+    ])) == GENERAL)
+
+
+def two_sat_solve(formula: Formula) -> Optional[Mapping]:
+    """
+    Solves a formula whose clauses have at most two literals. Every clause (a or b) becomes the implications -a -> b
+    and -b -> a, and the formula is UNSAT exactly when some x and -x share a strongly connected component. Otherwise,
+    taking every literal whose component comes later in topological order yields a model. Returns the assignment of
+    every variable, or None if the formula is UNSAT.
+    """
+    num_vars = formula.num_vars()
+    implications: Dict[int, List[int]] = {lit: [] for var in range(1, num_vars + 1) for lit in (var, -var)}
+    for index in range(len(formula)):
+        clause = formula.clause(index)
+        if len(clause) == 0:
+            return None
+        first, second = clause[0], clause[-1]
+        implications[-first].append(second)
+        if second != first:
+            implications[-second].append(first)
+
+    components = strongly_connected_components(implications)
+
+    assignment = {}
+    for var in range(1, num_vars + 1):
+        if components[var] == components[-var]:
+            return None
+        # Tarjan's algorithm numbers components in reverse topological order
+        assignment[formula.names[var]] = components[var] < components[-var]
+
+    return assignment
+
+
+def strongly_connected_components(graph: Dict[int, List[int]]) -> Dict[int, int]:
+    """
+    Maps every node of `graph` to the number of its strongly connected component, using an iterative version of
+    Tarjan's algorithm so that long implication chains don't hit the recursion limit. Components are numbered in the
+    order Tarjan completes them, which is a reverse topological order.
+    """
+    index_of: Dict[int, int] = {}
+    lowlink: Dict[int, int] = {}
+    on_stack = set()
+    stack: List[int] = []
+    components: Dict[int, int] = {}
+    counter = 0
+    component = 0
+
+    for root in graph:
+        if root in index_of:
+            continue
+
+        work = [(root, 0)]
+        while work:
+            node, edge = work.pop()
+            if edge == 0:
+                index_of[node] = lowlink[node] = counter
+                counter += 1
+                stack.append(node)
+                on_stack.add(node)
+
+            successors = graph[node]
+            while edge < len(successors):
+                successor = successors[edge]
+                edge += 1
+                if successor not in index_of:
+                    # Come back to this node's next edge once the successor is finished
+                    work.append((node, edge))
+                    work.append((successor, 0))
+                    break
+                if successor in on_stack:
+                    lowlink[node] = min(lowlink[node], index_of[successor])
+            else:
+                if lowlink[node] == index_of[node]:
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        components[member] = component
+                        if member == node:
+                            break
+                    component += 1
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+
+    return components
+
+
+if __name__ == "__main__":
+    # (x or y) and (!x or y) and (!y or z) forces y and z
+    chain = Formula.from_clauses([
+        Clause("foo", [Literal(1, True), Literal(2, True)]),
+        Clause("bar", [Literal(1, False), Literal(2, True)]),
+        Clause("baz", [Literal(2, False), Literal(3, True)])
+    ])
+    chain_model = two_sat_solve(chain)
+    assert(chain_model[2] and chain_model[3])
+
+    # (x or y) and (x or !y) and (!x or y) and (!x or !y) is UNSAT
+    assert(two_sat_solve(Formula.from_clauses([
+        Clause("foo", [Literal(1, True), Literal(2, True)]),
+        Clause("bar", [Literal(1, True), Literal(2, False)]),
+        Clause("baz", [Literal(1, False), Literal(2, True)]),
+        Clause("buzz", [Literal(1, False), Literal(2, False)])
+    ])) is None)
+
+    # (x) and (!x or !y) works with unit clauses
+    assert(two_sat_solve(Formula.from_clauses([
+        Clause("foo", [Literal(1, True)]),
+        Clause("bar", [Literal(1, False), Literal(2, False)])
+    ])) == {1: True, 2: False})
+
+
+def horn_solve(formula: Formula) -> Optional[Mapping]:
+    """
+    Solves a formula whose clauses have at most one positive literal. Starting from everything False, a variable is set
+    True only once some clause has all of its negative literals falsified, which makes the result the minimal model.
+    Each clause keeps a count of its negative literals that are not falsified yet, so every literal is looked at a
+    constant number of times. Returns the assignment of every variable, or None if the formula is UNSAT.
+    """
+    num_vars = formula.num_vars()
+    remaining = [0] * len(formula)
+    heads: List[Optional[int]] = [None] * len(formula)
+    negative_occurrences: List[List[int]] = [[] for _ in range(num_vars + 1)]
+
+    queue = []
+    for index in range(len(formula)):
+        for lit in formula.clause(index):
+            if lit > 0:
+                heads[index] = lit
+            else:
+                remaining[index] += 1
+                negative_occurrences[-lit].append(index)
+        if remaining[index] == 0:
+            queue.append(index)
+
+    values = [False] * (num_vars + 1)
+    while queue:
+        index = queue.pop()
+        head = heads[index]
+        if head is None:
+            return None
+        if values[head]:
+            continue
+
+        values[head] = True
+        for other in negative_occurrences[head]:
+            remaining[other] -= 1
+            if remaining[other] == 0:
+                queue.append(other)
+
+    return {formula.names[var]: values[var] for var in range(1, num_vars + 1)}
+
+
+if __name__ == "__main__":
+    # (x) and (!x or y) and (!x or !y or z) and (!w or x) derives x, y and z but leaves w False
+    horn = Formula.from_clauses([
+        Clause("foo", [Literal(1, True)]),
+        Clause("bar", [Literal(1, False), Literal(2, True)]),
+        Clause("baz", [Literal(1, False), Literal(2, False), Literal(3, True)]),
+        Clause("buzz", [Literal(4, False), Literal(1, True)])
+    ])
+    assert(horn_solve(horn) == {1: True, 2: True, 3: True, 4: False})
+
+    # (x) and (!x or !y) and (y) is UNSAT
+    assert(horn_solve(Formula.from_clauses([
+        Clause("foo", [Literal(1, True)]),
+        Clause("bar", [Literal(1, False), Literal(2, False)]),
+        Clause("baz", [Literal(2, True)])
+    ])) is None)
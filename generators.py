@@ -0,0 +1,155 @@
+import random
+from classes import Literal, Clause, Formula
+from sat_io import declare_variables
+from typing import List, Tuple
+
+# Instance generators for benchmarking. Every family is parametrized by a size and a seed and returns the same
+# (variables, formula) pair as `sat_io.read_input`, with variables numbered 1..n. Families whose structure is fixed by
+# the size use the seed to shuffle the clause order, so different seeds still give the solver different instances.
+
+# Clause-to-variable ratios of the random k-SAT phase transition, where instances are hardest
+THRESHOLDS = {2: 1.0, 3: 4.26, 4: 9.93, 5: 21.12}
+
+
+def build(num_vars: int, clauses: List[List[int]]) -> Tuple[List[int], Formula]:
+    formula = Formula()
+    declare_variables(formula, num_vars)
+    for clause in clauses:
+        formula.add_clause(clause)
+    return list(range(1, num_vars + 1)), formula
+
+
+def random_ksat(size: int, seed: int = 0, k: int = 3) -> Tuple[List[int], Formula]:
+    """
+    Uniform random k-SAT on `size` variables at the phase-transition ratio: every clause has k distinct variables,
+    each negated with probability 1/2. Satisfiable about half the time.
+    """
+    rng = random.Random(seed)
+    clauses = [[var if rng.random() < 0.5 else -var for var in rng.sample(range(1, size + 1), k)]
+               for _ in range(round(THRESHOLDS[k] * size))]
+    return build(size, clauses)
+
+
+def planted(size: int, seed: int = 0, k: int = 3) -> Tuple[List[int], Formula]:
+    """
+    Random k-SAT at the phase-transition ratio, keeping only clauses that a hidden random assignment satisfies, so the
+    instance is always satisfiable.
+    """
+    rng = random.Random(seed)
+    hidden = [None] + [rng.random() < 0.5 for _ in range(size)]
+    clauses = []
+    while len(clauses) < round(THRESHOLDS[k] * size):
+        clause = [var if rng.random() < 0.5 else -var for var in rng.sample(range(1, size + 1), k)]
+        if any(hidden[abs(lit)] == (lit > 0) for lit in clause):
+            clauses.append(clause)
+    return build(size, clauses)
+
+
+def pigeonhole(size: int, seed: int = 0) -> Tuple[List[int], Formula]:
+    """
+    `size` + 1 pigeons in `size` holes, with variable p * size + h + 1 meaning pigeon p sits in hole h. Always UNSAT,
+    and exponentially hard for resolution.
+    """
+    holes = size
+
+    def var(pigeon: int, hole: int) -> int:
+        return pigeon * holes + hole + 1
+
+    clauses = [[var(pigeon, hole) for hole in range(holes)] for pigeon in range(holes + 1)]
+    for hole in range(holes):
+        for first in range(holes + 1):
+            for second in range(first + 1, holes + 1):
+                clauses.append([-var(first, hole), -var(second, hole)])
+    random.Random(seed).shuffle(clauses)
+    return build((holes + 1) * holes, clauses)
+
+
+def coloring(size: int, seed: int = 0, colors: int = 3) -> Tuple[List[int], Formula]:
+    """
+    Coloring a random graph on `size` nodes with `colors` colors, with variable node * colors + color + 1 meaning the
+    node has that color. For 3 colors the graph has 2.3 edges per node, close to where colorability becomes unlikely.
+    """
+    rng = random.Random(seed)
+
+    def var(node: int, color: int) -> int:
+        return node * colors + color + 1
+
+    edges = set()
+    while len(edges) < round(2.3 * size):
+        first, second = sorted(rng.sample(range(size), 2))
+        edges.add((first, second))
+
+    clauses = []
+    for node in range(size):
+        clauses.append([var(node, color) for color in range(colors)])
+        for first in range(colors):
+            for second in range(first + 1, colors):
+                clauses.append([-var(node, first), -var(node, second)])
+    for first, second in sorted(edges):
+        for color in range(colors):
+            clauses.append([-var(first, color), -var(second, color)])
+    return build(size * colors, clauses)
+
+
+def parity(size: int, seed: int = 0) -> Tuple[List[int], Formula]:
+    """
+    A random system of `size` XOR constraints over `size` variables, three variables each, with random right-hand
+    sides. Each constraint becomes the four clauses that rule out the assignments of the wrong parity. Hard for CDCL,
+    which cannot do the Gaussian elimination that would solve it directly.
+    """
+    rng = random.Random(seed)
+    clauses = []
+    for _ in range(size):
+        variables = rng.sample(range(1, size + 1), 3)
+        odd = rng.random() < 0.5
+        for bits in range(8):
+            signs = [bool(bits >> position & 1) for position in range(3)]
+            if sum(signs) % 2 != odd:
+                # This assignment has the wrong parity, so the clause of its negations forbids it
+                clauses.append([-var if sign else var for var, sign in zip(variables, signs)])
+    return build(size, clauses)
+
+
+FAMILIES = {
+    "random": random_ksat,
+    "planted": planted,
+    "pigeonhole": pigeonhole,
+    "coloring": coloring,
+    "parity": parity
+}
+
+
+def generate(family: str, size: int, seed: int = 0) -> Tuple[List[int], Formula]:
+    """
+    Generates the instance of the family registered as `family` in FAMILIES.
+    """
+    if family not in FAMILIES:
+        raise ValueError(f"Unknown instance family {family}")
+    return FAMILIES[family](size, seed)
+
+
+if __name__ == "__main__":
+    from solver import solve, verify_assignment
+
+    variables, formula = generate("random", 20, seed=1)
+    assert(len(variables) == 20 and len(formula) == 85)
+    assert(list(generate("random", 20, seed=1)[1]) == list(formula))
+
+    for seed in range(5):
+        variables, formula = generate("planted", 30, seed)
+        assert(verify_assignment(solve(variables, formula), formula))
+
+    assert(solve(*generate("pigeonhole", 4)) is None)
+
+    # Every XOR constraint rules out the four assignments of the wrong parity
+    variables, formula = generate("parity", 12, seed=3)
+    assert(len(formula) == 48)
+    model = solve(variables, formula)
+    if model is not None:
+        assert(verify_assignment(model, formula))
+
+    # Every model of a coloring instance colors both ends of every edge differently
+    variables, formula = generate("coloring", 10, seed=2)
+    model = solve(variables, formula)
+    if model is not None:
+        assert(verify_assignment(model, formula))
@@ -0,0 +1,320 @@
+import random
+from propagation import Propagator
+from typing import Dict, List, Optional
+
+# Branching heuristics. Each one picks the next decision literal for the search through the same small interface:
+# `pick` returns an unassigned literal (or None once every variable is assigned), `bump` is called for every variable
+# that takes part in a conflict, `decay` once per conflict and `unassigned` for every variable undone on backtrack.
+
+
+class Heuristic:
+    def pick(self, propagator: Propagator) -> Optional[int]:
+        raise NotImplementedError
+
+    def bump(self, var: int) -> None:
+        pass
+
+    def decay(self) -> None:
+        pass
+
+    def unassigned(self, var: int) -> None:
+        pass
+
+
+class VarHeap:
+    """
+    An indexed binary max-heap of variables ordered by `activity`. The position of every variable in the heap is
+    tracked, so an increased activity can be restored in O(log n) without searching for the variable.
+    """
+    def __init__(self, activity: List[float]):
+        self.activity = activity
+        self.heap: List[int] = []
+        self.positions: List[int] = []
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, var: int) -> bool:
+        return var < len(self.positions) and self.positions[var] >= 0
+
+    def push(self, var: int) -> None:
+        if var >= len(self.positions):
+            self.positions.extend([-1] * (var + 1 - len(self.positions)))
+        if self.positions[var] >= 0:
+            return
+        self.positions[var] = len(self.heap)
+        self.heap.append(var)
+        self.sift_up(len(self.heap) - 1)
+
+    def pop(self) -> int:
+        top = self.heap[0]
+        last = self.heap.pop()
+        self.positions[top] = -1
+        if self.heap:
+            self.heap[0] = last
+            self.positions[last] = 0
+            self.sift_down(0)
+        return top
+
+    def increased(self, var: int) -> None:
+        """
+        Restores the heap order after the activity of `var` went up.
+        """
+        if var in self:
+            self.sift_up(self.positions[var])
+
+    def sift_up(self, position: int) -> None:
+        heap, activity = self.heap, self.activity
+        var = heap[position]
+        while position > 0:
+            parent = (position - 1) >> 1
+            if activity[heap[parent]] >= activity[var]:
+                break
+            heap[position] = heap[parent]
+            self.positions[heap[position]] = position
+            position = parent
+        heap[position] = var
+        self.positions[var] = position
+
+    def sift_down(self, position: int) -> None:
+        heap, activity = self.heap, self.activity
+        var = heap[position]
+        size = len(heap)
+        while True:
+            child = 2 * position + 1
+            if child >= size:
+                break
+            if child + 1 < size and activity[heap[child + 1]] > activity[heap[child]]:
+                child += 1
+            if activity[heap[child]] <= activity[var]:
+                break
+            heap[position] = heap[child]
+            self.positions[heap[position]] = position
+            position = child
+        heap[position] = var
+        self.positions[var] = position
+
+
+if __name__ == "__main__":
+    activity = [0.0, 3.0, 1.0, 2.0]
+    heap = VarHeap(activity)
+    for var in (1, 2, 3):
+        heap.push(var)
+    activity[2] = 5.0
+    heap.increased(2)
+    assert([heap.pop(), heap.pop(), heap.pop()] == [2, 1, 3])
+    assert(len(heap) == 0 and 1 not in heap)
+
+
+class VSIDS(Heuristic):
+    """
+    Exponential VSIDS: every variable seen in a conflict has its activity bumped by an increment that grows by 1/`decay`
+    after each conflict, so recent conflicts weigh more. The unassigned variable of highest activity comes off a heap.
+    A nonzero `seed` starts every variable at a tiny random activity instead of 0, which only changes how ties between
+    variables that were never bumped are broken.
+    """
+    def __init__(self, decay: float = 0.95, seed: int = 0):
+        self.decay_factor = decay
+        self.random = random.Random(seed) if seed else None
+        self.increment = 1.0
+        self.activity: List[float] = [0.0]
+        self.order = VarHeap(self.activity)
+
+    def grow(self, count: int) -> None:
+        """
+        Adds the variables up to `count` to the heap with no (or a tiny random) activity.
+        """
+        for var in range(len(self.activity), count + 1):
+            self.activity.append(self.random.random() * 1e-6 if self.random is not None else 0.0)
+            self.order.push(var)
+
+    def pick(self, propagator: Propagator) -> Optional[int]:
+        self.grow(propagator.num_vars())
+        while len(self.order) > 0:
+            var = self.order.pop()
+            if propagator.values[var] is None:
+                return propagator.phase_literal(var)
+
+        return None
+
+    def bump(self, var: int) -> None:
+        self.grow(var)
+        self.activity[var] += self.increment
+        if self.activity[var] > 1e100:
+            # Rescale everything before the floats overflow; the order is unchanged
+            for index in range(len(self.activity)):
+                self.activity[index] *= 1e-100
+            self.increment *= 1e-100
+        self.order.increased(var)
+
+    def decay(self) -> None:
+        self.increment /= self.decay_factor
+
+    def unassigned(self, var: int) -> None:
+        if var < len(self.activity):
+            self.order.push(var)
+
+
+class FirstUnassigned(Heuristic):
+    """
+    The original `util.pick_var` strategy: the first unassigned variable in clause order.
+    """
+    def pick(self, propagator: Propagator) -> Optional[int]:
+        values = propagator.values
+        for lit in propagator.store.lits:
+            if values[abs(lit)] is None:
+                return propagator.phase_literal(abs(lit))
+
+        # Variables that appear in no stored clause still need a value
+        var = propagator.pick_unassigned()
+        return None if var is None else propagator.phase_literal(var)
+
+
+class RandomChoice(Heuristic):
+    """
+    A uniformly random unassigned variable with a random polarity.
+    """
+    def __init__(self, seed: int = 0):
+        self.random = random.Random(seed)
+
+    def pick(self, propagator: Propagator) -> Optional[int]:
+        free = [var for var in range(1, len(propagator.values)) if propagator.values[var] is None]
+        if not free:
+            return None
+        var = self.random.choice(free)
+        return var if self.random.random() < 0.5 else -var
+
+
+class ClauseScoring(Heuristic):
+    """
+    Base for the literal-counting heuristics, which score literals over the clauses that are not yet satisfied. This
+    rescans the clause store at every decision, so it is meant for comparison rather than for large instances.
+    """
+    def pick(self, propagator: Propagator) -> Optional[int]:
+        scores = self.score(propagator, unsatisfied_clauses(propagator))
+        if not scores:
+            var = propagator.pick_unassigned()
+            return None if var is None else propagator.phase_literal(var)
+
+        var = max(scores, key=lambda v: self.combine(scores[v]))
+        positive, negative = scores[var]
+        return var if positive >= negative else -var
+
+    def score(self, propagator: Propagator, clauses: List[List[int]]) -> Dict[int, List[float]]:
+        raise NotImplementedError
+
+    def combine(self, score: List[float]) -> float:
+        return score[0] + score[1]
+
+
+def unsatisfied_clauses(propagator: Propagator) -> List[List[int]]:
+    """
+    Returns the unassigned literals of every clause in the store that is not satisfied yet.
+    """
+    store = propagator.store
+    values = propagator.values
+    result = []
+    for index in range(len(store)):
+        free = []
+        for lit in store.clause(index):
+            value = values[abs(lit)]
+            if value is None:
+                free.append(lit)
+            elif value == (lit > 0):
+                break
+        else:
+            if free:
+                result.append(free)
+
+    return result
+
+
+class DLIS(ClauseScoring):
+    """
+    Dynamic Largest Individual Sum: the literal that occurs in the most unsatisfied clauses.
+    """
+    def score(self, propagator: Propagator, clauses: List[List[int]]) -> Dict[int, List[float]]:
+        scores: Dict[int, List[float]] = {}
+        for clause in clauses:
+            for lit in clause:
+                scores.setdefault(abs(lit), [0, 0])[lit < 0] += 1
+        return scores
+
+    def combine(self, score: List[float]) -> float:
+        return max(score)
+
+
+class MOMS(ClauseScoring):
+    """
+    Maximum Occurrences in clauses of Minimum Size, using the (f(x) + f(-x)) * 2^k + f(x) * f(-x) scoring with k = 4.
+    """
+    def score(self, propagator: Propagator, clauses: List[List[int]]) -> Dict[int, List[float]]:
+        shortest = min(len(clause) for clause in clauses) if clauses else 0
+        scores: Dict[int, List[float]] = {}
+        for clause in clauses:
+            if len(clause) == shortest:
+                for lit in clause:
+                    scores.setdefault(abs(lit), [0, 0])[lit < 0] += 1
+        return scores
+
+    def combine(self, score: List[float]) -> float:
+        return (score[0] + score[1]) * 16 + score[0] * score[1]
+
+
+class JeroslowWang(ClauseScoring):
+    """
+    Two-sided Jeroslow-Wang: every unsatisfied clause adds 2^-|clause| to each of its literals.
+    """
+    def score(self, propagator: Propagator, clauses: List[List[int]]) -> Dict[int, List[float]]:
+        scores: Dict[int, List[float]] = {}
+        for clause in clauses:
+            weight = 2.0 ** -len(clause)
+            for lit in clause:
+                scores.setdefault(abs(lit), [0.0, 0.0])[lit < 0] += weight
+        return scores
+
+
+HEURISTICS = {
+    "vsids": VSIDS,
+    "first": FirstUnassigned,
+    "dlis": DLIS,
+    "moms": MOMS,
+    "jw": JeroslowWang,
+    "random": RandomChoice
+}
+
+
+def make_heuristic(name: str, seed: int = 0) -> Heuristic:
+    """
+    Builds the branching heuristic registered as `name` in HEURISTICS.
+    """
+    if name not in HEURISTICS:
+        raise ValueError(f"Unknown branching heuristic {name}")
+    if name in ("random", "vsids"):
+        return HEURISTICS[name](seed=seed)
+    return HEURISTICS[name]()
+
+
+if __name__ == "__main__":
+    from classes import Literal, Clause, Formula
+
+    # (x or y or z) and (!x or y) and (!y or z)
+    formula = Formula.from_clauses([
+        Clause("foo", [Literal(1, True), Literal(2, True), Literal(3, True)]),
+        Clause("bar", [Literal(1, False), Literal(2, True)]),
+        Clause("baz", [Literal(2, False), Literal(3, True)])
+    ])
+
+    # y occurs in every clause and twice positively
+    assert(DLIS().pick(Propagator([1, 2, 3], formula)) == 2)
+    assert(MOMS().pick(Propagator([1, 2, 3], formula)) == 2)
+    assert(JeroslowWang().pick(Propagator([1, 2, 3], formula)) == 2)
+    assert(FirstUnassigned().pick(Propagator([1, 2, 3], formula)) == 1)
+
+    # The most bumped variable comes first, and backtracked variables are picked again
+    vsids = VSIDS()
+    propagator = Propagator([1, 2, 3], formula)
+    assert(vsids.pick(propagator) == 1)
+    vsids.bump(3)
+    vsids.unassigned(1)
+    assert(vsids.pick(propagator) == 3)
@@ -0,0 +1,96 @@
+from classes import Literal, Clause, Formula, UNKNOWN
+from propagation import Propagator
+from cdcl import cdcl_solve
+from budget import Budget, BudgetExhausted
+from heuristics import make_heuristic
+from restarts import make_restart_policy
+from util import create_total_assignment
+from typing import Iterable, List, Mapping, Optional
+
+# Incremental solving: one long-lived CDCL search state that clauses are added to between queries, each of which may
+# assume some literals. Assumptions are decided rather than added as clauses, so every learned clause follows from
+# the clauses alone and is kept for the next query, along with the VSIDS scores and saved phases.
+#
+# Preprocessing, pure literals and the fragment fast paths all assume the formula is final, so none of them are used.
+
+
+class Solver:
+    """
+    An incremental CDCL solver. `variables` and `formula` give the starting formula (empty by default); the remaining
+    options are the ones `solver.solve` takes for the search.
+    """
+    def __init__(self, variables: Iterable = (), formula: Optional[Formula] = None, heuristic: str = "vsids",
+                 seed: int = 0, restart: str = "luby", phase_saving: bool = True, initial_phase: bool = True):
+        self.variables: List = list(variables)
+        self.propagator = Propagator(self.variables, formula if formula is not None else Formula())
+        self.propagator.phase_saving = phase_saving
+        self.propagator.set_default_phase(initial_phase)
+        self.heuristic = make_heuristic(heuristic, seed)
+        self.restarts = make_restart_policy(restart)
+        self.failed: List[Literal] = []
+
+    def add_clause(self, literals: Iterable[Literal]) -> bool:
+        """
+        Adds the clause made of `literals`, registering any variable it introduces. Returns False once the clauses are
+        known to be UNSAT, regardless of assumptions.
+        """
+        return self.propagator.add_clause([self.to_int(literal) for literal in literals])
+
+    def to_int(self, literal: Literal) -> int:
+        if literal.name not in self.propagator.indices:
+            self.variables.append(literal.name)
+        return self.propagator.to_int(literal)
+
+    def solve(self, assumptions: Iterable[Literal] = (), budget: Optional[Budget] = None) -> Optional[Mapping]:
+        """
+        Returns a total assignment satisfying every clause added so far and every literal of `assumptions`, or None if
+        there is none. In that case `failed` holds the assumptions that were enough to make the clauses UNSAT, which is
+        empty if the clauses are UNSAT on their own. Returns UNKNOWN if the search runs out of `budget`; everything it
+        learned until then is kept.
+        """
+        lits = [self.to_int(literal) for literal in assumptions]
+        try:
+            partial_assignment = cdcl_solve(self.propagator, self.heuristic, self.restarts, budget=budget,
+                                            assumptions=lits)
+        except BudgetExhausted:
+            self.propagator.backtrack(0)
+            return UNKNOWN
+        finally:
+            self.failed = [self.propagator.to_literal(lit) for lit in self.propagator.failed]
+        self.propagator.backtrack(0)
+        return create_total_assignment(self.variables, partial_assignment)
+
+
+if __name__ == "__main__":
+    from solver import verify_assignment
+
+    # (x or y) and (!x or z), queried under assumptions as clauses are added
+    solver = Solver()
+    solver.add_clause([Literal("x", True), Literal("y", True)])
+    solver.add_clause([Literal("x", False), Literal("z", True)])
+    model = solver.solve([Literal("x", True)])
+    assert(model["x"] and model["z"])
+    assert(solver.solve([Literal("x", False)])["y"])
+
+    # Assuming !z, w and !y leaves no value for x; w is not to blame
+    assert(solver.solve([Literal("z", False), Literal("w", True), Literal("y", False)]) is None)
+    assert(sorted(solver.failed, key=repr) == [Literal("y", False), Literal("z", False)])
+
+    # The clauses alone are still satisfiable, until (!y) and (!z) make them UNSAT for good
+    assert(solver.solve() is not None)
+    assert(solver.solve(budget=Budget(decisions=0)) is UNKNOWN)
+    solver.add_clause([Literal("y", False)])
+    assert(solver.solve([Literal("z", True)])["x"])
+    solver.add_clause([Literal("z", False)])
+    assert(solver.solve() is None and solver.failed == [])
+    assert(solver.solve([Literal("w", True)]) is None)
+
+    # Starting from a formula, every answer satisfies it
+    formula = Formula.from_clauses([
+        Clause("foo", [Literal(1, True), Literal(2, True), Literal(3, True)]),
+        Clause("bar", [Literal(1, False), Literal(2, False)]),
+        Clause("baz", [Literal(2, True), Literal(3, False)])
+    ])
+    incremental = Solver([1, 2, 3], formula)
+    for assumption in (Literal(1, True), Literal(2, True), Literal(3, True)):
+        assert(verify_assignment(incremental.solve([assumption]), formula))
@@ -0,0 +1,336 @@
+import random
+from array import array
+from classes import Literal, Clause, Formula
+from util import has_empty_clause
+from typing import Dict, List, Optional
+
+# Stochastic local search. Instead of extending a partial assignment, it starts from a total random assignment and
+# flips one variable of an unsatisfied clause at a time until no clause is left unsatisfied. On large satisfiable
+# formulas this often finds a model long before a systematic search would, but it can never show that a formula is
+# UNSAT: `solver --mode local` gives up with UNKNOWN after its tries, while `solver --mode hybrid` runs a short local
+# search first and hands its best assignment to the CDCL search as the saved phases.
+#
+# Every clause keeps its number of true literals and the sum of its true variables, which is the only true variable
+# while the count is 1. Every variable keeps its break count (the clauses that flipping it would falsify) and its make
+# count (the unsatisfied clauses that flipping it would satisfy). A flip only visits the clauses of the flipped
+# variable to bring them up to date.
+
+# Policies for picking the variable to flip in an unsatisfied clause
+POLICIES = ["probsat", "walksat"]
+
+# WalkSAT takes a random variable of the clause with this probability, unless some variable breaks nothing
+WALKSAT_NOISE = 0.567
+
+# ProbSAT picks every variable of the clause with a probability proportional to (PROBSAT_EPS + break) ** -PROBSAT_CB
+PROBSAT_CB = 2.06
+PROBSAT_EPS = 0.9
+
+# Flips per variable in one try of `local_solve`, and tries before it gives up
+FLIPS_PER_VARIABLE = 1000
+MAX_TRIES = 10
+
+# The budget is checked once per this many flips
+BUDGET_CHECK_INTERVAL = 1024
+
+
+class LocalSearch:
+    """
+    A local search over the clauses of `formula`, picking flips with `policy` (one of POLICIES) and random choices
+    driven by `seed`. Tautologies are left out, since no assignment falsifies them. Cardinality constraints are searched
+    through their direct encoding (see `Formula.clausal`). Like a `Propagator`, it keeps the
+    counters of `stats.COUNTERS`, so that a `Budget` can limit it: every flip counts as a decision and every new try
+    as a restart.
+    """
+    def __init__(self, formula: Formula, policy: str = "probsat", seed: int = 0):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown local search policy {policy}")
+        self.names: List = formula.names
+        self.pick = self.pick_probsat if policy == "probsat" else self.pick_walksat
+        self.random = random.Random(seed)
+        if formula.num_constraints() > 0:
+            formula = formula.clausal()
+
+        # No assignment satisfies an empty clause, and it has no variable to flip
+        self.refuted = has_empty_clause(formula)
+
+        self.lits = array("i")
+        self.offsets = array("q", [0])
+        for index in range(len(formula)):
+            clause = set(formula.clause(index))
+            if not any(-lit in clause for lit in clause):
+                self.lits.extend(clause)
+                self.offsets.append(len(self.lits))
+
+        # The clauses of every literal, at occurrences[occurrence_offsets[code]:occurrence_offsets[code + 1]] with the
+        # code 2 * var for a positive literal and 2 * var + 1 for a negative one
+        num_vars = formula.num_vars()
+        counts = [0] * (2 * num_vars + 3)
+        for lit in self.lits:
+            counts[2 * abs(lit) + (lit < 0) + 1] += 1
+        for code in range(1, len(counts)):
+            counts[code] += counts[code - 1]
+        self.occurrence_offsets = array("q", counts)
+        self.occurrences = array("i", [0]) * len(self.lits)
+        filled = counts[:-1]
+        for index in range(len(self)):
+            for k in range(self.offsets[index], self.offsets[index + 1]):
+                code = 2 * abs(self.lits[k]) + (self.lits[k] < 0)
+                self.occurrences[filled[code]] = index
+                filled[code] += 1
+
+        self.values = bytearray(num_vars + 1)
+        self.true_count = array("i", [0]) * len(self)
+        self.true_sum = array("q", [0]) * len(self)
+        self.breaks = array("i", [0]) * (num_vars + 1)
+        self.makes = array("i", [0]) * (num_vars + 1)
+
+        # Unsatisfied clauses, and the position of every clause in that list (-1 if satisfied)
+        self.unsat: List[int] = []
+        self.positions = array("i", [-1]) * len(self)
+
+        # The assignment with the fewest unsatisfied clauses seen so far
+        self.best = bytearray(num_vars + 1)
+        self.best_unsat = len(self) + 1
+
+        # ProbSAT's weight for every break count seen so far
+        self.weights: List[float] = []
+
+        self.decisions = 0
+        self.propagations = 0
+        self.conflicts = 0
+        self.backtracks = 0
+        self.restarts = 0
+        self.learned = 0
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def clause_vars(self, index: int) -> List[int]:
+        return [abs(lit) for lit in self.lits[self.offsets[index]:self.offsets[index + 1]]]
+
+    def reset(self, phases: Optional[Dict[int, bool]] = None) -> None:
+        """
+        Starts over from the values in `phases` for the variables it has and random values for the others, and counts
+        the true literals, breaks and makes from scratch.
+        """
+        for var in range(1, len(self.values)):
+            value = phases.get(var) if phases is not None else None
+            self.values[var] = value if value is not None else self.random.random() < 0.5
+        for var in range(len(self.breaks)):
+            self.breaks[var] = 0
+            self.makes[var] = 0
+        self.unsat = []
+
+        for index in range(len(self)):
+            count = 0
+            total = 0
+            for k in range(self.offsets[index], self.offsets[index + 1]):
+                lit = self.lits[k]
+                if self.values[abs(lit)] == (lit > 0):
+                    count += 1
+                    total += abs(lit)
+            self.true_count[index] = count
+            self.true_sum[index] = total
+            self.positions[index] = -1
+            if count == 0:
+                self.add_unsat(index)
+            elif count == 1:
+                self.breaks[total] += 1
+        self.remember()
+
+    def add_unsat(self, index: int) -> None:
+        self.positions[index] = len(self.unsat)
+        self.unsat.append(index)
+        for var in self.clause_vars(index):
+            self.makes[var] += 1
+
+    def remove_unsat(self, index: int) -> None:
+        # Fill the hole with the last clause of the list
+        last = self.unsat.pop()
+        if last != index:
+            self.unsat[self.positions[index]] = last
+            self.positions[last] = self.positions[index]
+        self.positions[index] = -1
+        for var in self.clause_vars(index):
+            self.makes[var] -= 1
+
+    def remember(self) -> None:
+        if len(self.unsat) < self.best_unsat:
+            self.best_unsat = len(self.unsat)
+            self.best[:] = self.values
+
+    def flip(self, var: int) -> None:
+        """
+        Flips `var` and brings the counts of its clauses up to date.
+        """
+        value = not self.values[var]
+        self.values[var] = value
+        self.decisions += 1
+        true_code = 2 * var + (not value)
+        false_code = 2 * var + value
+
+        for k in range(self.occurrence_offsets[true_code], self.occurrence_offsets[true_code + 1]):
+            index = self.occurrences[k]
+            count = self.true_count[index] + 1
+            self.true_count[index] = count
+            self.true_sum[index] += var
+            if count == 1:
+                self.remove_unsat(index)
+                self.breaks[var] += 1
+            elif count == 2:
+                # The variable that was the only true one can be flipped without breaking this clause now
+                self.breaks[self.true_sum[index] - var] -= 1
+
+        for k in range(self.occurrence_offsets[false_code], self.occurrence_offsets[false_code + 1]):
+            index = self.occurrences[k]
+            count = self.true_count[index] - 1
+            self.true_count[index] = count
+            self.true_sum[index] -= var
+            if count == 0:
+                self.add_unsat(index)
+                self.breaks[var] -= 1
+            elif count == 1:
+                self.breaks[self.true_sum[index]] += 1
+
+    def pick_walksat(self, index: int) -> int:
+        """
+        Returns a variable of the clause at `index` that breaks nothing if there is one. Otherwise, with probability
+        WALKSAT_NOISE a random variable of the clause, and the one that breaks the fewest clauses (then makes the most)
+        the rest of the time.
+        """
+        candidates = self.clause_vars(index)
+        least = min(self.breaks[var] for var in candidates)
+        if least > 0 and self.random.random() < WALKSAT_NOISE:
+            return self.random.choice(candidates)
+        return max((var for var in candidates if self.breaks[var] == least), key=lambda var: self.makes[var])
+
+    def pick_probsat(self, index: int) -> int:
+        """
+        Returns a variable of the clause at `index`, picked with a probability that falls polynomially with its break
+        count.
+        """
+        candidates = self.clause_vars(index)
+        weights = []
+        for var in candidates:
+            breaks = self.breaks[var]
+            while breaks >= len(self.weights):
+                self.weights.append((PROBSAT_EPS + len(self.weights)) ** -PROBSAT_CB)
+            weights.append(self.weights[breaks])
+        return self.random.choices(candidates, weights)[0]
+
+    def run(self, max_flips: int, budget=None) -> Optional[Dict]:
+        """
+        Flips up to `max_flips` variables and returns the model keyed by variable names as soon as every clause is
+        satisfied, or None if it isn't by then. `budget` is checked every BUDGET_CHECK_INTERVAL flips. A formula with
+        an empty clause returns None right away.
+        """
+        if self.refuted:
+            return None
+        for _ in range(max_flips):
+            if not self.unsat:
+                return self.model()
+            if budget is not None and self.decisions % BUDGET_CHECK_INTERVAL == 0:
+                budget.check(self)
+            self.flip(self.pick(self.unsat[self.random.randrange(len(self.unsat))]))
+            if len(self.unsat) < self.best_unsat:
+                self.remember()
+        return self.model() if not self.unsat else None
+
+    def model(self) -> Dict:
+        return {self.names[var]: bool(self.values[var]) for var in range(1, len(self.values))}
+
+    def best_phases(self) -> Dict[int, bool]:
+        """
+        Returns the values of the best assignment seen so far by variable index.
+        """
+        return {var: bool(self.best[var]) for var in range(1, len(self.best))}
+
+
+def local_solve(formula: Formula, policy: str = "probsat", seed: int = 0, tries: int = MAX_TRIES,
+                flips: Optional[int] = None, budget=None, stats=None) -> Optional[Dict]:
+    """
+    Runs up to `tries` local searches of `flips` flips each (FLIPS_PER_VARIABLE per variable by default) from fresh
+    random assignments, and returns the first model found keyed by variable names, or None if there is none by then.
+    Gives up with BudgetExhausted once `budget` runs out. The counters of the search are added to `stats`, if given.
+    Returns None without flipping anything if `formula` has an empty clause.
+    """
+    search = LocalSearch(formula, policy, seed)
+    if search.refuted:
+        return None
+    flips = flips if flips is not None else FLIPS_PER_VARIABLE * max(formula.num_vars(), 1)
+    if budget is not None:
+        budget.begin(search)
+    try:
+        for attempt in range(tries):
+            search.restarts = attempt
+            search.reset()
+            model = search.run(flips, budget)
+            if model is not None:
+                return model
+        return None
+    finally:
+        if stats is not None:
+            stats.add_search(search)
+
+
+if __name__ == "__main__":
+    from budget import Budget, BudgetExhausted
+    from generators import planted, pigeonhole
+
+    # (x or y) and (!x or y) and (x or !y) only has x = y = True as a model
+    formula = Formula.from_clauses([
+        Clause("foo", [Literal("x", True), Literal("y", True)]),
+        Clause("bar", [Literal("x", False), Literal("y", True)]),
+        Clause("baz", [Literal("x", True), Literal("y", False)]),
+        Clause("buzz", [Literal("x", True), Literal("x", False)])
+    ])
+    search = LocalSearch(formula)
+    assert(len(search) == 3)
+    search.reset({1: False, 2: False})
+    assert(search.unsat == [0] and search.makes[1] == search.makes[2] == 1)
+    assert(search.breaks[1] == search.breaks[2] == 1)
+    search.flip(2)
+    assert(search.unsat == [2] and search.breaks[2] == 1 and search.makes[1] == search.makes[2] == 1)
+    search.flip(1)
+    assert(search.unsat == [] and search.breaks[1] == 1 and search.breaks[2] == 1)
+    assert(search.run(0) == {"x": True, "y": True})
+
+    # The counts kept up to date by flips match the ones counted from scratch
+    from solver import verify_assignment
+    for policy in POLICIES:
+        _, formula = planted(60, seed=1)
+        model = local_solve(formula, policy, seed=2)
+        assert(model is not None and verify_assignment(model, formula))
+
+        search = LocalSearch(formula, policy, seed=3)
+        search.reset()
+        search.run(200)
+        counts = (list(search.breaks), list(search.makes), sorted(search.unsat))
+        search.reset({var: bool(search.values[var]) for var in range(1, len(search.values))})
+        assert(counts == (list(search.breaks), list(search.makes), sorted(search.unsat)))
+
+    # An empty clause has nothing to flip, so the search returns right away
+    empty = Formula.from_clauses(list(formula))
+    empty.add_clause([])
+    for policy in POLICIES:
+        assert(LocalSearch(empty, policy).refuted and local_solve(empty, policy) is None)
+    search = LocalSearch(empty)
+    search.reset()
+    assert(search.run(100) is None and search.decisions == 0)
+
+    # Which makes it UNSAT for the solver in every mode, local search included
+    from solver import solve, MODES
+    clauses = Formula()
+    clauses.add_clause([clauses.add_variable(var) for var in range(1, 4)])
+    clauses.add_clause([])
+    for mode in MODES:
+        assert(solve([1, 2, 3], clauses, mode=mode, preprocess={}) is None)
+
+    # Local search can't refute a formula: it gives up, or runs out of its budget
+    _, pigeons = pigeonhole(5)
+    assert(local_solve(pigeons, tries=2, flips=100) is None)
+    try:
+        local_solve(pigeons, budget=Budget(decisions=5000))
+        assert(False)
+    except BudgetExhausted:
+        pass
@@ -0,0 +1,200 @@
+import multiprocessing
+import queue
+from classes import Literal, Clause, Formula
+from heuristics import make_heuristic
+from restarts import make_restart_policy
+from solver import search
+from typing import Dict, List, Mapping, Optional, Tuple
+
+# Portfolio solving: several differently configured searches race on the same (already preprocessed) formula in
+# separate processes, and whichever finishes first answers for all of them. The CDCL searches also publish their
+# shortest learned clauses to a ring buffer in shared memory and pick up everyone else's at their next restart.
+#
+# Sharing is sound because every worker searches exactly the same formula: a clause learned by one worker is implied
+# by the formula plus the pure literals fixed up front, which every worker derives the same way.
+
+# Differences from the requested configuration (branching heuristic, restart policy, initial phase and phase saving),
+# applied round-robin to the workers. Every worker but the first also gets its own seed, so even workers with the same
+# settings break ties differently.
+DIVERSIFICATIONS = [
+    {},
+    {"restart": "glucose"},
+    {"heuristic": "jw"},
+    {"initial_phase": False},
+    {"heuristic": "moms", "restart": "glucose"},
+    {"restart": "geometric"},
+    {"restart": "glucose", "initial_phase": False},
+    {"phase_saving": False}
+]
+
+# Learned clauses with at most this many literals are shared
+MAX_SHARED_SIZE = 2
+
+# Number of ints in the shared ring buffer
+CHANNEL_CAPACITY = 1 << 16
+
+
+def diversify(jobs: int, options: Mapping) -> List[Dict]:
+    """
+    Returns the `search` options of each of `jobs` workers, starting from the requested `options`.
+    """
+    configs = []
+    for worker in range(jobs):
+        config = dict(options)
+        config.update(DIVERSIFICATIONS[worker % len(DIVERSIFICATIONS)])
+        config["seed"] = options.get("seed", 0) + worker
+        configs.append(config)
+    return configs
+
+
+if __name__ == "__main__":
+    configs = diversify(8, {"mode": "cdcl", "restart": "luby", "seed": 0})
+    assert(configs[0] == {"mode": "cdcl", "restart": "luby", "seed": 0})
+    assert(configs[1]["restart"] == "glucose" and configs[4]["restart"] == "glucose")
+    assert(len({config["seed"] for config in configs}) == 8)
+    assert(len({config.get("heuristic", "vsids") for config in configs}) >= 2)
+    assert(diversify(9, {"heuristic": "dlis"})[8]["heuristic"] == "dlis")
+
+
+class ClauseChannel:
+    """
+    A ring buffer of clauses in shared memory. Every clause is written as [producer, size, lits...] behind a single
+    write position, and every reader keeps its own cursor into the stream. A reader that falls more than a whole
+    buffer behind skips ahead to the write position, losing the clauses in between.
+    """
+    def __init__(self, capacity: int = CHANNEL_CAPACITY):
+        self.capacity = capacity
+        self.buffer = multiprocessing.Array("i", capacity)
+        self.head = multiprocessing.Value("q", 0, lock=False)
+
+    def publish(self, producer: int, lits: List[int]) -> None:
+        record = [producer, len(lits)] + list(lits)
+        with self.buffer.get_lock():
+            data = self.buffer.get_obj()
+            head = self.head.value
+            for offset, value in enumerate(record):
+                data[(head + offset) % self.capacity] = value
+            self.head.value = head + len(record)
+
+    def receive(self, consumer: int, cursor: int) -> Tuple[List[List[int]], int]:
+        """
+        Returns the clauses written by everyone but `consumer` since `cursor`, and the cursor to read from next time.
+        """
+        with self.buffer.get_lock():
+            data = self.buffer.get_obj()
+            head = self.head.value
+            if head - cursor > self.capacity:
+                cursor = head
+            stream = [data[position % self.capacity] for position in range(cursor, head)]
+
+        clauses = []
+        position = 0
+        while position < len(stream):
+            producer, size = stream[position], stream[position + 1]
+            if producer != consumer:
+                clauses.append(stream[position + 2:position + 2 + size])
+            position += 2 + size
+        return clauses, head
+
+
+class Exchange:
+    """
+    One worker's end of a ClauseChannel, in the shape `cdcl.cdcl_solve` expects.
+    """
+    def __init__(self, channel: ClauseChannel, worker: int):
+        self.channel = channel
+        self.worker = worker
+        self.cursor = 0
+
+    def export(self, lits: List[int]) -> None:
+        if len(lits) <= MAX_SHARED_SIZE:
+            self.channel.publish(self.worker, lits)
+
+    def receive(self) -> List[List[int]]:
+        clauses, self.cursor = self.channel.receive(self.worker, self.cursor)
+        return clauses
+
+
+if __name__ == "__main__":
+    channel = ClauseChannel(capacity=8)
+    first, second = Exchange(channel, 0), Exchange(channel, 1)
+    first.export([1, -2])
+    first.export([3, 4, 5])
+    assert(second.receive() == [[1, -2]] and first.receive() == [])
+    second.export([-3])
+    assert(first.receive() == [[-3]] and second.receive() == [])
+
+    # Falling a whole buffer behind loses the clauses in between rather than reading overwritten ones
+    for _ in range(3):
+        first.export([1, 2])
+    assert(second.receive() == [])
+    first.export([2])
+    assert(second.receive() == [[2]])
+
+
+def worker(index: int, variables: List[str], formula: Formula, options: Mapping, channel: ClauseChannel,
+           results: multiprocessing.Queue) -> None:
+    options = dict(options)
+    brancher = make_heuristic(options.pop("heuristic", "vsids"), options.get("seed", 0))
+    policy = make_restart_policy(options.pop("restart", "luby"))
+    mode = options.pop("mode", "cdcl")
+    partial_assignment = search(variables, formula, mode, brancher, policy, exchange=Exchange(channel, index),
+                                **options)
+    results.put((index, partial_assignment))
+
+
+def portfolio_search(variables: List[str], formula: Formula, jobs: int, options: Mapping) -> Optional[Mapping]:
+    """
+    Runs `jobs` diversified `search`es on `formula` in parallel, starting from the requested `options` (the keyword
+    arguments of `solver.solve` that configure the search). Returns the partial assignment of the first worker to
+    finish, or None if it found the formula UNSAT; the other workers are stopped.
+    """
+    channel = ClauseChannel()
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=worker, args=(index, variables, formula, config, channel, results),
+                                       daemon=True)
+               for index, config in enumerate(diversify(jobs, options))]
+    for process in workers:
+        process.start()
+
+    try:
+        while True:
+            try:
+                _, partial_assignment = results.get(timeout=0.1)
+                return partial_assignment
+            except queue.Empty:
+                if any(process.is_alive() for process in workers):
+                    continue
+            # Every worker is gone, but the last answer may still have been on its way
+            try:
+                _, partial_assignment = results.get(timeout=1.0)
+                return partial_assignment
+            except queue.Empty:
+                raise RuntimeError("Every portfolio worker exited without an answer")
+    finally:
+        for process in workers:
+            process.terminate()
+        for process in workers:
+            process.join()
+
+
+if __name__ == "__main__":
+    from solver import solve, verify_assignment
+
+    # x is forced both ways: !x forces z by the first two clauses, which (x or !z) forbids, and x forces !y and !z,
+    # which falsifies (!x or y or z)
+    assert(solve([1, 2, 3], Formula.from_clauses([
+        Clause("foo", [Literal(1, True), Literal(2, True), Literal(3, True)]),
+        Clause("bar", [Literal(1, True), Literal(2, False), Literal(3, True)]),
+        Clause("baz", [Literal(1, True), Literal(3, False)]),
+        Clause("buzz", [Literal(1, False), Literal(2, True), Literal(3, True)]),
+        Clause("fizz", [Literal(1, False), Literal(2, False)]),
+        Clause("fuzz", [Literal(1, False), Literal(3, False)])
+    ]), preprocess={}, jobs=3) is None)
+
+    satisfiable = Formula.from_clauses([
+        Clause("foo", [Literal(1, True), Literal(2, True), Literal(3, True)]),
+        Clause("bar", [Literal(1, False), Literal(2, False), Literal(3, True)]),
+        Clause("baz", [Literal(2, True), Literal(3, False), Literal(4, True)])
+    ])
+    assert(verify_assignment(solve([1, 2, 3, 4], satisfiable, preprocess={}, jobs=3), satisfiable))
@@ -0,0 +1,397 @@
+from classes import Literal, Clause, Formula
+from propagation import Propagator
+from proof import Proof
+from collections import deque
+from time import time
+from typing import Dict, List, Mapping, Optional, Set, Tuple
+
+# One-shot simplification of a formula before search. Clauses are copied once into a working set indexed by occurrence
+# lists (literal -> indices of the clauses containing it), which every technique below works on:
+#
+# - subsumption removes every clause that contains all the literals of another clause
+# - strengthening (self-subsuming resolution) drops -l from D whenever C \ {l} is a subset of D for some C containing l
+# - elimination (bounded variable elimination) replaces all clauses on a variable by their resolvents, as long as that
+#   does not increase the number of clauses, and remembers the removed clauses so a model can be reconstructed
+# - probing assigns each polarity of a variable in turn; if unit propagation fails, the opposite literal is a unit
+#
+# Top-level units are propagated through the occurrence lists as soon as they are found. Given a DRAT proof, every
+# clause and unit derived along the way is added to it and every clause thrown away is deleted from it, so the proof of
+# the search can pick up from the simplified formula.
+#
+# Cardinality constraints are left as they are. Their variables are never eliminated, since the constraints would have
+# to take part in the resolution, but probing sees them through the propagator.
+
+TECHNIQUES = ["probing", "subsumption", "strengthening", "elimination"]
+DEFAULT_BUDGETS = {technique: 1.0 for technique in TECHNIQUES}
+
+# Variables with more occurrences than this are too expensive to try eliminating
+MAX_ELIMINATION_OCCURRENCES = 16
+
+
+class Preprocessor:
+    def __init__(self, formula: Formula, proof: Optional[Proof] = None):
+        self.formula = formula
+        self.proof = proof
+        self.clauses: List[Optional[List[int]]] = []
+        self.occurrences: Dict[int, Set[int]] = {}
+        self.values: Dict[int, bool] = {}
+        self.units: List[int] = []
+        self.eliminated: List[Tuple[int, List[List[int]]]] = []
+        self.eliminated_vars: Set[int] = set()
+        self.frozen: Set[int] = set(map(abs, formula.constraint_lits))
+        self.ok = True
+
+        for var in range(1, formula.num_vars() + 1):
+            self.occurrences[var] = set()
+            self.occurrences[-var] = set()
+        for index in range(len(formula)):
+            self.add(list(formula.clause(index)), derived=False)
+        self.propagate_units()
+
+    def run(self, budgets: Mapping[str, float]) -> None:
+        """
+        Applies every technique named in `budgets`, in the order of TECHNIQUES, giving each at most its number of
+        seconds. Subsumption and strengthening share one pass over the clauses, in which each stops at its own budget.
+        """
+        for technique in budgets:
+            if technique not in TECHNIQUES:
+                raise ValueError(f"Unknown preprocessing technique {technique}")
+
+        if "probing" in budgets and self.ok:
+            self.probe(budgets["probing"])
+        if ("subsumption" in budgets or "strengthening" in budgets) and self.ok:
+            self.subsume(budgets.get("subsumption"), budgets.get("strengthening"))
+        if "elimination" in budgets and self.ok:
+            self.eliminate(budgets["elimination"])
+
+    def add(self, lits: List[int], derived: bool = True) -> None:
+        """
+        Adds a clause to the working set, dropping duplicate and falsified literals. Satisfied clauses and tautologies
+        are skipped, and unit clauses are assigned instead of stored. Clauses that are not `derived` are already part of
+        the formula, so they only go into the proof if they had to be simplified.
+        """
+        clause = []
+        for lit in lits:
+            value = self.values.get(abs(lit))
+            if value is not None:
+                if value == (lit > 0):
+                    return
+                continue
+            if -lit in clause:
+                return
+            if lit not in clause:
+                clause.append(lit)
+
+        if len(clause) == 0:
+            self.ok = False
+        elif len(clause) == 1:
+            self.assign(clause[0])
+        else:
+            if self.proof is not None and (derived or clause != lits):
+                self.proof.add(clause)
+                if not derived:
+                    self.proof.delete(lits)
+            index = len(self.clauses)
+            self.clauses.append(clause)
+            for lit in clause:
+                self.occurrences[lit].add(index)
+
+    def assign(self, lit: int) -> None:
+        value = self.values.get(abs(lit))
+        if value is None:
+            self.values[abs(lit)] = lit > 0
+            self.units.append(lit)
+            if self.proof is not None:
+                self.proof.add([lit])
+        elif value != (lit > 0):
+            self.ok = False
+
+    def remove(self, index: int) -> None:
+        if self.proof is not None:
+            self.proof.delete(self.clauses[index])
+        for lit in self.clauses[index]:
+            self.occurrences[lit].discard(index)
+        self.clauses[index] = None
+
+    def remove_literal(self, index: int, lit: int) -> None:
+        """
+        Drops `lit` from the clause at `index`, turning the clause into an assignment if only one literal is left.
+        """
+        clause = self.clauses[index]
+        if self.proof is not None:
+            self.proof.add([other for other in clause if other != lit])
+            self.proof.delete(clause)
+        clause.remove(lit)
+        self.occurrences[lit].discard(index)
+        if len(clause) == 1:
+            self.remove(index)
+            self.assign(clause[0])
+
+    def propagate_units(self) -> None:
+        while self.units and self.ok:
+            lit = self.units.pop()
+            for index in list(self.occurrences[lit]):
+                self.remove(index)
+            for index in list(self.occurrences[-lit]):
+                self.remove_literal(index, -lit)
+
+    def subsume(self, subsumption_budget: Optional[float] = 1.0, strengthening_budget: Optional[float] = 1.0) -> None:
+        """
+        Runs backward subsumption and self-subsuming resolution from every clause, shortest first, each for at most its
+        number of seconds, or not at all if it is None. Strengthened clauses are checked again, since they may now
+        subsume others.
+        """
+        start = time()
+        subsumption_deadline = start + subsumption_budget if subsumption_budget is not None else start
+        strengthening_deadline = start + strengthening_budget if strengthening_budget is not None else start
+        live = [index for index, clause in enumerate(self.clauses) if clause is not None]
+        queue = deque(sorted(live, key=lambda index: len(self.clauses[index])))
+
+        while queue and self.ok:
+            now = time()
+            subsumption = now < subsumption_deadline
+            strengthening = now < strengthening_deadline
+            if not subsumption and not strengthening:
+                break
+            index = queue.popleft()
+            clause = self.clauses[index]
+            if clause is None:
+                continue
+
+            # Every clause that C subsumes or strengthens contains C's rarest literal or its negation
+            occurrences = self.occurrences
+            best = min(clause, key=lambda lit: len(occurrences[lit]) + len(occurrences[-lit]))
+            candidates = list(occurrences[best])
+            if strengthening:
+                candidates += list(occurrences[-best])
+
+            for other in candidates:
+                target = self.clauses[other]
+                if other == index or target is None or len(target) < len(clause):
+                    continue
+
+                members = set(target)
+                missing = [lit for lit in clause if lit not in members]
+                if not missing:
+                    if subsumption:
+                        self.remove(other)
+                elif strengthening and len(missing) == 1 and -missing[0] in members:
+                    self.remove_literal(other, -missing[0])
+                    if self.clauses[other] is not None:
+                        queue.append(other)
+
+            self.propagate_units()
+
+    def eliminate(self, budget: float) -> None:
+        """
+        Eliminates variables by clause distribution, cheapest first, as long as the resolvents are no more numerous
+        than the clauses they replace.
+        """
+        deadline = time() + budget
+        occurrences = self.occurrences
+        candidates = [var for var in range(1, self.formula.num_vars() + 1)
+                      if var not in self.values and var not in self.frozen
+                      and 0 < len(occurrences[var]) + len(occurrences[-var]) <= MAX_ELIMINATION_OCCURRENCES]
+        candidates.sort(key=lambda var: len(occurrences[var]) * len(occurrences[-var]))
+
+        for var in candidates:
+            if not self.ok or time() >= deadline:
+                break
+            if var in self.values or len(occurrences[var]) + len(occurrences[-var]) > MAX_ELIMINATION_OCCURRENCES:
+                continue
+
+            positive = [self.clauses[index] for index in occurrences[var]]
+            negative = [self.clauses[index] for index in occurrences[-var]]
+            limit = len(positive) + len(negative)
+
+            resolvents = []
+            for first in positive:
+                for second in negative:
+                    resolvent = resolve(first, second, var)
+                    if resolvent is not None:
+                        resolvents.append(resolvent)
+                if len(resolvents) > limit:
+                    break
+            if len(resolvents) > limit:
+                continue
+
+            # The resolvents go in before the clauses they come from are removed, so the proof can derive them
+            removed = [list(clause) for clause in positive + negative]
+            indices = list(occurrences[var]) + list(occurrences[-var])
+            for resolvent in resolvents:
+                self.add(resolvent)
+            for index in indices:
+                self.remove(index)
+            self.eliminated.append((var, removed))
+            self.eliminated_vars.add(var)
+            self.propagate_units()
+
+    def probe(self, budget: float) -> None:
+        """
+        Failed-literal probing with the watched-literal propagator on the current clauses. Variables are probed most
+        frequent first, and every literal fixed at level 0 along the way is carried back into the working set.
+        """
+        deadline = time() + budget
+        propagator = Propagator([], self.to_formula())
+        if not propagator.ok or propagator.propagate() is not None:
+            self.ok = False
+            return
+
+        occurrences = self.occurrences
+        order = sorted(range(1, self.formula.num_vars() + 1),
+                       key=lambda var: -(len(occurrences[var]) + len(occurrences[-var])))
+        for var in order:
+            if time() >= deadline:
+                break
+            if propagator.value(var) is not None or var in self.eliminated_vars:
+                continue
+
+            failed = []
+            for lit in (var, -var):
+                propagator.decide(lit)
+                if propagator.propagate() is not None:
+                    failed.append(lit)
+                propagator.backtrack(0)
+
+            if failed and self.proof is not None:
+                self.proof.add([-failed[0]])
+            if len(failed) == 2:
+                self.ok = False
+                return
+            if failed:
+                propagator.enqueue(-failed[0])
+                if propagator.propagate() is not None:
+                    self.ok = False
+                    return
+
+        for lit in propagator.trail:
+            self.assign(lit)
+        self.propagate_units()
+
+    def to_formula(self) -> Formula:
+        """
+        Returns the simplified formula: the remaining clauses plus one unit clause for every fixed variable, and the
+        cardinality constraints.
+        """
+        result = self.formula.derive()
+        for var, value in self.values.items():
+            result.add_clause([var if value else -var])
+        for clause in self.clauses:
+            if clause is not None:
+                result.add_clause(clause)
+        result.copy_constraints(self.formula)
+        return result
+
+    def extend_model(self, assignment: Dict) -> Dict:
+        """
+        Gives every eliminated variable a value that satisfies the clauses removed with it, working back from the last
+        elimination. `assignment` must already assign every other variable, and is updated in place.
+        """
+        names = self.formula.names
+        for var, removed in reversed(self.eliminated):
+            value = False
+            for clause in removed:
+                if var in clause and not any(assignment[names[abs(lit)]] == (lit > 0) for lit in clause if lit != var):
+                    value = True
+                    break
+            assignment[names[var]] = value
+
+        return assignment
+
+
+def resolve(first: List[int], second: List[int], var: int) -> Optional[List[int]]:
+    """
+    Returns the resolvent of `first` (containing var) and `second` (containing -var), or None if it is a tautology.
+    """
+    resolvent = [lit for lit in first if lit != var]
+    for lit in second:
+        if lit == -var or lit in resolvent:
+            continue
+        if -lit in resolvent:
+            return None
+        resolvent.append(lit)
+    return resolvent
+
+
+if __name__ == "__main__":
+    assert(resolve([1, 2], [-1, 3], 1) == [2, 3])
+    assert(resolve([1, 2], [-1, -2], 1) is None)
+
+
+def parse_budgets(spec: str) -> Dict[str, float]:
+    """
+    Parses a comma-separated list of techniques, each optionally followed by "=SECONDS", e.g. "probing,elimination=2".
+    An empty string turns preprocessing off.
+    """
+    budgets = {}
+    for item in spec.split(","):
+        if not item:
+            continue
+        name, _, seconds = item.partition("=")
+        if name not in TECHNIQUES:
+            raise ValueError(f"Unknown preprocessing technique {name}")
+        budgets[name] = float(seconds) if seconds else DEFAULT_BUDGETS[name]
+    return budgets
+
+
+if __name__ == "__main__":
+    assert(parse_budgets("probing,elimination=2") == {"probing": 1.0, "elimination": 2.0})
+    assert(parse_budgets("") == {})
+
+    # (x or y) subsumes (x or y or z), and (x or !y) strengthens (x or y) to (x)
+    subsumed = Preprocessor(Formula.from_clauses([
+        Clause("foo", [Literal(1, True), Literal(2, True)]),
+        Clause("bar", [Literal(1, True), Literal(2, True), Literal(3, True)]),
+        Clause("baz", [Literal(1, True), Literal(2, False)])
+    ]))
+    subsumed.subsume(1.0)
+    assert(subsumed.values == {1: True} and subsumed.clauses == [None, None, None])
+
+    # Each technique stops at its own budget: without time for strengthening, (x or y) only subsumes (x or y or z)
+    clauses = [[1, 2], [1, 2, 3], [1, -2]]
+    subsumed_only = Preprocessor(Formula.from_clauses([
+        Clause(index, [Literal(abs(lit), lit > 0) for lit in lits]) for index, lits in enumerate(clauses)]))
+    subsumed_only.run({"subsumption": 1.0, "strengthening": 0.0})
+    assert(subsumed_only.values == {} and subsumed_only.clauses == [[1, 2], None, [1, -2]])
+    strengthened_only = Preprocessor(Formula.from_clauses([
+        Clause(index, [Literal(abs(lit), lit > 0) for lit in lits]) for index, lits in enumerate(clauses)]))
+    strengthened_only.subsume(None, 1.0)
+    assert(strengthened_only.values == {1: True})
+
+    # Eliminating variables from a satisfiable formula and extending any model of what is left satisfies the original
+    original = Formula.from_clauses([
+        Clause("foo", [Literal(1, True), Literal(2, True)]),
+        Clause("bar", [Literal(2, False), Literal(3, True)]),
+        Clause("baz", [Literal(1, False), Literal(3, False), Literal(4, True)]),
+        Clause("buzz", [Literal(1, False), Literal(3, False), Literal(4, False)])
+    ])
+    eliminated = Preprocessor(original)
+    eliminated.eliminate(1.0)
+    assert(len(eliminated.eliminated) > 0)
+    remaining = eliminated.to_formula()
+    for bits in range(16):
+        model = {var: bool(bits >> (var - 1) & 1) for var in range(1, 5)}
+        if all(clause.eval(model) for clause in remaining):
+            assert(all(clause.eval(eliminated.extend_model(model)) for clause in original))
+
+    # Probing x in (!x or y) and (!x or !y) fails, so !x is a unit
+    probed = Preprocessor(Formula.from_clauses([
+        Clause("foo", [Literal(1, False), Literal(2, True)]),
+        Clause("bar", [Literal(1, False), Literal(2, False)]),
+        Clause("baz", [Literal(1, True), Literal(2, True), Literal(3, True)])
+    ]))
+    probed.probe(1.0)
+    assert(probed.values[1] is False)
+
+    # With at most one of x, y and z, (!z or x) and (!z or y) make z fail, and none of them is ever eliminated
+    constrained = Formula()
+    for var in range(1, 4):
+        constrained.add_variable(var)
+    constrained.add_clause([-3, 1])
+    constrained.add_clause([-3, 2])
+    constrained.add_at_most([1, 2, 3], 1)
+    frozen = Preprocessor(constrained)
+    frozen.probe(1.0)
+    frozen.eliminate(1.0)
+    assert(frozen.values[3] is False and frozen.eliminated_vars.isdisjoint({1, 2}))
+    assert(frozen.to_formula().num_constraints() == 1)
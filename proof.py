@@ -0,0 +1,393 @@
+import argparse
+import sys
+from classes import Literal, Clause, Formula
+from propagation import Propagator
+from sat_io import read_input, comment
+from typing import BinaryIO, Dict, Iterator, List, Optional, Set, Tuple
+
+# DRAT proofs of unsatisfiability. While it searches, the solver writes every clause it derives (and every clause that
+# preprocessing throws away) to a proof, ending with the empty clause once the formula is refuted. Both the usual text
+# format and the compact binary one are written, each through a buffer so logging stays cheap:
+#
+#     text:    "-1 2 0\n", or "d -1 2 0\n" for a deletion
+#     binary:  b"a" (or b"d") and then every literal as a variable-length unsigned 2v or 2v+1, followed by b"\x00"
+#
+# The checker works backwards from the empty clause, on the watched-literal propagator the solver itself uses: it only
+# checks the lemmas that some already verified step depends on, so most of what a search learns is never looked at.
+
+# Bytes written per call to the underlying file
+BUFFER_SIZE = 1 << 16
+
+# Bytes that can appear in a text proof; anything else means it is binary
+TEXT_BYTES = frozenset(b"0123456789-d \t\r\n")
+
+
+class Proof:
+    """
+    Writes a DRAT proof to the file at `path`, in the binary format if `binary` is set. Writes are collected in memory
+    and go out `buffer_size` bytes at a time; `close` flushes the rest.
+    """
+    def __init__(self, path: str, binary: bool = False, buffer_size: int = BUFFER_SIZE):
+        self.file: BinaryIO = open(path, "wb")
+        self.binary = binary
+        self.buffer_size = buffer_size
+        self.buffer = bytearray()
+        self.added = 0
+        self.deleted = 0
+
+    def add(self, lits) -> None:
+        """
+        Records the derived clause `lits`. RAT clauses must have their pivot first.
+        """
+        self.added += 1
+        self.write(b"a", b"", lits)
+
+    def delete(self, lits) -> None:
+        """
+        Records that the clause `lits` is no longer needed.
+        """
+        self.deleted += 1
+        self.write(b"d", b"d ", lits)
+
+    def write(self, binary_tag: bytes, text_tag: bytes, lits) -> None:
+        buffer = self.buffer
+        if self.binary:
+            buffer += binary_tag
+            for lit in lits:
+                code = 2 * lit if lit > 0 else 1 - 2 * lit
+                while code > 127:
+                    buffer.append(code & 127 | 128)
+                    code >>= 7
+                buffer.append(code)
+            buffer.append(0)
+        else:
+            buffer += text_tag
+            buffer += " ".join(map(str, lits)).encode()
+            buffer += b" 0\n" if lits else b"0\n"
+
+        if len(buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        self.file.write(self.buffer)
+        self.buffer.clear()
+
+    def close(self) -> None:
+        self.flush()
+        self.file.close()
+
+    def __enter__(self) -> "Proof":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def read_proof(path: str) -> Iterator[Tuple[bool, List[int]]]:
+    """
+    Yields every step of the DRAT proof at `path` as whether it is a deletion and its literals. The format (text or
+    binary) is told apart by the bytes at the start of the file.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if any(byte not in TEXT_BYTES for byte in data[:64]):
+        position = 0
+        while position < len(data):
+            deleted = data[position] == ord("d")
+            position += 1
+            lits = []
+            code = shift = 0
+            while True:
+                byte = data[position]
+                position += 1
+                code |= (byte & 127) << shift
+                shift += 7
+                if byte & 128:
+                    continue
+                if code == 0:
+                    break
+                lits.append(code >> 1 if code & 1 == 0 else -(code >> 1))
+                code = shift = 0
+            yield deleted, lits
+        return
+
+    deleted = False
+    lits = []
+    for token in data.split():
+        if token == b"d":
+            deleted = True
+        elif token == b"0":
+            yield deleted, lits
+            deleted = False
+            lits = []
+        else:
+            lits.append(int(token))
+
+
+class ProofChecker:
+    """
+    Checks DRAT proofs of unsatisfiability for `formula`. Every clause lives in the store of a `Propagator`; deleting a
+    clause takes it out of the watch lists, and checking a lemma is unit propagation on one decision level holding the
+    negated lemma and every unit clause, which is undone again afterwards. Like other DRAT checkers, deletions of unit
+    clauses and of clauses that are not there are ignored. Cardinality constraints of `formula` are checked against
+    through their direct encoding, which holds every clause the solver explains their propagations with.
+    """
+    def __init__(self, formula: Formula):
+        # A numbering of its own, so variables that only the proof introduces don't leak into `formula`
+        self.propagator = Propagator([], Formula(list(formula.names), dict(formula.indices)))
+        self.store = self.propagator.store
+        self.units: Set[int] = set()
+        self.active: List[bool] = []
+        self.core: List[bool] = []
+        self.keys: Dict[Tuple[int, ...], List[int]] = {}
+        self.pivots: Dict[int, int] = {}
+        self.refuted = False  # the formula itself contains the empty clause
+
+        self.lemmas = 0
+        self.checked = 0
+        self.ignored = 0
+
+        for index in range(len(formula)):
+            self.insert(formula.clause(index))
+        for index in range(formula.num_constraints()):
+            for clause in formula.constraint_clauses(index):
+                self.insert(clause)
+
+    def insert(self, lits) -> Optional[int]:
+        """
+        Stores and watches the clause `lits` without duplicate literals. Returns its index, or None for a tautology.
+        """
+        clause = list(dict.fromkeys(lits))
+        if any(-lit in clause for lit in clause):
+            return None
+        if not clause:
+            self.refuted = True
+        largest = max(map(abs, clause), default=0)
+        while self.propagator.num_vars() < largest:
+            self.propagator.add_variable(("extension", self.propagator.num_vars() + 1))
+
+        index = self.store.add_clause(clause)
+        self.active.append(False)
+        self.core.append(False)
+        self.keys.setdefault(tuple(sorted(clause)), []).append(index)
+        self.link(index)
+        return index
+
+    def link(self, index: int) -> None:
+        store = self.store
+        start, end = store.offsets[index], store.offsets[index + 1]
+        if end - start == 1:
+            self.units.add(index)
+        elif end - start == 2:
+            first, second = store.lits[start], store.lits[start + 1]
+            self.propagator.binaries[first].append((second, index))
+            self.propagator.binaries[second].append((first, index))
+        elif end - start > 2:
+            self.propagator.watches[store.lits[start]].append(index)
+            self.propagator.watches[store.lits[start + 1]].append(index)
+        self.active[index] = True
+
+    def unlink(self, index: int) -> None:
+        store = self.store
+        start, end = store.offsets[index], store.offsets[index + 1]
+        if end - start == 1:
+            self.units.discard(index)
+        elif end - start == 2:
+            first, second = store.lits[start], store.lits[start + 1]
+            self.propagator.binaries[first].remove((second, index))
+            self.propagator.binaries[second].remove((first, index))
+        elif end - start > 2:
+            self.propagator.watches[store.lits[start]].remove(index)
+            self.propagator.watches[store.lits[start + 1]].remove(index)
+        self.active[index] = False
+
+    def check(self, steps: Iterator[Tuple[bool, List[int]]]) -> bool:
+        """
+        Returns whether the proof made of `steps` (as yielded by `read_proof`) refutes the formula. The proof ends at
+        its first empty clause, or at its last step if the clauses are refuted by unit propagation by then.
+        """
+        if self.refuted:
+            return True
+
+        # Replay the proof forwards, keeping the indices of the clauses it adds and deletes
+        replayed: List[Tuple[int, bool]] = []
+        for deleted, lits in steps:
+            if deleted:
+                candidates = self.keys.get(tuple(sorted(set(lits))))
+                if len(set(lits)) <= 1 or not candidates:
+                    self.ignored += 1
+                    continue
+                index = candidates.pop()
+                self.unlink(index)
+                replayed.append((index, True))
+                continue
+
+            if not lits:
+                break
+            self.lemmas += 1
+            index = self.insert(lits)
+            if index is not None:
+                self.pivots[index] = lits[0]
+                replayed.append((index, False))
+
+        if not self.refute([]):
+            return False
+
+        # Then undo it backwards, checking each lemma that a later check used against the clauses before it
+        for index, deleted in reversed(replayed):
+            if deleted:
+                self.link(index)
+                continue
+            self.unlink(index)
+            if self.core[index]:
+                self.checked += 1
+                if not self.verify(index):
+                    return False
+
+        return True
+
+    def verify(self, index: int) -> bool:
+        """
+        Returns whether the lemma at `index` is a reverse unit propagation (RUP) or resolution asymmetric tautology
+        (RAT) on its pivot with respect to the active clauses.
+        """
+        lits = list(self.store.clause(index))
+        negated = [-lit for lit in lits]
+        if self.refute(negated):
+            return True
+
+        pivot = self.pivots[index]
+        for other in range(len(self.store)):
+            if not self.active[other]:
+                continue
+            clause = self.store.clause(other)
+            if -pivot not in clause:
+                continue
+            if not self.refute(negated + [-lit for lit in clause if lit != -pivot]):
+                return False
+            self.core[other] = True
+
+        return True
+
+    def refute(self, assumed: List[int]) -> bool:
+        """
+        Returns whether assuming every literal of `assumed` leads to a conflict by unit propagation, and if so marks
+        every clause the conflict depends on as core.
+        """
+        propagator = self.propagator
+        store = self.store
+        propagator.new_decision_level()
+        try:
+            for lit in assumed:
+                value = propagator.value(lit)
+                if value is False:
+                    return True
+                if value is None:
+                    propagator.enqueue(lit)
+
+            conflict = None
+            for index in self.units:
+                unit = store.lits[store.offsets[index]]
+                value = propagator.value(unit)
+                if value is False:
+                    conflict = index
+                    break
+                if value is None:
+                    propagator.enqueue(unit, index)
+            if conflict is None:
+                conflict = propagator.propagate()
+            if conflict is None:
+                return False
+
+            self.core[conflict] = True
+            seen = {abs(lit) for lit in store.clause(conflict)}
+            for lit in reversed(propagator.trail):
+                if abs(lit) not in seen:
+                    continue
+                reason = propagator.reasons[abs(lit)]
+                if reason is not None:
+                    self.core[reason] = True
+                    seen.update(abs(other) for other in store.clause(reason))
+            return True
+        finally:
+            propagator.backtrack(0)
+
+
+def check_proof(formula: Formula, path: str) -> bool:
+    """
+    Returns whether the DRAT proof at `path` (text or binary) refutes `formula`.
+    """
+    return ProofChecker(formula).check(read_proof(path))
+
+
+if __name__ == "__main__" and len(sys.argv) == 1:
+    import os
+    import tempfile
+
+    # (x or y) and (x or !y) and (!x or z) and (!x or !z): learning (x) and then the empty clause refutes it
+    unsat = Formula.from_clauses([
+        Clause("foo", [Literal(1, True), Literal(2, True)]),
+        Clause("bar", [Literal(1, True), Literal(2, False)]),
+        Clause("baz", [Literal(1, False), Literal(3, True)]),
+        Clause("buzz", [Literal(1, False), Literal(3, False)])
+    ])
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "proof")
+        for binary in (False, True):
+            with Proof(path, binary, buffer_size=4) as proof:
+                proof.add([1, 300])
+                proof.delete([1, 300])
+                proof.add([1])
+                proof.add([])
+            assert(list(read_proof(path)) == [(False, [1, 300]), (True, [1, 300]), (False, [1]), (False, [])])
+            assert(check_proof(unsat, path))
+
+        # (z) follows as well, but the empty clause only needs (!x), so (z) is never checked
+        with Proof(path) as proof:
+            proof.add([-1])
+            proof.add([3])
+            proof.add([])
+        checker = ProofChecker(unsat)
+        assert(checker.check(read_proof(path)) and checker.lemmas == 2 and checker.checked == 1)
+
+        # Deleting (x or y) and (x or !y) first leaves nothing to refute the formula with
+        with Proof(path) as proof:
+            proof.delete([1, 2])
+            proof.delete([2, 1])
+            proof.delete([1, -2])
+            proof.add([-1])
+            proof.add([])
+        checker = ProofChecker(unsat)
+        assert(not checker.check(read_proof(path)) and checker.ignored == 1)
+
+        # (x or y) and (!x or y) is SAT, and (!y) is neither implied by it nor a RAT on !y
+        sat = Formula.from_clauses([
+            Clause("foo", [Literal(1, True), Literal(2, True)]),
+            Clause("bar", [Literal(1, False), Literal(2, True)])
+        ])
+        with Proof(path) as proof:
+            proof.add([-2])
+            proof.add([])
+        assert(not check_proof(sat, path))
+
+    # (w) is a RAT on w when nothing contains !w, even though it is not implied
+    checker = ProofChecker(unsat)
+    extension = checker.insert([4])
+    checker.pivots[extension] = 4
+    checker.unlink(extension)
+    assert(checker.verify(extension) and len(unsat.names) == 4)
+
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+    parser = argparse.ArgumentParser(description="Checks a DRAT proof that a DIMACS CNF file is UNSAT")
+    parser.add_argument("path")
+    parser.add_argument("proof")
+    args = parser.parse_args()
+
+    variables, formula = read_input(args.path)
+    checker = ProofChecker(formula)
+    verified = checker.check(read_proof(args.proof))
+    comment(f"checked {checker.checked} of {checker.lemmas} lemmas, ignored {checker.ignored} deletions")
+    print("s VERIFIED" if verified else "s NOT VERIFIED")
+    sys.exit(0 if verified else 1)
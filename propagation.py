@@ -0,0 +1,456 @@
+from classes import Literal, Clause, Formula
+from typing import Iterable, List, Mapping, Dict, Optional, Tuple
+
+# A shared clause store with two watched literals per clause. Assignments are recorded on a trail and undone on
+# backtrack, so the formula is never copied or rewritten during search.
+#
+# The store is a `Formula` that shares the variable numbering of the input, so literals are the same signed integers
+# (+v / -v) the input uses. The first two literals of every stored clause are its watched literals. Binary clauses
+# skip the watch lists altogether: they are kept as direct implications, which are propagated first.
+#
+# Cardinality constraints ("at most k of these literals") are propagated with a counter instead of being expanded into
+# clauses: every constraint counts its True literals as they are assigned, and once the count reaches the bound, its
+# other literals are set False. Conflict analysis only knows clauses, so the reason for each of those assignments (and
+# a conflict on the constraint) is the one clause of the constraint's direct encoding that explains it. Those clauses
+# are added to the store unwatched the first time they are needed, and shared from then on.
+
+
+class Propagator:
+    def __init__(self, variables: List[str], formula: Formula):
+        self.store = formula.derive()
+        self.names: List = self.store.names
+        self.indices: Dict = self.store.indices
+        self.values: List[Optional[bool]] = [None]
+        self.levels: List[int] = [-1]
+        self.reasons: List[Optional[int]] = [None]
+
+        self.watches: Dict[int, List[int]] = {}
+        self.binaries: Dict[int, List[Tuple[int, int]]] = {}  # literal -> (other literal, clause index)
+
+        self.trail: List[int] = []
+        self.trail_lim: List[int] = []
+        self.qhead = 0
+        self.ok = True
+
+        # The assumptions responsible when the last search under assumptions failed (see `cdcl.analyze_final`)
+        self.failed: List[int] = []
+
+        # Running totals over the lifetime of the propagator (see `stats`); restarts are counted by the search
+        self.decisions = 0
+        self.propagations = 0
+        self.conflicts = 0
+        self.backtracks = 0
+        self.restarts = 0
+        self.learned = 0
+
+        # Told about every variable that backtracking unassigns, so its decision order can take it back
+        self.heuristic = None
+
+        # Phase saving: the last value of every variable is remembered when backtracking unassigns it, and decisions
+        # reuse it so restarts and backjumps don't throw away the progress made on a subtree
+        self.phases: List[bool] = [True]
+        self.phase_saving = True
+        self.default_phase = True
+
+        # Cardinality constraints, the number of True literals of each, and the constraints of every literal
+        self.constraints: List[List[int]] = []
+        self.bounds: List[int] = []
+        self.true_counts: List[int] = []
+        self.constraint_occurrences: Dict[int, List[int]] = {}
+        self.explanations: Dict[Tuple[int, ...], int] = {}  # sorted explanation clause -> its index in the store
+
+        for variable in variables:
+            self.add_variable(variable)
+        self.sync_variables()
+        for index in range(len(formula)):
+            self.add_clause(formula.clause(index))
+        for index in range(formula.num_constraints()):
+            self.add_at_most(formula.constraint(index), formula.bounds[index])
+
+    def add_variable(self, name) -> int:
+        """
+        Registers the variable `name` and returns its index. Registering a known variable is a no-op.
+        """
+        index = self.store.add_variable(name)
+        self.sync_variables()
+        return index
+
+    def sync_variables(self) -> None:
+        """
+        Grows the per-variable state to cover every variable of the shared numbering.
+        """
+        for index in range(len(self.values), len(self.names)):
+            self.values.append(None)
+            self.levels.append(-1)
+            self.reasons.append(None)
+            self.phases.append(self.default_phase)
+            self.watches[index] = []
+            self.watches[-index] = []
+            self.binaries[index] = []
+            self.binaries[-index] = []
+
+    def num_vars(self) -> int:
+        return len(self.names) - 1
+
+    def to_int(self, literal: Literal) -> int:
+        index = self.add_variable(literal.name)
+        return index if literal.sign else -index
+
+    def to_literal(self, lit: int) -> Literal:
+        return Literal(self.names[abs(lit)], lit > 0)
+
+    def value(self, lit: int) -> Optional[bool]:
+        """
+        Returns the truth value of the integer literal `lit` under the current assignment, or None if it is unassigned.
+        """
+        value = self.values[abs(lit)]
+        if value is None:
+            return None
+        return value == (lit > 0)
+
+    def add_clause(self, lits: Iterable[int]) -> bool:
+        """
+        Adds a clause at decision level 0. Duplicate and falsified literals are dropped, satisfied clauses and
+        tautologies are ignored and unit clauses are enqueued directly. Returns False if the formula is now known to be
+        UNSAT.
+        """
+        if not self.ok:
+            return False
+
+        seen = set()
+        clause = []
+        for lit in lits:
+            value = self.value(lit)
+            if value is True or -lit in seen:
+                return True
+            if value is False:
+                continue
+            if lit not in seen:
+                seen.add(lit)
+                clause.append(lit)
+
+        if len(clause) == 0:
+            self.ok = False
+        elif len(clause) == 1:
+            current = self.value(clause[0])
+            if current is False:
+                self.ok = False
+            elif current is None:
+                self.enqueue(clause[0])
+        else:
+            self.attach(clause)
+
+        return self.ok
+
+    def add_at_most(self, lits: Iterable[int], bound: int) -> bool:
+        """
+        Adds the constraint that at most `bound` of `lits` (without duplicates or complementary literals) are True, at
+        decision level 0. Assigned literals are dropped, lowering the bound for the True ones, and constraints that
+        amount to a clause or to units are added as such. Returns False if the formula is now known to be UNSAT.
+        """
+        if not self.ok:
+            return False
+
+        free = []
+        for lit in lits:
+            value = self.value(lit)
+            if value is None:
+                free.append(lit)
+            elif value:
+                bound -= 1
+
+        if bound < 0:
+            self.ok = False
+        elif bound == 0:
+            for lit in free:
+                self.enqueue(-lit)
+        elif bound == len(free) - 1:
+            self.add_clause([-lit for lit in free])
+        elif bound < len(free):
+            index = len(self.constraints)
+            self.constraints.append(free)
+            self.bounds.append(bound)
+            self.true_counts.append(0)
+            for lit in free:
+                self.constraint_occurrences.setdefault(lit, []).append(index)
+
+        return self.ok
+
+    def explain(self, lits: List[int]) -> int:
+        """
+        Returns the index of the clause `lits` implied by a cardinality constraint, storing it on first use.
+        """
+        key = tuple(sorted(lits))
+        index = self.explanations.get(key)
+        if index is None:
+            index = self.store.add_clause(lits)
+            self.explanations[key] = index
+        return index
+
+    def propagate_constraints(self, lit: int) -> Optional[int]:
+        """
+        Sets the other literals of every constraint of the True literal `lit` that has reached its bound False. Returns
+        the index of the explaining clause if one has gone past its bound, and None otherwise.
+        """
+        values = self.values
+        for index in self.constraint_occurrences.get(lit, ()):
+            bound = self.bounds[index]
+            if self.true_counts[index] < bound:
+                continue
+
+            lits = self.constraints[index]
+            # The negations of the True literals, `lit` first so a conflict clause has a literal of the current level
+            negated = [-lit] + [-other for other in lits if other != lit and values[abs(other)] == (other > 0)]
+            if len(negated) > bound:
+                return self.explain(negated[:bound + 1])
+            for other in lits:
+                if values[abs(other)] is None:
+                    self.enqueue(-other, self.explain([-other] + negated))
+
+        return None
+
+    def attach(self, lits: List[int]) -> int:
+        """
+        Stores the clause `lits` (of at least two literals) and starts watching it. Returns its index in the store.
+        """
+        index = self.store.add_clause(lits)
+        if len(lits) == 2:
+            self.binaries[lits[0]].append((lits[1], index))
+            self.binaries[lits[1]].append((lits[0], index))
+        else:
+            self.watches[lits[0]].append(index)
+            self.watches[lits[1]].append(index)
+        return index
+
+    def learn(self, lits: List[int]) -> None:
+        """
+        Adds a clause derived during search. `lits[0]` must be the only unassigned literal and `lits[1]` (if any) the
+        literal assigned at the highest remaining level; the clause is stored with those two watched and `lits[0]` is
+        enqueued with the new clause as its reason.
+        """
+        self.learned += 1
+        if len(lits) == 1:
+            self.enqueue(lits[0])
+            return
+
+        self.enqueue(lits[0], self.attach(lits))
+
+    def decision_level(self) -> int:
+        return len(self.trail_lim)
+
+    def enqueue(self, lit: int, reason: Optional[int] = None) -> None:
+        """
+        Assigns `lit` True at the current decision level and pushes it onto the trail to be propagated. `reason` is the
+        index of the clause that implied `lit`, or None for decisions and top-level facts.
+        """
+        var = abs(lit)
+        self.values[var] = lit > 0
+        self.levels[var] = self.decision_level()
+        self.reasons[var] = reason
+        self.trail.append(lit)
+        if self.constraint_occurrences:
+            for index in self.constraint_occurrences.get(lit, ()):
+                self.true_counts[index] += 1
+
+    def new_decision_level(self) -> None:
+        self.trail_lim.append(len(self.trail))
+
+    def decide(self, lit: int) -> None:
+        """
+        Opens a new decision level and assigns `lit` True on it.
+        """
+        self.decisions += 1
+        self.new_decision_level()
+        self.enqueue(lit)
+
+    def propagate(self) -> Optional[int]:
+        """
+        Runs unit propagation over every unpropagated literal on the trail. Returns the index of a falsified clause if
+        a conflict is found, and None otherwise.
+        """
+        values = self.values
+        lits = self.store.lits
+        offsets = self.store.offsets
+        while self.qhead < len(self.trail):
+            false_lit = -self.trail[self.qhead]
+            self.qhead += 1
+            self.propagations += 1
+
+            for other, index in self.binaries[false_lit]:
+                other_value = values[abs(other)]
+                if other_value is None:
+                    self.enqueue(other, index)
+                elif other_value != (other > 0):
+                    self.qhead = len(self.trail)
+                    self.conflicts += 1
+                    return index
+
+            if self.constraint_occurrences:
+                conflict = self.propagate_constraints(-false_lit)
+                if conflict is not None:
+                    self.qhead = len(self.trail)
+                    self.conflicts += 1
+                    return conflict
+
+            watchers = self.watches[false_lit]
+            kept = []
+            for position, index in enumerate(watchers):
+                start = offsets[index]
+                if lits[start] == false_lit:
+                    lits[start] = lits[start + 1]
+                    lits[start + 1] = false_lit
+
+                # The clause is already satisfied by its other watch
+                first = lits[start]
+                first_value = values[abs(first)]
+                if first_value is not None and first_value == (first > 0):
+                    kept.append(index)
+                    continue
+
+                # Look for a replacement watch that is not False
+                for k in range(start + 2, offsets[index + 1]):
+                    other = lits[k]
+                    other_value = values[abs(other)]
+                    if other_value is None or other_value == (other > 0):
+                        lits[start + 1] = other
+                        lits[k] = false_lit
+                        self.watches[other].append(index)
+                        break
+                else:
+                    kept.append(index)
+                    if first_value is None:
+                        self.enqueue(first, index)
+                    else:
+                        kept.extend(watchers[position + 1:])
+                        self.watches[false_lit] = kept
+                        self.qhead = len(self.trail)
+                        self.conflicts += 1
+                        return index
+
+            self.watches[false_lit] = kept
+
+        return None
+
+    def backtrack(self, level: int) -> None:
+        """
+        Undoes every assignment made above decision level `level`.
+        """
+        if self.decision_level() <= level:
+            return
+
+        self.backtracks += 1
+        start = self.trail_lim[level]
+        if self.constraint_occurrences:
+            for lit in self.trail[start:]:
+                for index in self.constraint_occurrences.get(lit, ()):
+                    self.true_counts[index] -= 1
+        for lit in self.trail[start:]:
+            var = abs(lit)
+            if self.phase_saving:
+                self.phases[var] = lit > 0
+            self.values[var] = None
+            self.levels[var] = -1
+            self.reasons[var] = None
+            if self.heuristic is not None:
+                self.heuristic.unassigned(var)
+
+        del self.trail[start:]
+        del self.trail_lim[level:]
+        self.qhead = len(self.trail)
+
+    def set_default_phase(self, phase: bool) -> None:
+        """
+        Makes `phase` the polarity tried first for every variable that has no saved phase yet.
+        """
+        self.default_phase = phase
+        for var in range(1, len(self.phases)):
+            self.phases[var] = phase
+
+    def phase_literal(self, var: int) -> int:
+        """
+        Returns the literal of `var` with its saved (or default) phase.
+        """
+        return var if self.phases[var] else -var
+
+    def pick_unassigned(self) -> Optional[int]:
+        """
+        Returns the lowest-numbered unassigned variable, or None if every variable is assigned.
+        """
+        for var in range(1, len(self.values)):
+            if self.values[var] is None:
+                return var
+
+        return None
+
+    def assignment(self) -> Mapping:
+        """
+        Returns the current (possibly partial) assignment keyed by the original variable names.
+        """
+        return {self.names[abs(lit)]: lit > 0 for lit in self.trail}
+
+
+if __name__ == "__main__":
+    # (x) and (!x or y) and (!y or z) propagates everything from the unit clause
+    chain = Propagator([1, 2, 3], Formula.from_clauses([
+        Clause("foo", [Literal(1, True)]),
+        Clause("bar", [Literal(1, False), Literal(2, True)]),
+        Clause("baz", [Literal(2, False), Literal(3, True)])
+    ]))
+    assert(chain.propagate() is None)
+    assert(chain.assignment() == {1: True, 2: True, 3: True})
+
+    # (x or y) and (x or !y): deciding !x conflicts, and backtracking restores the shared store
+    forced = Propagator([1, 2], Formula.from_clauses([
+        Clause("foo", [Literal(1, True), Literal(2, True)]),
+        Clause("bar", [Literal(1, True), Literal(2, False)])
+    ]))
+    assert(forced.propagate() is None)
+    forced.decide(-1)
+    assert(forced.propagate() is not None)
+    forced.backtrack(0)
+    assert(forced.assignment() == {})
+    forced.decide(1)
+    assert(forced.propagate() is None)
+    assert(forced.assignment() == {1: True})
+
+    # (x) and (!x) is UNSAT at load time
+    assert(not Propagator([1], Formula.from_clauses([
+        Clause("foo", [Literal(1, True)]),
+        Clause("bar", [Literal(1, False)])
+    ])).ok)
+
+    # Tautologies never constrain anything
+    tautology = Propagator([1], Formula.from_clauses([Clause("foo", [Literal(1, True), Literal(1, False)])]))
+    assert(len(tautology.store) == 0 and tautology.ok)
+
+    # Clauses added after (x) is fixed are simplified against it
+    simplified = Propagator([1, 2, 3], Formula.from_clauses([Clause("foo", [Literal(1, True)])]))
+    assert(simplified.propagate() is None)
+    assert(simplified.add_clause([1, 2]) and len(simplified.store) == 0)
+    assert(simplified.add_clause([-1, 2]) and simplified.trail == [1, 2])
+
+    # At most two of x, y, z and w: once x and y are True, z and w are False, each explained by the clause of the direct
+    # encoding that forbids it
+    counted = Formula()
+    for var in range(1, 5):
+        counted.add_variable(var)
+    counted.add_at_most([1, 2, 3, 4], 2)
+    cardinality = Propagator([], counted)
+    cardinality.decide(1)
+    assert(cardinality.propagate() is None and cardinality.trail == [1])
+    cardinality.decide(2)
+    assert(cardinality.propagate() is None and cardinality.trail == [1, 2, -3, -4])
+    assert(sorted(cardinality.store.clause(cardinality.reasons[3])) == [-3, -2, -1])
+
+    # A third True literal goes past the bound, and backtracking takes the counts back
+    cardinality.backtrack(0)
+    cardinality.decide(1)
+    cardinality.enqueue(2)
+    cardinality.enqueue(3)
+    conflict = cardinality.propagate()
+    assert(conflict is not None and sorted(cardinality.store.clause(conflict)) == [-3, -2, -1])
+    cardinality.backtrack(0)
+    assert(cardinality.true_counts == [0] and len(cardinality.store) == 2)
+
+    # A constraint with True literals at level 0 has its bound lowered
+    assert(cardinality.add_clause([1]) and cardinality.add_at_most([1, 2, 3], 1) and cardinality.value(2) is False)
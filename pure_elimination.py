@@ -1,91 +1,193 @@
-from classes import Literal, Clause
+from classes import Literal, Clause, Formula
+from collections import Counter
 from typing import List, Mapping
-from copy import deepcopy
-from util import get_variables, purge_clauses_with_literal
+from propagation import Propagator
 
 
-def get_variable_purity(target: int, formula: List[Clause]) -> bool:
+def get_variable_purity(target: int, formula: Formula) -> bool:
     """
     If variable has only one polarity throughout formula, returns the polarity of `literal`. Otherwise, returns None.
     """
-    polarity = None
+    index = formula.indices.get(target)
+    if index is None:
+        return None
 
-    for clause in formula:
-        for literal in clause.literals:
-            if target == literal.name:
-                if polarity is None:
-                    polarity = literal.sign
-                else:
-                    if not polarity == literal.sign:
-                        return None
+    has_positive = index in formula.lits
+    has_negative = -index in formula.lits
+    if has_positive == has_negative:
+        return None
 
-    return polarity
+    return has_positive
 
 
 if __name__ == "__main__":
     # (!x)
-    assert(get_variable_purity(1, [Clause("foo", [Literal(1, False)])]) is False)
+    assert(get_variable_purity(1, Formula.from_clauses([Clause("foo", [Literal(1, False)])])) is False)
 
     # (x or !z) AND (!z or x)
-    everything_pure = [
+    everything_pure = Formula.from_clauses([
         Clause("foo", [Literal(1, True), Literal(3, False)]),
         Clause("bar", [Literal(3, False), Literal(1, True)])
-    ]
+    ])
     assert(get_variable_purity(1, everything_pure))
     assert(get_variable_purity(3, everything_pure) is False)
 
     # (x or y) AND (!x or !y). Ensure global purity, not clausal purity.
-    global_purity_check = [
+    global_purity_check = Formula.from_clauses([
         Clause("foo", [Literal(1, True), Literal(2, True)]),
         Clause("bar", [Literal(1, False), Literal(2, False)])
-    ]
+    ])
     assert(get_variable_purity(1, global_purity_check) is None)
     assert (get_variable_purity(2, global_purity_check) is None)
 
 
-def do_pure_literal_elimination(formula: List[Clause]) -> (List[Clause], Mapping[int, bool]):
-    known_mapping: Mapping[int, bool] = {}
-    new_formula = deepcopy(formula)
-
-    variables = get_variables(formula)
-    for variable in variables:
-        # Check variable purity on original formula because variables might get removed during purging. Purity does not
-        # change across purges, so we're safe to use the original formula.
-        variable_purity = get_variable_purity(variable, formula)
-        if variable_purity is not None:
-            new_formula = purge_clauses_with_literal(Literal(variable, variable_purity), new_formula)
-            known_mapping[variable] = variable_purity
+def do_pure_literal_elimination(formula: Formula) -> (Formula, Mapping[int, bool]):
+    """
+    Finds every pure literal of `formula` from one count of its literal occurrences, and returns the formula without the
+    clauses they satisfy together with the mapping that makes them True. A literal of a cardinality constraint counts
+    as an occurrence of its negation, since making it True is what could violate the constraint.
+    """
+    counts = Counter(formula.lits)
+    counts.update(-lit for lit in formula.constraint_lits)
+    pure = {lit for lit in counts if -lit not in counts}
+    known_mapping: Mapping[int, bool] = {formula.names[abs(lit)]: lit > 0 for lit in pure}
+
+    new_formula = formula.derive()
+    for index in range(len(formula)):
+        clause = formula.clause(index)
+        if not any(lit in pure for lit in clause):
+            new_formula.add_clause(clause, formula.clause_id(index))
+    new_formula.copy_constraints(formula)
 
     return new_formula, known_mapping
 
 
 if __name__ == "__main__":
     # (x) and (x)
-    two_same = [
+    two_same = Formula.from_clauses([
         Clause("foo", [Literal(1, True)]),
         Clause("bar", [Literal(1, True)])
-    ]
+    ])
     two_same_new_formula = []
     two_same_mapping = {1: True}
     assert(do_pure_literal_elimination(two_same) == (two_same_new_formula, two_same_mapping))
 
     # (x) and (!x)
-    two_opposite = [
+    two_opposite = Formula.from_clauses([
         Clause("foo", [Literal(1, True)]),
         Clause("bar", [Literal(1, False)])
-    ]
+    ])
     assert(do_pure_literal_elimination(two_opposite) == (two_opposite, {}))
 
     # (x) and (x or y) and (z) and (!z)
-    three_vars_one_pure = [
+    three_vars_one_pure = Formula.from_clauses([
         Clause("foo", [Literal(1, True)]),
         Clause("bar", [Literal(1, True), Literal(2, True)]),
         Clause("baz", [Literal(3, True)]),
         Clause("buzz", [Literal(3, False)])
-    ]
+    ])
     tvop_new_formula = [
         Clause("baz", [Literal(3, True)]),
         Clause("buzz", [Literal(3, False)])
     ]
     tvop_mapping = {1: True, 2: True}
-    assert(do_pure_literal_elimination(three_vars_one_pure) == (tvop_new_formula, tvop_mapping))
\ No newline at end of file
+    assert(do_pure_literal_elimination(three_vars_one_pure) == (tvop_new_formula, tvop_mapping))
+
+
+class PurityTracker:
+    """
+    Keeps, for every literal, the number of not-yet-satisfied clauses of the propagator's store that contain it, so the
+    DPLL search can find pure literals at every node without rescanning the formula. Counts only change when a clause
+    becomes satisfied (or stops being so on backtrack), and only variables whose count for one polarity dropped to zero
+    are checked for purity. Cardinality constraints are never satisfied for good, so every literal of one counts as a
+    permanent occurrence of its negation.
+    """
+    def __init__(self, propagator: Propagator):
+        self.propagator = propagator
+        store = propagator.store
+        self.counts = Counter(store.lits)
+        self.counts.update(-lit for lits in propagator.constraints for lit in lits)
+        self.true_counts = [0] * len(store)
+        self.occurrences = {lit: [] for lit in propagator.watches}
+        for index in range(len(store)):
+            for lit in store.clause(index):
+                self.occurrences[lit].append(index)
+
+        self.processed: List[int] = []  # the trail prefix that `counts` reflects
+        self.candidates: List[int] = list(range(1, propagator.num_vars() + 1))
+
+    def sync(self) -> None:
+        """
+        Accounts for every assignment on the trail that has not been processed yet.
+        """
+        store = self.propagator.store
+        trail = self.propagator.trail
+        for lit in trail[len(self.processed):]:
+            self.processed.append(lit)
+            for index in self.occurrences[lit]:
+                self.true_counts[index] += 1
+                if self.true_counts[index] == 1:
+                    for other in store.clause(index):
+                        self.counts[other] -= 1
+                        if self.counts[other] == 0:
+                            self.candidates.append(abs(other))
+
+    def undo(self) -> None:
+        """
+        Rolls the counts back to the (shorter) trail left after a backtrack.
+        """
+        store = self.propagator.store
+        while len(self.processed) > len(self.propagator.trail):
+            lit = self.processed.pop()
+            for index in self.occurrences[lit]:
+                self.true_counts[index] -= 1
+                if self.true_counts[index] == 0:
+                    for other in store.clause(index):
+                        self.counts[other] += 1
+        self.candidates.clear()
+
+    def pure_literals(self) -> List[int]:
+        """
+        Returns the unassigned literals that are pure among the unsatisfied clauses, out of the variables whose counts
+        dropped to zero since the last call.
+        """
+        values = self.propagator.values
+        pure = []
+        for var in self.candidates:
+            if values[var] is not None:
+                continue
+            positive, negative = self.counts[var], self.counts[-var]
+            if positive > 0 and negative == 0:
+                pure.append(var)
+            elif negative > 0 and positive == 0:
+                pure.append(-var)
+        self.candidates.clear()
+        return list(set(pure))
+
+
+if __name__ == "__main__":
+    # (x or y) and (!x or z): z is pure from the start, and once z is True, x is pure in what is left
+    tracked = Propagator([1, 2, 3], Formula.from_clauses([
+        Clause("foo", [Literal(1, True), Literal(2, True)]),
+        Clause("bar", [Literal(1, False), Literal(3, True)])
+    ]))
+    tracker = PurityTracker(tracked)
+    assert(sorted(tracker.pure_literals()) == [2, 3])
+    tracked.decide(3)
+    tracker.sync()
+    assert(tracker.pure_literals() == [1])
+
+    # Backtracking restores the counts
+    tracked.backtrack(0)
+    tracker.undo()
+    assert(tracker.counts[-1] == 1 and tracker.pure_literals() == [])
+
+    # (x or z) and at most one of x, y and z: x and z are pure in the clause, but only !y is pure once the constraint
+    # counts as well
+    constrained = Formula()
+    for var in range(1, 4):
+        constrained.add_variable(var)
+    constrained.add_clause([1, 3])
+    constrained.add_at_most([1, 2, 3], 1)
+    assert(do_pure_literal_elimination(constrained)[1] == {2: False})
+    assert(PurityTracker(Propagator([], constrained)).pure_literals() == [-2])
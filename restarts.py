@@ -0,0 +1,130 @@
+from collections import deque
+
+# Restart policies for the CDCL search. The search reports every conflict (with the LBD of the clause it learned, i.e.
+# the number of distinct decision levels among its literals) and restarts from level 0 whenever the policy says so.
+# Learned clauses, heuristic scores and saved phases all survive a restart.
+
+
+class RestartPolicy:
+    def on_conflict(self, lbd: int) -> bool:
+        """
+        Records a conflict whose learned clause has the given LBD and returns whether the search should restart now.
+        """
+        raise NotImplementedError
+
+
+class NoRestarts(RestartPolicy):
+    def on_conflict(self, lbd: int) -> bool:
+        return False
+
+
+def luby(index: int) -> int:
+    """
+    Returns the `index`-th (1-based) element of the Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, ...
+    """
+    # Find the smallest complete subsequence (of size 2^k - 1) that contains the position, then descend into it
+    position = index - 1
+    size, exponent = 1, 0
+    while size < position + 1:
+        size = 2 * size + 1
+        exponent += 1
+    while size - 1 != position:
+        size = (size - 1) >> 1
+        exponent -= 1
+        position = position % size
+    return 2 ** exponent
+
+
+if __name__ == "__main__":
+    assert([luby(i) for i in range(1, 16)] == [1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8])
+
+
+class Luby(RestartPolicy):
+    """
+    Restarts after `unit` times the next Luby number of conflicts.
+    """
+    def __init__(self, unit: int = 100):
+        self.unit = unit
+        self.restarts = 1
+        self.conflicts = 0
+
+    def on_conflict(self, lbd: int) -> bool:
+        self.conflicts += 1
+        if self.conflicts < self.unit * luby(self.restarts):
+            return False
+        self.restarts += 1
+        self.conflicts = 0
+        return True
+
+
+class Geometric(RestartPolicy):
+    """
+    Restarts after `first` conflicts, with the interval growing by `factor` after each restart.
+    """
+    def __init__(self, first: int = 100, factor: float = 1.5):
+        self.limit = float(first)
+        self.factor = factor
+        self.conflicts = 0
+
+    def on_conflict(self, lbd: int) -> bool:
+        self.conflicts += 1
+        if self.conflicts < self.limit:
+            return False
+        self.limit *= self.factor
+        self.conflicts = 0
+        return True
+
+
+class Glucose(RestartPolicy):
+    """
+    Glucose-style dynamic restarts: restart once the average LBD of the last `window` learned clauses exceeds the
+    average over the whole search by a factor of 1/`margin`, i.e. when recent learned clauses are getting worse.
+    """
+    def __init__(self, window: int = 50, margin: float = 0.8):
+        self.recent = deque(maxlen=window)
+        self.margin = margin
+        self.total = 0
+        self.conflicts = 0
+
+    def on_conflict(self, lbd: int) -> bool:
+        self.recent.append(lbd)
+        self.total += lbd
+        self.conflicts += 1
+        if len(self.recent) < self.recent.maxlen:
+            return False
+        if sum(self.recent) / len(self.recent) * self.margin <= self.total / self.conflicts:
+            return False
+        self.recent.clear()
+        return True
+
+
+RESTARTS = {
+    "luby": Luby,
+    "geometric": Geometric,
+    "glucose": Glucose,
+    "none": NoRestarts
+}
+
+
+def make_restart_policy(name: str) -> RestartPolicy:
+    """
+    Builds the restart policy registered as `name` in RESTARTS.
+    """
+    if name not in RESTARTS:
+        raise ValueError(f"Unknown restart policy {name}")
+    return RESTARTS[name]()
+
+
+if __name__ == "__main__":
+    # The first Luby restarts come after 1, 1 and 2 units of conflicts
+    policy = Luby(unit=2)
+    outcomes = [policy.on_conflict(1) for _ in range(8)]
+    assert(outcomes == [False, True, False, True, False, False, False, True])
+
+    geometric = Geometric(first=2, factor=2)
+    assert([geometric.on_conflict(1) for _ in range(6)] == [False, True, False, False, False, True])
+
+    # Steady LBDs never restart, a sudden jump does
+    glucose = Glucose(window=3)
+    assert(not any(glucose.on_conflict(2) for _ in range(10)))
+    assert([glucose.on_conflict(10) for _ in range(3)] == [True, False, False])
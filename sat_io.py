@@ -1,32 +1,180 @@
-from classes import Literal, Clause
-from typing import Mapping
+import bz2
+import gzip
+import lzma
+import os
+from classes import Literal, Clause, Formula, UNKNOWN
+from typing import List, Mapping, TextIO, Tuple
 
 
-def read_input(cnfFile: str):
-    variableSet = []
-    clauseSet = []
-    nextCID = 0
-    with open(cnfFile, "r") as f:
-        for line in f.readlines():
-            tokens = line.strip().split()
-            if tokens and tokens[0] != "p" and tokens[0] != "c":
-                literals = []
-                for lit in tokens[:-1]:
-                    sign = lit[0] != "-"
-                    variable = lit.strip("-")
+# Compressed benchmark files are decompressed on the fly, keyed by their extension
+OPENERS = {".gz": gzip.open, ".xz": lzma.open, ".bz2": bz2.open}
 
-                    literals.append(Literal(variable, sign))
-                    if variable not in variableSet:
-                        variableSet.append(variable)
 
-                clauseSet.append(Clause(nextCID, literals))
-                nextCID += 1
+def open_cnf(cnfFile: str) -> TextIO:
+    """
+    Opens `cnfFile` for reading as text, transparently decompressing .gz, .xz and .bz2 files.
+    """
+    opener = OPENERS.get(os.path.splitext(cnfFile)[1], open)
+    return opener(cnfFile, "rt")
+
+
+# Comparison operators of cardinality constraints
+OPERATORS = ["<=", ">=", "="]
+
+
+def read_input(cnfFile: str) -> Tuple[List[int], Formula]:
+    """
+    Streams the DIMACS file `cnfFile` into a `Formula`, one line at a time. Clauses are terminated by 0 and may span
+    several lines. Variables are the integers 1..n, where n is the larger of the `p cnf` header's count and the largest
+    variable that actually occurs, so variable v is also literal index v in the returned formula.
+
+    Like MiniCard's `p cnf+` files, a line may also hold a cardinality constraint: literals followed by `<=`, `>=` or
+    `=` and a bound, such as `1 2 -3 <= 1`, optionally terminated by 0. Files ending in .opb (possibly compressed) are
+    read with `read_opb` instead.
+    """
+    base, extension = os.path.splitext(cnfFile)
+    if (base if extension in OPENERS else cnfFile).endswith(".opb"):
+        return read_opb(cnfFile)
+
+    formula = Formula()
+    clause = []
+    with open_cnf(cnfFile) as f:
+        for line in f:
+            first = line[:1]
+            if first == "c" or first == "\n":
+                continue
+            if first == "p":
+                header = line.split()
+                if len(header) < 4 or header[1] not in ("cnf", "cnf+"):
+                    raise ValueError(f"Malformed problem line in {cnfFile}: {line.strip()}")
+                declare_variables(formula, int(header[2]))
+                continue
+            if first == "%":
+                # SATLIB files end with a "%" line followed by junk
+                break
+
+            if "=" in line:
+                tokens = line.split()
+                operator = next((token for token in tokens if token in OPERATORS), None)
+                position = tokens.index(operator) if operator is not None else -1
+                malformed = operator is None or position == len(tokens) - 1 or tokens[position + 2:] not in ([], ["0"])
+                if malformed or clause:
+                    raise ValueError(f"Malformed cardinality constraint in {cnfFile}: {line.strip()}")
+                lits = list(map(int, tokens[:position]))
+                if lits and max(map(abs, lits)) >= len(formula.names):
+                    declare_variables(formula, max(map(abs, lits)))
+                add_cardinality(formula, lits, operator, int(tokens[position + 1]))
+                continue
+
+            lits = list(map(int, line.split()))
+            if not lits:
+                continue
+            largest = max(max(lits), -min(lits))
+            if largest >= len(formula.names):
+                declare_variables(formula, largest)
+
+            # Fast path for the usual layout of exactly one clause per line
+            if not clause and lits[-1] == 0 and lits.index(0) == len(lits) - 1:
+                lits.pop()
+                formula.add_clause(lits)
+                continue
+
+            for lit in lits:
+                if lit == 0:
+                    formula.add_clause(clause)
+                    clause = []
+                else:
+                    clause.append(lit)
+
+    # Tolerate a final clause that is missing its terminating 0
+    if clause:
+        formula.add_clause(clause)
+
+    return list(range(1, formula.num_vars() + 1)), formula
+
+
+def read_opb(opbFile: str) -> Tuple[List[int], Formula]:
+    """
+    Reads the pseudo-Boolean constraints of the OPB file `opbFile` into a `Formula`, as long as every coefficient is 1
+    or -1, which makes them cardinality constraints. Terms are a coefficient followed by a variable `xN` or its
+    negation `~xN`, and every constraint ends with `;`. Variables are the integers 1..n as with `read_input`; files
+    with an objective function are rejected, since there is nothing to optimize with.
+    """
+    formula = Formula()
+    statement: List[str] = []
+    with open_cnf(opbFile) as f:
+        for line in f:
+            if line[:1] == "*":
+                header = line.split()
+                if "#variable=" in header:
+                    declare_variables(formula, int(header[header.index("#variable=") + 1]))
+                continue
+            for token in line.replace(";", " ; ").split():
+                if token != ";":
+                    statement.append(token)
+                    continue
+                if statement:
+                    add_opb_constraint(formula, statement, opbFile)
+                statement = []
+
+    if statement:
+        add_opb_constraint(formula, statement, opbFile)
+    return list(range(1, formula.num_vars() + 1)), formula
+
+
+def add_opb_constraint(formula: Formula, tokens: List[str], opbFile: str) -> None:
+    """
+    Adds the OPB constraint made of `tokens` to `formula`. A term -1 l is rewritten as 1 ~l - 1, moving the -1 to the
+    right-hand side.
+    """
+    statement = " ".join(tokens)
+    if tokens[0] in ("min:", "max:"):
+        raise ValueError(f"Objective functions are not supported in {opbFile}: {statement}")
+    if len(tokens) < 2 or tokens[-2] not in OPERATORS or len(tokens) % 2 != 0:
+        raise ValueError(f"Malformed constraint in {opbFile}: {statement}")
+
+    bound = int(tokens[-1])
+    lits = []
+    for coefficient, name in zip(tokens[:-2:2], tokens[1:-2:2]):
+        negated = name.startswith("~")
+        if not name.lstrip("~").startswith("x") or coefficient.lstrip("+") not in ("1", "-1"):
+            raise ValueError(f"Only cardinality constraints over variables xN are supported in {opbFile}: {statement}")
+        var = int(name.lstrip("~")[1:])
+        if var >= len(formula.names):
+            declare_variables(formula, var)
+        if coefficient.lstrip("+") == "-1":
+            negated = not negated
+            bound += 1
+        lits.append(-var if negated else var)
+
+    add_cardinality(formula, lits, tokens[-2], bound)
+
+
+def add_cardinality(formula: Formula, lits: List[int], operator: str, bound: int) -> None:
+    """
+    Adds the constraint that the number of True literals in `lits` is `operator` (one of OPERATORS) `bound`. At least
+    k of the literals being True is at most len(lits) - k of their negations being True.
+    """
+    if operator in ("<=", "="):
+        formula.add_at_most(lits, bound)
+    if operator in (">=", "="):
+        formula.add_at_most([-lit for lit in lits], len(lits) - bound)
+
 
-    return variableSet, clauseSet
+def declare_variables(formula: Formula, count: int) -> None:
+    """
+    Registers the variables 1..`count` in `formula`, in order, so that every variable name equals its index.
+    """
+    for variable in range(len(formula.names), count + 1):
+        formula.add_variable(variable)
 
 
 # Print the result in DIMACS format
 def print_output(assignment: Mapping[int, bool]):
+    if assignment is UNKNOWN:
+        print("s UNKNOWN")
+        return
+
     result = ""
     isSat = (assignment is not None)
     if isSat:
@@ -38,8 +186,59 @@ def print_output(assignment: Mapping[int, bool]):
         print(f"v{result} 0")
 
 
+def print_count(count) -> None:
+    """
+    Prints the number of models `count` as a model counter does, or that it is unknown.
+    """
+    if count is UNKNOWN:
+        print("s UNKNOWN")
+        return
+
+    print(f"s {'SATISFIABLE' if count > 0 else 'UNSATISFIABLE'}")
+    print(f"s mc {count}")
+
+
 def comment(cmt: str) -> None:
     """
     Prints the comment `cmt` to standard output in accordance to the DIMACS format
     """
-    print(f"c {cmt}")
\ No newline at end of file
+    print(f"c {cmt}")
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    # A clause that spans two lines, a comment and a compressed file
+    with tempfile.TemporaryDirectory() as directory:
+        cnf = "c example\np cnf 4 2\n1 -3\n 0 2 3 -1 0\n"
+        compressed = os.path.join(directory, "example.cnf.gz")
+        with gzip.open(compressed, "wt") as f:
+            f.write(cnf)
+
+        variables, formula = read_input(compressed)
+        assert(variables == [1, 2, 3, 4])
+        assert(list(formula.lits) == [1, -3, 2, 3, -1])
+        assert(list(formula.offsets) == [0, 2, 5])
+
+        # Cardinality constraints: at most one of 1, 2, 3, and exactly two of 1..4, the ">=" half of which is the
+        # constraint that at most two of their negations are True
+        cardinality = os.path.join(directory, "example.cnf")
+        with open(cardinality, "w") as f:
+            f.write("p cnf+ 4 3\n1 -2 0\n1 2 3 <= 1\n1 2 3 4 = 2 0\n")
+        variables, formula = read_input(cardinality)
+        assert(variables == [1, 2, 3, 4] and len(formula) == 1 and formula.num_constraints() == 3)
+        assert(list(formula.constraint(2)) == [-1, -2, -3, -4] and list(formula.bounds) == [1, 2, 2])
+
+        # The same in OPB, where -1 x2 >= -1 is 1 ~x2 >= 0
+        opb = os.path.join(directory, "example.opb")
+        with open(opb, "w") as f:
+            f.write("* #variable= 4 #constraint= 3\n+1 x1 +1 ~x2 >= 1 ;\n+1 x1 +1 x2 +1 x3 <= 1 ;\n"
+                    "+1 x1 +1 x2 +1 x3 +1 x4 = 2 ;\n-1 x2 >= -1 ;\n")
+        opb_variables, opb_formula = read_input(opb)
+        assert(opb_variables == variables and opb_formula == formula)
+        assert(list(opb_formula.constraint_lits) == list(formula.constraint_lits))
+        try:
+            add_opb_constraint(formula, ["+2", "x1", ">=", "1"], opb)
+            assert(False)
+        except ValueError:
+            pass
@@ -1,78 +1,452 @@
-import sys
-from sat_io import read_input, print_output, comment
+import argparse
+from sat_io import read_input, print_output, print_count, comment
+from formula_cache import load_formula
 from time import time
-from pure_elimination import do_pure_literal_elimination
-from unit_elimination import do_unit_elimination
-from util import has_empty_clause, has_no_clauses, propagate_known_value, pick_var, create_total_assignment
+from functools import partial
+from typing import Dict, Sequence, Tuple
+from pure_elimination import do_pure_literal_elimination, PurityTracker
+from propagation import Propagator
+from cdcl import cdcl_solve
+from heuristics import Heuristic, HEURISTICS, make_heuristic
+from restarts import RestartPolicy, RESTARTS, make_restart_policy
+from components import ComponentCache, residual_components, split, solve_components
+from local_search import LocalSearch, POLICIES, local_solve
+from cardinality import detect_at_most_one
+from symmetry import MAX_BREAKING_CLAUSES, break_symmetries
+from enumeration import iter_cubes
+from fragments import classify, two_sat_solve, horn_solve, TWO_SAT, HORN
+from preprocess import Preprocessor, DEFAULT_BUDGETS, TECHNIQUES, parse_budgets
+from util import create_total_assignment, has_empty_clause
+from stats import Stats
+from budget import Budget, BudgetExhausted
+from proof import Proof
 from classes import *
-from copy import deepcopy
 
+# Decision levels at which the DPLL search looks for components in what is left of the formula
+DECOMPOSITION_LEVELS = 8
 
-def partial_solve(known_values: Mapping[int, bool], formula: List[Clause]) -> Mapping[int, bool]:
+# Flips per variable of the local search that the hybrid mode runs before CDCL
+HYBRID_FLIPS_PER_VARIABLE = 100
+
+# The options of `solve` that model counting (see `enumeration`) takes as well
+COUNT_OPTIONS = ["heuristic", "seed", "restart", "phase_saving", "initial_phase", "budget"]
+
+
+def partial_solve(propagator: Propagator, heuristic: Heuristic, stats: Optional[Stats] = None,
+                  budget: Optional[Budget] = None) -> Mapping[int, bool]:
     """
-    Using the DPLL algorithm (unit elimination, pure literal elimination, and branching), creates a partial instance
-    of boolean assignments that satisfies `formula`. If no such assignment exists (`formula` is UNSAT), then it returns
-    None.
+    Using the DPLL algorithm (unit propagation, pure literal elimination and branching) on the shared clause store in
+    `propagator`, creates a partial instance of boolean assignments that satisfies the formula. If no such assignment
+    exists (the formula is UNSAT), then it returns None. Assignments made on a failed branch are undone from the trail
+    before trying the next. Branching literals come from `heuristic`, which has the variables of every conflicting
+    clause bumped. `stats` is told about every conflict, so it can report progress, and `budget` is checked at every
+    conflict and decision.
+
+    The search is a loop over the trail rather than a recursion, so its depth is only bounded by the number of
+    variables. The only per-decision state is whether the other polarity of that decision has been tried yet.
+
+    At the first DECOMPOSITION_LEVELS decision levels, the clauses left unsatisfied are split into components (see
+    `components.residual_components`). A conflict only involves one component of every split above it, so the search
+    backtracks past the decisions made in the other components instead of trying their other polarity.
     """
-    new_formula, unit_knowns = do_unit_elimination(formula)
-    curr_formula, pure_knowns = do_pure_literal_elimination(new_formula)
-    curr_values = {**known_values, **unit_knowns, **pure_knowns}
+    flipped: List[bool] = []  # one entry per open decision level
+    splits: List[Tuple[int, Dict[int, int]]] = []  # (number of decisions before the split, component of every variable)
+    purity = PurityTracker(propagator)
+    if budget is not None:
+        budget.begin(propagator)
 
-    if has_empty_clause(curr_formula):
-        return None
-    if has_no_clauses(curr_formula):
-        return curr_values
+    # Looking for components takes a pass over the store, so every attempt that finds none doubles the number of
+    # decisions until the next one
+    next_split = 0
+    split_gap = 1
 
-    new_var = pick_var(curr_values, curr_formula)
-    new_var_true_solution = partial_solve(curr_values, propagate_known_value(Literal(new_var, True), curr_formula))
+    while True:
+        conflict = propagator.propagate()
+        if conflict is not None:
+            if stats is not None:
+                stats.on_conflict(propagator)
+            if budget is not None:
+                budget.check(propagator)
+            clause = propagator.store.clause(conflict)
+            for lit in clause:
+                heuristic.bump(abs(lit))
+            heuristic.decay()
 
-    if new_var_true_solution is not None:
-        return {**new_var_true_solution, **{new_var: True}}
-    else:
-        return partial_solve({**curr_values, **{new_var: False}}, propagate_known_value(Literal(new_var, False), curr_formula))
+            # The component of the conflict in every split; every variable of the clause was unassigned at each split
+            # that is still open, so any variable will do as long as the split saw it
+            conflict_components = []
+            for _, components in splits:
+                component = next((components[abs(lit)] for lit in clause if abs(lit) in components), None)
+                conflict_components.append(component)
+
+            # Give up on the decisions whose both polarities have failed, and on those made in other components
+            level = len(flipped) - 1
+            current = len(splits) - 1
+            while level >= 0:
+                while current >= 0 and splits[current][0] > level:
+                    current -= 1
+                if not flipped[level]:
+                    if current < 0 or conflict_components[current] is None:
+                        break
+                    var = abs(propagator.trail[propagator.trail_lim[level]])
+                    if splits[current][1].get(var) == conflict_components[current]:
+                        break
+                level -= 1
+            if level < 0:
+                return None
+
+            decision = propagator.trail[propagator.trail_lim[level]]
+            propagator.backtrack(level)
+            purity.undo()
+            del flipped[level + 1:]
+            while splits and splits[-1][0] > level:
+                splits.pop()
+            flipped[-1] = True
+            propagator.decide(-decision)
+            continue
+
+        purity.sync()
+        pure = purity.pure_literals()
+        if pure:
+            for lit in pure:
+                propagator.enqueue(lit)
+            continue
 
+        new_lit = heuristic.pick(propagator)
+        if new_lit is None:
+            return propagator.assignment()
 
-def solve(variables: List[str], formula: List[Clause]) -> Mapping[int, bool]:
+        if budget is not None:
+            budget.check(propagator)
+        if len(flipped) < DECOMPOSITION_LEVELS and propagator.decisions >= next_split:
+            components = residual_components(propagator)
+            if len(set(components.values())) > 1:
+                splits.append((len(flipped), components))
+                split_gap = 1
+            else:
+                split_gap *= 2
+            next_split = propagator.decisions + split_gap
+        flipped.append(False)
+        propagator.decide(new_lit)
+
+
+MODES = ["cdcl", "dpll", "hybrid", "local"]
+
+# Modes that can't show a formula is UNSAT, only fail to find a model
+INCOMPLETE_MODES = ["local"]
+
+
+def search(variables: List[str], formula: Formula, mode: str, brancher: Heuristic, policy: RestartPolicy,
+           phase_saving: bool = True, initial_phase: bool = True, exchange=None, cube: Sequence[int] = (),
+           budget: Optional[Budget] = None, stats: Optional[Stats] = None, proof: Optional[Proof] = None,
+           walk: str = "probsat", seed: int = 0) -> Optional[Mapping]:
     """
-    Solves the `formula` by generating a partial instance with the DPLL algorithm and adjusting the output to be total.
-    `variables` parameter is used to know which variables need to be assigned to create a total assignment.
+    Runs the search selected by `mode` on `formula`, which has already been through the fast paths and preprocessing,
+    and returns the partial assignment it finds (or None if the formula is UNSAT). The integer literals of `cube` are
+    fixed before searching, restricting it to that part of the search space. `exchange` is passed on to the CDCL
+    search for sharing learned clauses with other searches on the same formula, and the search gives up with
+    BudgetExhausted once it runs out of `budget`. The counters of the search are added to `stats`, if given. The CDCL
+    search writes its DRAT proof to `proof`, if given; pure literals are then left to the search, since fixing them is
+    not a unit propagation step.
+
+    The "hybrid" mode first runs HYBRID_FLIPS_PER_VARIABLE flips per variable of local search with the `walk` policy
+    of `local_search` and the random `seed`. Its model is returned right away if it finds one (a model of the whole
+    formula is also one of the cube); otherwise the CDCL search starts with the best assignment it saw as the saved
+    phases. A formula with an empty clause goes straight to CDCL.
     """
-    partial_assignment = partial_solve({}, formula)
-    return create_total_assignment(variables, partial_assignment)
+    propagator = Propagator(variables, formula)
+    propagator.phase_saving = phase_saving
+    propagator.set_default_phase(initial_phase)
+    if mode == "hybrid" and not has_empty_clause(formula):
+        local = LocalSearch(formula, walk, seed)
+        local.reset()
+        model = local.run(HYBRID_FLIPS_PER_VARIABLE * max(formula.num_vars(), 1))
+        if stats is not None:
+            stats.add_search(local)
+        if model is not None:
+            return model
+        for var, phase in local.best_phases().items():
+            propagator.phases[var] = phase
+        mode = "cdcl"
+    for lit in cube:
+        propagator.add_clause([lit])
+
+    # Pure literals can be fixed once up front; the search itself only ever propagates units.
+    if proof is None:
+        _, pure_knowns = do_pure_literal_elimination(formula)
+        for name, sign in pure_knowns.items():
+            lit = propagator.to_int(Literal(name, sign))
+            if propagator.value(lit) is None:
+                propagator.enqueue(lit)
 
+    propagator.heuristic = brancher
+    try:
+        if mode == "cdcl":
+            return cdcl_solve(propagator, brancher, policy, exchange, budget, stats=stats, proof=proof)
+        if not propagator.ok:
+            return None
+        return partial_solve(propagator, brancher, stats, budget)
+    finally:
+        if stats is not None:
+            stats.add_search(propagator)
 
-def verify_assignment(assignments: Mapping[int, bool], formula: List[Clause]) -> bool:
+
+def solve(variables: List[str], formula: Formula, mode: str = "cdcl", heuristic: str = "vsids", seed: int = 0,
+          restart: str = "luby", phase_saving: bool = True, initial_phase: bool = True,
+          fast_paths: bool = True, preprocess: Mapping[str, float] = DEFAULT_BUDGETS, jobs: int = 1,
+          cube_depth: int = 0, stats: Optional[Stats] = None, budget: Optional[Budget] = None,
+          proof: Optional[Proof] = None, decompose: bool = True, cache: Optional[ComponentCache] = None,
+          walk: str = "probsat", detect_amo: bool = False, symmetry: float = 0.0,
+          symmetry_clauses: int = MAX_BREAKING_CLAUSES) -> Mapping[int, bool]:
     """
-    Verifies that every clause in formula, using the assignments from `assignments`, is True. This should be used to
-    check output from SAT scenarios.
+    Solves the `formula` by generating a partial instance and adjusting the output to be total. `variables` parameter is
+    used to know which variables need to be assigned to create a total assignment. `mode` selects the search: "cdcl"
+    learns clauses from conflicts and backjumps, while "dpll" is the plain branching baseline. `heuristic` names the
+    branching heuristic in `heuristics.HEURISTICS`, and `seed` drives its random choices. `restart` names the restart
+    policy in `restarts.RESTARTS`; DPLL learns nothing to keep across restarts, so it never restarts. Decisions try
+    `initial_phase` first, or the last value a variable had when `phase_saving` is on. With `fast_paths`, 2-SAT and
+    Horn formulas skip the search and go to the linear-time solvers in `fragments`. `preprocess` maps each technique of
+    `preprocess.TECHNIQUES` to run before search to its time budget in seconds. With `jobs` above 1, the search runs
+    as a portfolio of that many diversified processes (see `portfolio`), and the first answer wins. A positive
+    `cube_depth` switches to cube-and-conquer instead (see `cube`): the formula is split into cubes of up to that many
+    decisions, which `jobs` processes search one at a time. `stats` collects the counters of the search and the time
+    spent preprocessing and searching, if given; searches in other processes are not counted. If the search runs out
+    of `budget` (see `budget.Budget`), the result is UNKNOWN; the parallel modes don't take a budget. A DRAT proof of
+    every UNSAT answer is written to `proof` (see `proof.Proof`), if given; only the sequential CDCL search and the
+    preprocessing before it can write one, so the fast paths are skipped.
+
+    The "local" mode runs the stochastic local search of `local_search` with the `walk` policy instead, which either
+    finds a model or gives up with UNKNOWN after its tries; it only runs sequentially. The "hybrid" mode runs a short
+    local search before CDCL (see `search`).
+
+    Cardinality constraints of the formula are propagated natively (see `propagation`); the fast paths only apply to
+    plain CNF. With `detect_amo`, at-most-one constraints encoded as pairwise clauses are recovered after preprocessing
+    (see `cardinality`).
+
+    A positive `symmetry` spends up to that many seconds looking for symmetries of the formula after preprocessing, and
+    adds up to `symmetry_clauses` lex-leader clauses that break them (see `symmetry`). Those clauses drop models, so
+    they can't be part of a proof; their auxiliary variables are left out of the answer.
+
+    With `decompose`, a formula that splits into variable-disjoint components (see `components`) has each of them
+    solved on its own, in up to `jobs` processes, and the answer for every component is kept in `cache`, so a renamed
+    copy of it is answered right away. Cube-and-conquer and budgets see the formula as a whole.
+    """
+    stats = stats if stats is not None else Stats()
+    if mode not in MODES:
+        raise ValueError(f"Unknown solving mode {mode}")
+    if walk not in POLICIES:
+        raise ValueError(f"Unknown local search policy {walk}")
+    if jobs < 1:
+        raise ValueError(f"Need at least one job, got {jobs}")
+    if budget is not None and (jobs > 1 or cube_depth > 0):
+        raise ValueError("Budgets are only supported for the sequential search")
+    if proof is not None and (mode not in ("cdcl", "hybrid") or jobs > 1 or cube_depth > 0):
+        raise ValueError("Proofs are only supported for the sequential CDCL search")
+    if mode == "local" and (jobs > 1 or cube_depth > 0):
+        raise ValueError("Local search only runs sequentially")
+    if symmetry < 0 or symmetry_clauses < 0:
+        raise ValueError("Symmetry breaking needs a non-negative time and number of clauses")
+    if proof is not None and symmetry > 0:
+        raise ValueError("Symmetry breaking clauses can't be part of a proof")
+    brancher = make_heuristic(heuristic, seed)
+    policy = make_restart_policy(restart)
+
+    if fast_paths and proof is None and formula.num_constraints() == 0:
+        with stats.phase("preprocessing"):
+            fragment = classify(formula)
+        if fragment == TWO_SAT or fragment == HORN:
+            with stats.phase("search"):
+                partial_assignment = two_sat_solve(formula) if fragment == TWO_SAT else horn_solve(formula)
+            return create_total_assignment(variables, partial_assignment)
+
+    preprocessor = None
+    if preprocess:
+        with stats.phase("preprocessing"):
+            preprocessor = Preprocessor(formula, proof)
+            preprocessor.run(preprocess)
+            if not preprocessor.ok:
+                if proof is not None:
+                    proof.add([])
+                return None
+            formula = preprocessor.to_formula()
+    if detect_amo:
+        with stats.phase("preprocessing"):
+            formula = detect_at_most_one(formula)
+    names = None  # the numbering before symmetry breaking added its auxiliary variables
+    if symmetry > 0:
+        with stats.phase("preprocessing"):
+            names = formula.names
+            formula = break_symmetries(formula, symmetry, symmetry_clauses)
+
+    options = {
+        "mode": mode, "heuristic": heuristic, "seed": seed, "restart": restart, "phase_saving": phase_saving,
+        "initial_phase": initial_phase, "walk": walk
+    }
+    components = []
+    if decompose and cube_depth == 0 and budget is None and mode != "local":
+        with stats.phase("preprocessing"):
+            components = split(formula)
+
+    if len(components) > 1:
+        # Every component gets a solve of its own, which records its own phases; a proof can't use earlier answers
+        solve_one = partial(solve, fast_paths=fast_paths, preprocess={}, decompose=False, **options)
+        if jobs == 1:
+            solve_one = partial(solve_one, stats=stats, proof=proof)
+        if proof is not None or cache is None:
+            cache = ComponentCache()
+        partial_assignment = solve_components(components, solve_one, jobs, cache)
+    else:
+        with stats.phase("search"):
+            # The parallel modes build on `search`, so they can only be imported once this module is loaded
+            if mode == "local":
+                # Local search can't refute a formula, but an empty clause needs no search
+                if has_empty_clause(formula):
+                    return None
+                try:
+                    partial_assignment = local_solve(formula, walk, seed, budget=budget, stats=stats)
+                except BudgetExhausted:
+                    return UNKNOWN
+                if partial_assignment is None:
+                    return UNKNOWN
+            elif cube_depth > 0:
+                from cube import cube_and_conquer
+                partial_assignment = cube_and_conquer(variables, formula, cube_depth, jobs, options)
+            elif jobs > 1:
+                from portfolio import portfolio_search
+                partial_assignment = portfolio_search(variables, formula, jobs, options)
+            else:
+                try:
+                    partial_assignment = search(variables, formula, mode, brancher, policy, phase_saving, initial_phase,
+                                                budget=budget, stats=stats, proof=proof, walk=walk, seed=seed)
+                except BudgetExhausted:
+                    return UNKNOWN
+
+    if partial_assignment is not None and names is not None:
+        for name in formula.names[len(names):]:
+            partial_assignment.pop(name, None)
+    assignment = create_total_assignment(variables, partial_assignment)
+    if assignment is not None and preprocessor is not None:
+        preprocessor.extend_model(assignment)
+    return assignment
+
+
+def verify_assignment(assignments: Mapping[int, bool], formula: Formula) -> bool:
+    """
+    Verifies that every clause in formula, using the assignments from `assignments`, is True, and that no cardinality
+    constraint has too many True literals. This should be used to check output from SAT scenarios.
     """
     for clause in formula:
         is_true = clause.eval(assignments)
         if not is_true:
             return False
 
-    return True
+    return all(constraint.eval(assignments) for constraint in formula.constraints())
 
 
-def do_dpll(path: str) -> None:
+def do_dpll(path: str, progress: Optional[float] = None, stats_json: Optional[str] = None,
+            proof_path: Optional[str] = None, binary_proof: bool = False, formula_cache: bool = False,
+            formula_cache_dir: Optional[str] = None, count: bool = False, **options) -> None:
     """
-    Runs the DPLL algorithm on a valid CNF file (pointed to by `path`) and prints out relevant information, including
-    the satisfiability, to standard output.
+    Runs the solver on a valid CNF file (pointed to by `path`) and prints out relevant information, including the
+    satisfiability, to standard output. `options` are passed on to `solve`. The search reports progress every
+    `progress` seconds if given, and the final statistics are printed as comments and also written to `stats_json` as
+    JSON if given. A DRAT proof is written to `proof_path` if given, in the binary format with `binary_proof`. With
+    `formula_cache`, the file is loaded through its binary cache file (see `formula_cache`), kept next to it or in
+    `formula_cache_dir`. With `count`, the models of the formula are counted (see `enumeration`) instead, which only
+    takes the options in COUNT_OPTIONS; when the budget runs out, the models counted so far are printed as a lower
+    bound.
     """
+    if count and proof_path is not None:
+        raise ValueError("Model counts can't be proved")
     start = time()
     comment(f"solving {path}")
+    stats = Stats(progress_interval=progress)
 
-    variables, formula = read_input(path)
+    with stats.phase("read_input"):
+        variables, formula = load_formula(path, formula_cache_dir) if formula_cache else read_input(path)
 
-    answer = solve(variables, deepcopy(formula))
-    if answer is not None:
-        assert(verify_assignment(answer, formula))
-    print_output(answer)
+    if count:
+        models = 0
+        with stats.phase("search"):
+            try:
+                for cube in iter_cubes(formula, stats=stats, **{key: options[key] for key in COUNT_OPTIONS
+                                                                if key in options}):
+                    models += 2 ** (formula.num_vars() - len(cube))
+            except BudgetExhausted:
+                comment(f"at least {models} models")
+                models = UNKNOWN
+        print_count(models)
+    else:
+        proof = Proof(proof_path, binary_proof) if proof_path is not None else None
+        try:
+            answer = solve(variables, formula, stats=stats, proof=proof, **options)
+        finally:
+            if proof is not None:
+                proof.close()
+        if answer is not None and answer is not UNKNOWN:
+            with stats.phase("verification"):
+                assert(verify_assignment(answer, formula))
+        print_output(answer)
 
+    stats.report()
+    if stats_json is not None:
+        stats.dump(stats_json)
     elapsed = round(time() - start, 3)
     comment(f"Finished in {elapsed}s")
 
 
-
 if __name__ == "__main__":
-    do_dpll(sys.argv[1])
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Decides the satisfiability of a DIMACS CNF file")
+    parser.add_argument("path")
+    parser.add_argument("--mode", choices=MODES, default="cdcl")
+    parser.add_argument("--count", action="store_true",
+                        help="count the models instead, a cube of free variables at a time")
+    parser.add_argument("--walk", choices=POLICIES, default="probsat",
+                        help="how the local search of --mode local and hybrid picks the variable to flip")
+    parser.add_argument("--heuristic", choices=list(HEURISTICS), default="vsids")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--restart", choices=list(RESTARTS), default="luby")
+    parser.add_argument("--no-phase-saving", dest="phase_saving", action="store_false")
+    parser.add_argument("--initial-phase", choices=["true", "false"], default="true")
+    parser.add_argument("--no-fast-paths", dest="fast_paths", action="store_false")
+    parser.add_argument("--detect-amo", action="store_true",
+                        help="turn pairwise at-most-one encodings into native cardinality constraints")
+    parser.add_argument("--symmetry", type=float, default=0.0,
+                        help="seconds to spend looking for symmetries to break after preprocessing")
+    parser.add_argument("--symmetry-clauses", type=int, default=MAX_BREAKING_CLAUSES,
+                        help="most lex-leader clauses to add for the symmetries found")
+    parser.add_argument("--no-decompose", dest="decompose", action="store_false",
+                        help="search the formula as a whole even if it splits into independent components")
+    parser.add_argument("--preprocess", type=parse_budgets, default=DEFAULT_BUDGETS,
+                        help=f"comma-separated techniques out of {', '.join(TECHNIQUES)}, each optionally followed by "
+                             "=SECONDS; pass an empty string to skip preprocessing")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="number of diversified solver processes to race, sharing short learned clauses")
+    parser.add_argument("--cubes", dest="cube_depth", type=int, default=0,
+                        help="split the formula into cubes of up to this many decisions and solve them with --jobs "
+                             "processes (cube-and-conquer)")
+    parser.add_argument("--progress", type=float, default=None, help="report search progress every this many seconds")
+    parser.add_argument("--stats-json", default=None, help="file to write the final statistics to as JSON")
+    parser.add_argument("--max-seconds", type=float, default=None)
+    parser.add_argument("--max-decisions", type=int, default=None)
+    parser.add_argument("--max-conflicts", type=int, default=None)
+    parser.add_argument("--max-propagations", type=int, default=None)
+    parser.add_argument("--max-memory", type=float, default=None, help="peak resident memory in megabytes")
+    parser.add_argument("--proof", dest="proof_path", default=None, help="file to write a DRAT proof of UNSAT to")
+    parser.add_argument("--binary-proof", action="store_true", help="write the proof in the binary DRAT format")
+    parser.add_argument("--formula-cache", action="store_true",
+                        help="load the file through a binary cache file written next to it on the first load")
+    parser.add_argument("--formula-cache-dir", default=None, help="directory for the cache file (implies "
+                        "--formula-cache)")
+    args = parser.parse_args()
+
+    limits = (args.max_seconds, args.max_decisions, args.max_conflicts, args.max_propagations, args.max_memory)
+    budget = Budget(*limits) if any(limit is not None for limit in limits) else None
+
+    do_dpll(args.path, mode=args.mode, walk=args.walk, heuristic=args.heuristic, seed=args.seed, restart=args.restart,
+            phase_saving=args.phase_saving, initial_phase=args.initial_phase == "true", fast_paths=args.fast_paths,
+            preprocess=args.preprocess, jobs=args.jobs, cube_depth=args.cube_depth, decompose=args.decompose,
+            detect_amo=args.detect_amo, symmetry=args.symmetry, symmetry_clauses=args.symmetry_clauses,
+            progress=args.progress, stats_json=args.stats_json, budget=budget, proof_path=args.proof_path,
+            binary_proof=args.binary_proof, formula_cache=args.formula_cache or args.formula_cache_dir is not None,
+            formula_cache_dir=args.formula_cache_dir, count=args.count)
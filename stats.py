@@ -0,0 +1,123 @@
+import json
+from contextlib import contextmanager
+from time import time
+from sat_io import comment
+from typing import Callable, Dict, Iterator, Optional
+
+# Statistics for one solver run: the search counters kept by every `Propagator`, the time spent in each phase of the
+# run, and periodic progress reports while the search is going. A callback, if given, sees every event as it happens,
+# so an external profiler can follow a run without parsing the `c` lines.
+
+# Counters every `Propagator` keeps, in the order they are reported
+COUNTERS = ["decisions", "propagations", "conflicts", "backtracks", "restarts", "learned"]
+
+
+class Stats:
+    """
+    Accumulates counters and phase times over a run. With `progress_interval`, the search reports its counters at
+    most that many seconds apart, as a `c` line unless `echo` is off. `callback(event, data)` is called with "phase"
+    and the phase name and seconds when a phase ends, with "progress" and the current counters on every progress
+    report, and with "search" and the counters of a finished search.
+    """
+    def __init__(self, progress_interval: Optional[float] = None,
+                 callback: Optional[Callable[[str, Dict], None]] = None, echo: bool = True):
+        self.counters: Dict[str, int] = {counter: 0 for counter in COUNTERS}
+        self.times: Dict[str, float] = {}
+        self.progress_interval = progress_interval
+        self.callback = callback
+        self.echo = echo
+        self.start = time()
+        self.last_progress = self.start
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Adds the time spent in the `with` block to the phase `name`.
+        """
+        start = time()
+        try:
+            yield
+        finally:
+            seconds = time() - start
+            self.times[name] = self.times.get(name, 0.0) + seconds
+            if self.callback is not None:
+                self.callback("phase", {"phase": name, "seconds": seconds})
+
+    def current(self, propagator=None) -> Dict[str, int]:
+        """
+        Returns the counters so far, including those of a search still running on `propagator`.
+        """
+        if propagator is None:
+            return dict(self.counters)
+        return {counter: self.counters[counter] + getattr(propagator, counter) for counter in COUNTERS}
+
+    def on_conflict(self, propagator) -> None:
+        """
+        Called by the search on every conflict, to report progress once the interval has passed.
+        """
+        if self.progress_interval is None:
+            return
+        now = time()
+        if now - self.last_progress < self.progress_interval:
+            return
+        self.last_progress = now
+
+        counters = self.current(propagator)
+        elapsed = now - self.start
+        if self.echo:
+            comment(f"progress {elapsed:.1f}s: " + ", ".join(f"{counters[counter]} {counter}" for counter in COUNTERS)
+                    + f" ({counters['propagations'] / elapsed:.0f} propagations/s)")
+        if self.callback is not None:
+            self.callback("progress", counters)
+
+    def add_search(self, propagator) -> None:
+        """
+        Adds the counters of a finished search on `propagator`.
+        """
+        for counter in COUNTERS:
+            self.counters[counter] += getattr(propagator, counter)
+        if self.callback is not None:
+            self.callback("search", {counter: getattr(propagator, counter) for counter in COUNTERS})
+
+    def to_dict(self) -> Dict:
+        times = {name: round(seconds, 6) for name, seconds in self.times.items()}
+        return {"counters": dict(self.counters), "times": times}
+
+    def dump(self, path: str) -> None:
+        """
+        Writes the counters and phase times to `path` as JSON.
+        """
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    def report(self) -> None:
+        """
+        Prints the counters and phase times as `c` lines.
+        """
+        for counter in COUNTERS:
+            comment(f"{counter}: {self.counters[counter]}")
+        for name, seconds in self.times.items():
+            comment(f"{name} time: {seconds:.3f}s")
+
+
+if __name__ == "__main__":
+    from classes import Literal, Clause, Formula
+    from solver import solve
+
+    events = []
+    stats = Stats(callback=lambda event, data: events.append(event))
+    with stats.phase("parsing"):
+        pass
+    assert(list(stats.times) == ["parsing"] and events == ["phase"])
+
+    # (x or y) and (!x or y) and (x or !y) and (!x or !y) needs a decision and a conflict to refute
+    unsat = Formula.from_clauses([
+        Clause("foo", [Literal(1, True), Literal(2, True)]),
+        Clause("bar", [Literal(1, False), Literal(2, True)]),
+        Clause("baz", [Literal(1, True), Literal(2, False)]),
+        Clause("buzz", [Literal(1, False), Literal(2, False)])
+    ])
+    assert(solve([1, 2], unsat, fast_paths=False, preprocess={}, stats=stats) is None)
+    assert(stats.counters["decisions"] >= 1 and stats.counters["conflicts"] >= 1)
+    assert("search" in stats.times and "search" in events)
+    assert(json.loads(json.dumps(stats.to_dict()))["counters"] == stats.counters)
@@ -0,0 +1,297 @@
+from time import time
+from classes import Formula
+from components import find, union
+from typing import Dict, List, Optional, Tuple
+
+# Static symmetry breaking. A symmetry of a formula is a permutation of its literals that maps the set of clauses onto
+# itself (and negations onto negations), so it maps models to models and non-models to non-models. A search that knows
+# nothing about it explores every subtree once per image; pigeonhole formulas have a symmetry for every permutation of
+# the pigeons and of the holes.
+#
+# Symmetries are found as automorphisms of the clause-literal graph: a vertex per literal, joined to its negation and to
+# a vertex per clause (and per cardinality constraint) it occurs in. Generators of the automorphism group come from a
+# search over ordered partitions of the vertices, refined to equitable partitions by colour refinement: individualizing
+# the first vertex of the first non-trivial cell along a base path down to a discrete partition, and for every other
+# vertex of that cell looking for a leaf that maps the base leaf to an automorphism. Vertices already known to be in the
+# orbit of the base vertex are skipped, as in nauty.
+#
+# Every generator then gets lex-leader clauses, which only keep the models that are lexicographically no larger than
+# their image under it (in the order of the variable indices). Every orbit of models keeps its smallest member, so
+# satisfiability is preserved. The clauses use an auxiliary variable per position that is forced True while the
+# assignment and its image agree on every variable so far.
+
+# Seconds spent looking for generators, and lex-leader clauses added, by default
+DEFAULT_SECONDS = 1.0
+MAX_BREAKING_CLAUSES = 10000
+
+# Leaves visited while looking for an automorphism that maps the base vertex to a given vertex
+MAX_LEAVES = 64
+
+
+def build_graph(formula: Formula) -> Tuple[List[List[int]], List]:
+    """
+    Returns the neighbours and the colour of every vertex of the clause-literal graph of `formula`. Literal v is vertex
+    2 * (v - 1) and literal -v is vertex 2 * (v - 1) + 1; clauses and then cardinality constraints follow.
+    """
+    num_vars = formula.num_vars()
+    adjacency: List[List[int]] = [[] for _ in range(2 * num_vars)]
+    colors: List = [0] * (2 * num_vars)
+    for vertex in range(0, 2 * num_vars, 2):
+        adjacency[vertex].append(vertex + 1)
+        adjacency[vertex + 1].append(vertex)
+
+    groups = [(formula.clause(index), 1) for index in range(len(formula))]
+    groups += [(formula.constraint(index), 2 + formula.bounds[index]) for index in range(formula.num_constraints())]
+    for lits, color in groups:
+        vertex = len(adjacency)
+        adjacency.append([])
+        colors.append(color)
+        for lit in lits:
+            other = literal_vertex(lit)
+            adjacency[vertex].append(other)
+            adjacency[other].append(vertex)
+    return adjacency, colors
+
+
+def literal_vertex(lit: int) -> int:
+    return 2 * (abs(lit) - 1) + (lit < 0)
+
+
+def vertex_literal(vertex: int) -> int:
+    var = vertex // 2 + 1
+    return -var if vertex % 2 else var
+
+
+def refine(adjacency: List[List[int]], cells: List[int]) -> List[int]:
+    """
+    Refines the ordered partition given as the cell of every vertex until it is equitable: vertices of a cell have as
+    many neighbours in every cell as each other. A cell is split by the multiset of cells of its vertices' neighbours,
+    and the pieces are ordered by that multiset, so two partitions that an automorphism maps onto each other are
+    refined the same way.
+    """
+    count = len(set(cells))
+    while True:
+        signatures = [(cells[vertex], tuple(sorted(cells[other] for other in adjacency[vertex])))
+                      for vertex in range(len(adjacency))]
+        numbering = {signature: index for index, signature in enumerate(sorted(set(signatures)))}
+        cells = [numbering[signature] for signature in signatures]
+        if len(numbering) == count:
+            return cells
+        count = len(numbering)
+
+
+def individualize(adjacency: List[List[int]], cells: List[int], vertex: int) -> List[int]:
+    """
+    Returns the refinement of `cells` after putting `vertex` in a cell of its own, just before the rest of its cell.
+    """
+    split = [2 * cell + (other != vertex) for other, cell in enumerate(cells)]
+    return refine(adjacency, split)
+
+
+def target_cell(cells: List[int]) -> Optional[List[int]]:
+    """
+    Returns the vertices of the first cell with more than one vertex, or None if the partition is discrete.
+    """
+    members: Dict[int, List[int]] = {}
+    for vertex, cell in enumerate(cells):
+        members.setdefault(cell, []).append(vertex)
+    for cell in sorted(members):
+        if len(members[cell]) > 1:
+            return members[cell]
+    return None
+
+
+def is_automorphism(adjacency: List[List[int]], colors: List, permutation: List[int]) -> bool:
+    neighbours = [set(others) for others in adjacency]
+    for vertex, image in enumerate(permutation):
+        if colors[vertex] != colors[image] or {permutation[other] for other in adjacency[vertex]} != neighbours[image]:
+            return False
+    return True
+
+
+class GeneratorSearch:
+    """
+    The search for generators of the automorphism group of the clause-literal graph of `formula`, given until
+    `deadline` (a `time()` value).
+    """
+    def __init__(self, formula: Formula, deadline: float):
+        self.adjacency, self.colors = build_graph(formula)
+        self.deadline = deadline
+        self.generators: List[List[int]] = []
+        self.leaves = 0
+
+    def find_leaf(self, cells: List[int], base: List[List[int]], level: int, leaf: List[int]) -> Optional[List[int]]:
+        """
+        Looks below the partition `cells`, which corresponds to level `level` of the `base` path of partitions, for a
+        discrete partition that maps the base `leaf` to an automorphism, and returns that automorphism.
+        """
+        if self.leaves >= MAX_LEAVES or time() >= self.deadline:
+            return None
+        if sorted(cells) != sorted(base[level]):
+            return None
+
+        cell = target_cell(cells)
+        if cell is None:
+            self.leaves += 1
+            permutation = [0] * len(cells)
+            for vertex, image in zip(sorted(range(len(leaf)), key=leaf.__getitem__),
+                                     sorted(range(len(cells)), key=cells.__getitem__)):
+                permutation[vertex] = image
+            return permutation if is_automorphism(self.adjacency, self.colors, permutation) else None
+
+        for vertex in cell:
+            found = self.find_leaf(individualize(self.adjacency, cells, vertex), base, level + 1, leaf)
+            if found is not None:
+                return found
+        return None
+
+    def run(self) -> List[List[int]]:
+        """
+        Returns the generators found in time, as vertex permutations.
+        """
+        cells = refine(self.adjacency, self.colors_to_cells())
+        base = [cells]
+        choices = []
+        while True:
+            cell = target_cell(base[-1])
+            if cell is None:
+                break
+            choices.append(cell)
+            base.append(individualize(self.adjacency, base[-1], cell[0]))
+        leaf = base[-1]
+
+        # From the deepest level up, so the generators found deeper (which fix every vertex individualized above
+        # them) already merge orbits when a level is searched
+        for level in range(len(choices) - 1, -1, -1):
+            cell = choices[level]
+            orbits = list(range(len(self.adjacency)))
+            for permutation in self.generators:
+                for vertex, image in enumerate(permutation):
+                    union(orbits, vertex, image)
+
+            for vertex in cell[1:]:
+                if time() >= self.deadline:
+                    return self.generators
+                if find(orbits, vertex) == find(orbits, cell[0]):
+                    continue
+                self.leaves = 0
+                permutation = self.find_leaf(individualize(self.adjacency, base[level], vertex), base, level + 1,
+                                             leaf)
+                if permutation is not None:
+                    self.generators.append(permutation)
+                    for other, image in enumerate(permutation):
+                        union(orbits, other, image)
+
+        return self.generators
+
+    def colors_to_cells(self) -> List[int]:
+        numbering = {color: index for index, color in enumerate(sorted(set(self.colors)))}
+        return [numbering[color] for color in self.colors]
+
+
+def find_symmetries(formula: Formula, seconds: float = DEFAULT_SECONDS) -> List[Dict[int, int]]:
+    """
+    Returns generators of the symmetries of `formula` found within `seconds`, each as a mapping from every variable it
+    moves to the literal it maps that variable's positive literal to.
+    """
+    num_vars = formula.num_vars()
+    symmetries = []
+    for permutation in GeneratorSearch(formula, time() + seconds).run():
+        symmetry = {}
+        for var in range(1, num_vars + 1):
+            image = vertex_literal(permutation[literal_vertex(var)])
+            if image != var:
+                symmetry[var] = image
+        if symmetry:
+            symmetries.append(symmetry)
+    return symmetries
+
+
+def lex_leader(formula: Formula, symmetries: List[Dict[int, int]], max_clauses: int = MAX_BREAKING_CLAUSES) -> int:
+    """
+    Adds the lex-leader clauses of every symmetry in `symmetries` to `formula`, stopping after `max_clauses` clauses
+    (a prefix of the clauses of a symmetry is still sound). Auxiliary variables are registered as ("symmetry", n).
+    Returns the number of clauses added.
+    """
+    added = 0
+    for symmetry in symmetries:
+        equal = None  # the auxiliary variable that is True while the assignment agrees with its image so far
+        last = max(symmetry)
+        for var in sorted(symmetry):
+            image = symmetry[var]
+            prefix = [] if equal is None else [-equal]
+            if added + 3 > max_clauses:
+                return added
+
+            # var <= its image as long as everything before agrees
+            formula.add_clause(prefix + [-var, image])
+            added += 1
+            if image == -var or var == last:
+                break
+            following = formula.add_variable(("symmetry", formula.num_vars() + 1))
+            formula.add_clause(prefix + [-var, -image, following])
+            formula.add_clause(prefix + [var, image, following])
+            added += 2
+            equal = following
+
+    return added
+
+
+def break_symmetries(formula: Formula, seconds: float = DEFAULT_SECONDS,
+                     max_clauses: int = MAX_BREAKING_CLAUSES) -> Formula:
+    """
+    Returns `formula` with the lex-leader clauses of the symmetries found within `seconds` added, at most `max_clauses`
+    of them. The result is satisfiable exactly when `formula` is. It numbers the variables of `formula` the same way,
+    but on a copy of its numbering, so the auxiliary variables don't show up in `formula` or the formulas derived from
+    it.
+    """
+    result = Formula(list(formula.names), dict(formula.indices))
+    for index in range(len(formula)):
+        result.add_clause(formula.clause(index), formula.clause_id(index))
+    result.copy_constraints(formula)
+    lex_leader(result, find_symmetries(formula, seconds), max_clauses)
+    return result
+
+
+if __name__ == "__main__":
+    from classes import Literal, Clause
+    from generators import pigeonhole
+    from solver import solve, verify_assignment
+
+    # (x or y) and (!x or !y) is symmetric under swapping x and y, and under swapping x with !x and y with !y
+    formula = Formula.from_clauses([
+        Clause("foo", [Literal(1, True), Literal(2, True)]),
+        Clause("bar", [Literal(1, False), Literal(2, False)])
+    ])
+    symmetries = find_symmetries(formula)
+    assert(len(symmetries) >= 1)
+    for symmetry in symmetries:
+        images = {(lit if lit > 0 else -lit) for lit in symmetry.values()}
+        assert(images == set(symmetry) and symmetry != {1: 1})
+
+    # Breaking the swap keeps x = False, y = True as the only model
+    broken = formula.derive()
+    broken.add_clause([1, 2])
+    broken.add_clause([-1, -2])
+    lex_leader(broken, [{1: 2, 2: 1}])
+    assert(broken.num_vars() == 3)
+    models = {bits & 3 for bits in range(8)
+              if all(clause.eval({name: bool(bits & (1 << index)) for index, name in enumerate(broken.names[1:])})
+                     for clause in broken)}
+    assert(models == {2})
+
+    # Every hole and every pigeon of the pigeonhole formula can be swapped with another
+    variables, pigeons = pigeonhole(4)
+    symmetries = find_symmetries(pigeons)
+    assert(len(symmetries) >= 4 + 3)
+    for symmetry in symmetries:
+        clauses = {tuple(sorted(pigeons.clause(index))) for index in range(len(pigeons))}
+        mapped = {tuple(sorted(symmetry.get(abs(lit), abs(lit)) * (1 if lit > 0 else -1) for lit in clause))
+                  for clause in clauses}
+        assert(mapped == clauses)
+
+    # Breaking them keeps the formula UNSAT, and keeps a satisfiable formula satisfiable
+    assert(solve(variables, break_symmetries(pigeons), preprocess={}) is None)
+    assert(pigeons.num_vars() == 20 and break_symmetries(pigeons).num_vars() > 20)
+    unbroken = Formula.from_clauses(list(formula))
+    assert(verify_assignment(solve([1, 2], break_symmetries(unbroken)), unbroken))
@@ -1,5 +1,8 @@
-from solver import solve
+import os
+import tempfile
+from solver import solve, MODES, INCOMPLETE_MODES
 from sat_io import read_input
+from proof import Proof, check_proof
 from typing import List, Mapping
 from classes import *
 from os import listdir, path
@@ -8,59 +11,68 @@ UNSAT_TESTS_PATH = "./tests/unsat/"
 SAT_TESTS_PATH = "./tests/sat/"
 
 # Testing methodology: verify that every example in ./tests/sat is satisfiable and that the produced assignment results
-# in the formula actually being true. It will also verify that every example in ./tests/unsat is UNSAT; however, it will
-# not verify that this is the case, as that would require exhaustive checking. The logic here is that we can
-# consistently classify (AND verify!) SAT cases and simply classify UNSAT cases, we probably have a working
-# implementation.
+# in the formula actually being true. It will also verify that every example in ./tests/unsat is UNSAT. In CDCL mode
+# (and the hybrid mode built on it) that answer is certified as well: the solver writes a DRAT proof, which the checker
+# in `proof` has to accept. DPLL learns nothing to write a proof with, so its UNSAT answers are only classified. Local
+# search can't show UNSAT at all, so it only gets the SAT examples.
 
 # Some of the formulas in ./tests/sat/ were generated using the `cnfgen` Python library via the command line. These are
 # pre-generated so that I didn't have to worry about giving pip instructions to you, the grader, or automating
 # dependency installation on department machines.
 
 
-def verify_unsat():
-    for filename in listdir(UNSAT_TESTS_PATH):
-        rel_path = path.join(UNSAT_TESTS_PATH, filename)
-        variables, formula = read_input(rel_path)
+def verify_unsat(mode: str):
+    with tempfile.TemporaryDirectory() as directory:
+        proof_path = os.path.join(directory, "proof.drat")
+        for filename in listdir(UNSAT_TESTS_PATH):
+            rel_path = path.join(UNSAT_TESTS_PATH, filename)
+            variables, formula = read_input(rel_path)
 
-        assignment = solve(variables, formula)
-        if assignment is not None:
-            raise ValueError(f"UNSAT file {filename} had a non-None assignment")
+            proof = Proof(proof_path) if mode in ("cdcl", "hybrid") else None
+            assignment = solve(variables, formula, mode, proof=proof)
+            if assignment is not None:
+                raise ValueError(f"UNSAT file {filename} had a non-None assignment in {mode} mode")
+            if proof is not None:
+                proof.close()
+                if not check_proof(formula, proof_path):
+                    raise ValueError(f"The proof for UNSAT file {filename} was rejected in {mode} mode")
 
-    print("UNSAT examples were all verified to be UNSAT")
+    print(f"UNSAT examples were all verified to be UNSAT in {mode} mode")
 
 
-def verify_sat():
+def verify_sat(mode: str):
     for filename in listdir(SAT_TESTS_PATH):
         rel_path = path.join(SAT_TESTS_PATH, filename)
         variables, formula = read_input(rel_path)
 
-        assignment = solve(variables, formula)
+        assignment = solve(variables, formula, mode)
         if assignment is None:
-            raise ValueError(f"SAT file {filename} was said to be UNSAT")
+            raise ValueError(f"SAT file {filename} was said to be UNSAT in {mode} mode")
 
         is_assignment_correct = verify_assignment(assignment, formula)
         if not is_assignment_correct:
-            raise ValueError(f"Incorrect variable assignment produced for {filename}")
+            raise ValueError(f"Incorrect variable assignment produced for {filename} in {mode} mode")
 
-    print("SAT examples were verified and their assignments were correct")
+    print(f"SAT examples were verified and their assignments were correct in {mode} mode")
 
 
-def verify_assignment(assignments: Mapping[int, bool], formula: List[Clause]) -> bool:
+def verify_assignment(assignments: Mapping[int, bool], formula: Formula) -> bool:
     """
-    Verifies that every clause in formula, using the assignments from `assignments`, is True. This should be used to
-    check output from SAT scenarios.
+    Verifies that every clause in formula, using the assignments from `assignments`, is True, and that no cardinality
+    constraint has too many True literals. This should be used to check output from SAT scenarios.
     """
     for clause in formula:
         is_true = clause.eval(assignments)
         if not is_true:
             return False
 
-    return True
+    return all(constraint.eval(assignments) for constraint in formula.constraints())
 
 
 if __name__ == "__main__":
-    print("Starting verification of UNSAT instances...")
-    verify_unsat()
-    print("Starting verification of SAT instances...")
-    verify_sat()
\ No newline at end of file
+    for mode in MODES:
+        if mode not in INCOMPLETE_MODES:
+            print(f"Starting verification of UNSAT instances in {mode} mode...")
+            verify_unsat(mode)
+        print(f"Starting verification of SAT instances in {mode} mode...")
+        verify_sat(mode)
\ No newline at end of file